@@ -1,8 +1,124 @@
 # Анализ и визуализация данных
+#
+# pandas и matplotlib импортируются при первом использовании (DataFrame,
+# построение графика), чтобы не замедлять запуск приложения; prewarm()
+# загружает их заранее, например в фоновом потоке.
 
-import pandas as pd
-import matplotlib.pyplot as plt
-from models import OperationType
+import io
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import profiling
+from models import Operation, OperationType
+
+def prewarm(pandas: bool = False):
+    """Предварительная загрузка библиотек построения графиков (и pandas)"""
+    import matplotlib.figure  # noqa: F401
+    import matplotlib.backends.backend_agg  # noqa: F401
+    if pandas:
+        import pandas  # noqa: F401
+
+def new_figure(figsize):
+    """Новый график (объект Figure без pyplot)"""
+    from matplotlib.figure import Figure
+    return Figure(figsize=figsize)
+
+# Измерения куба итогов
+ROLLUP_DIMENSIONS = ("month", "category", "type")
+
+class RollupCube:
+    """Куб итогов по (месяц, категория, тип)
+
+    Для каждой ячейки хранятся сумма и число операций в копейках,
+    минимум, максимум и счетчик сумм (по нему крайние значения
+    пересчитываются, если удалено текущее минимальное или максимальное).
+    Куб обновляется по событиям FinanceManager, запросы выполняются
+    за время, пропорциональное числу ячеек.
+    """
+    
+    def __init__(self):
+        self.cells: Dict[Tuple[str, str, str], list] = {}
+    
+    def __len__(self) -> int:
+        return len(self.cells)
+    
+    @staticmethod
+    def key(operation: Operation) -> Tuple[str, str, str]:
+        """Ключ ячейки операции"""
+        return operation.date[:7], operation.category, operation.type.value
+    
+    def add(self, operation: Operation):
+        """Учет добавленной операции"""
+        cents = operation.cents
+        key = self.key(operation)
+        cell = self.cells.get(key)
+        if cell is None:
+            self.cells[key] = [cents, 1, cents, cents, Counter((cents,))]
+            return
+        cell[0] += cents
+        cell[1] += 1
+        if cents < cell[2]:
+            cell[2] = cents
+        if cents > cell[3]:
+            cell[3] = cents
+        cell[4][cents] += 1
+    
+    def remove(self, operation: Operation):
+        """Учет удаленной операции"""
+        key = self.key(operation)
+        cell = self.cells.get(key)
+        if cell is None:
+            return
+        cents = operation.cents
+        amounts = cell[4]
+        if not amounts[cents]:
+            return
+        cell[0] -= cents
+        cell[1] -= 1
+        if not cell[1]:
+            del self.cells[key]
+            return
+        amounts[cents] -= 1
+        if not amounts[cents]:
+            del amounts[cents]
+            # Крайние значения пересчитываются только при удалении последнего из них
+            if cents == cell[2]:
+                cell[2] = min(amounts)
+            elif cents == cell[3]:
+                cell[3] = max(amounts)
+    
+    def query(self, by=ROLLUP_DIMENSIONS, category: Optional[str] = None,
+              op_type: Optional[OperationType] = None,
+              start_month: Optional[str] = None,
+              end_month: Optional[str] = None) -> Dict[tuple, Dict[str, float]]:
+        """Итоги (sum, count, min, max), сгруппированные по измерениям by"""
+        positions = [ROLLUP_DIMENSIONS.index(name) for name in by]
+        category = category.strip() if category else None
+        merged: Dict[tuple, List[int]] = {}
+        
+        for key, (cents, count, low, high, _) in self.cells.items():
+            month, cell_category, cell_type = key
+            if category and cell_category != category:
+                continue
+            if op_type and cell_type != op_type.value:
+                continue
+            if start_month and month < start_month:
+                continue
+            if end_month and month > end_month:
+                continue
+            
+            group = tuple(key[i] for i in positions)
+            entry = merged.get(group)
+            if entry is None:
+                merged[group] = [cents, count, low, high]
+            else:
+                entry[0] += cents
+                entry[1] += count
+                entry[2] = min(entry[2], low)
+                entry[3] = max(entry[3], high)
+        
+        return {group: {'sum': cents / 100, 'count': count, 'min': low / 100, 'max': high / 100}
+                for group, (cents, count, low, high) in sorted(merged.items())}
 
 class DataAnalyzer:
     """Анализатор финансовых данных"""
@@ -10,109 +126,266 @@ class DataAnalyzer:
     def __init__(self, finance_manager):
         """Инициализация анализатора"""
         self.manager = finance_manager
-    
-    def get_dataframe(self):
-        """Преобразование операций в DataFrame"""
-        data = []
-        for op in self.manager.operations:
-            data.append({
-                'id': op.id,
-                'amount': op.amount,
-                'category': op.category,
-                'date': pd.to_datetime(op.date),
-                'type': op.type.value,
-                'description': op.description
-            })
-        
-        return pd.DataFrame(data) if data else pd.DataFrame()
-    
-    def plot_income_vs_expenses(self):
-        """График доходов и расходов по месяцам"""
-        df = self.get_dataframe()
-        if df.empty:
-            return self.create_empty_plot("Нет данных")
         
-        # Группировка по месяцам
-        df['month'] = df['date'].dt.to_period('M')
-        monthly = df.groupby(['month', 'type'])['amount'].sum().unstack().fillna(0)
+        # Кэш DataFrame, обновляемый по событиям FinanceManager
+        self._frame = None
+        self._added = {}
+        self._deleted = set()
+        self.frame_builds = 0
         
-        fig, ax = plt.subplots(figsize=(10, 6))
-        monthly.plot(kind='bar', ax=ax)
-        ax.set_title('Доходы и расходы по месяцам')
-        ax.set_xlabel('Месяц')
-        ax.set_ylabel('Сумма (руб)')
-        ax.legend(['Доходы', 'Расходы'])
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        
-        return fig
+        # Куб итогов (строится при первом запросе)
+        self._cube: Optional[RollupCube] = None
+        self.manager.subscribe(self._on_change)
     
-    def plot_expenses_by_category(self):
-        """Круговая диаграмма расходов по категориям"""
-        df = self.get_dataframe()
-        if df.empty:
-            return self.create_empty_plot("Нет данных")
-        
-        # Фильтрация расходов
-        expenses = df[df['type'] == OperationType.EXPENSE.value]
-        if expenses.empty:
-            return self.create_empty_plot("Нет расходов")
-        
-        # Группировка по категориям
-        by_category = expenses.groupby('category')['amount'].sum()
-        
-        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 6))
+    def _on_change(self, event, operations):
+        """Обработка изменений в менеджере"""
+        if event == "update":
+            # Изменение - удаление прежней версии и добавление новой
+            old, new = operations
+            self._on_change("delete", [old])
+            self._on_change("add", [new])
+            return
         
-        # Круговая диаграмма
-        ax1.pie(by_category.values, labels=by_category.index, autopct='%1.1f%%')
-        ax1.set_title('Расходы по категориям')
-        # Столбчатая диаграмма
-        by_category.sort_values().plot(kind='barh', ax=ax2)
-        ax2.set_title('Суммы по категориям')
-        ax2.set_xlabel('Сумма (руб)')
+        if event == "reset":
+            self._cube = None
+        elif self._cube is not None:
+            for operation in operations:
+                if event == "add":
+                    self._cube.add(operation)
+                else:
+                    self._cube.remove(operation)
         
-        plt.tight_layout()
-        return fig
-    
-    def plot_top_expenses(self, n=10):
-        """Топ-N расходов"""
-        df = self.get_dataframe()
-        if df.empty:
-            return self.create_empty_plot("Нет данных")
-        
-        # Фильтрация расходов
-        expenses = df[df['type'] == OperationType.EXPENSE.value]
-        if expenses.empty:
-            return self.create_empty_plot("Нет расходов")
-        
-        # Топ-N расходов
-        top_expenses = expenses.nlargest(n, 'amount')
-        
-        fig, ax = plt.subplots(figsize=(10, 6))
-        bars = ax.barh(range(len(top_expenses)), top_expenses['amount'])
+        if event == "reset" or self._frame is None:
+            self._frame = None
+            self._added = {}
+            self._deleted = set()
+        elif event == "add":
+            self._added.update((op.id, op) for op in operations)
+        elif event == "delete":
+            for op in operations:
+                self._added.pop(op.id, None)
+                self._deleted.add(op.id)
+    
+    @staticmethod
+    @profiling.timed("analysis.build_cube")
+    def build_cube(operations) -> RollupCube:
+        """Построение куба итогов по списку операций"""
+        cube = RollupCube()
+        for operation in operations:
+            cube.add(operation)
+        return cube
+    
+    @staticmethod
+    @profiling.timed("analysis.build_dataframe")
+    def build_dataframe(operations):
+        """Построение типизированного DataFrame из списка операций (векторно)"""
+        import pandas as pd
+        operations = list(operations)
+        return pd.DataFrame({
+            'id': pd.Series([op.id for op in operations], dtype='int64'),
+            'amount': pd.Series([op.cents for op in operations], dtype='int64') / 100,
+            'category': pd.Categorical([op.category for op in operations]),
+            'date': pd.to_datetime(pd.Series([op.date for op in operations], dtype=object),
+                                   format='%Y-%m-%d'),
+            'type': pd.Categorical([op.type.value for op in operations],
+                                   categories=[t.value for t in OperationType]),
+            'description': pd.Series([op.description for op in operations], dtype=object)
+        })
+    
+    @profiling.timed("analysis.get_dataframe")
+    def get_dataframe(self):
+        """Преобразование операций в DataFrame
+
+        Результат кэшируется и дополняется при изменениях; его не следует
+        изменять на месте.
+        """
+        import pandas as pd
+        if self._frame is None:
+            self._frame = self.build_dataframe(self.manager.operations)
+            self._added = {}
+            self._deleted = set()
+            self.frame_builds += 1
         
-        # Подписи
-        labels = [f"{row['category']} ({row['date'].strftime('%d.%m')})" 
-                 for _, row in top_expenses.iterrows()]
+        if self._deleted:
+            self._frame = self._frame[~self._frame['id'].isin(self._deleted)].reset_index(drop=True)
+            self._deleted = set()
         
-        ax.set_yticks(range(len(top_expenses)))
-        ax.set_yticklabels(labels)
-        ax.invert_yaxis()
-        ax.set_title(f'Топ-{n} расходов')
-        ax.set_xlabel('Сумма (руб)')
+        if self._added:
+            added = self.build_dataframe(self._added.values())
+            frame = pd.concat([self._frame, added], ignore_index=True)
+            frame['category'] = frame['category'].astype('category')
+            frame['type'] = pd.Categorical(frame['type'], categories=[t.value for t in OperationType])
+            self._frame = frame
+            self._added = {}
         
-        # Значения на столбцах
-        for bar, amount in zip(bars, top_expenses['amount']):
-            ax.text(bar.get_width() + max(top_expenses['amount']) * 0.01,
-                   bar.get_y() + bar.get_height()/2,
-                   f'{amount:.0f}', va='center')
+        return self._frame if len(self._frame) else pd.DataFrame()
+    
+    @profiling.timed("analysis.rollup")
+    def rollup(self, by=ROLLUP_DIMENSIONS, **filters) -> Dict[tuple, Dict[str, float]]:
+        """Итоги по кубу (месяц, категория, тип)
+
+        by - измерения группировки ("month", "category", "type"),
+        фильтры: category, op_type, start_month, end_month (ГГГГ-ММ).
+        Результат: {ключ: {'sum', 'count', 'min', 'max'}}.
+        """
+        if self._cube is None:
+            self._cube = self.build_cube(self.manager.operations)
+        return self._cube.query(by, **filters)
+    
+    def monthly_totals(self) -> Optional[List[Tuple[str, float, float]]]:
+        """Доходы и расходы по месяцам: [(месяц, доходы, расходы)], None - нет данных"""
+        cube = self.rollup(by=("month", "type"))
+        if not cube:
+            return None
         
-        plt.tight_layout()
-        return fig
+        months = sorted({month for month, _ in cube})
+        empty = {'sum': 0}
+        return [(month,
+                 cube.get((month, OperationType.INCOME.value), empty)['sum'],
+                 cube.get((month, OperationType.EXPENSE.value), empty)['sum'])
+                for month in months]
+    
+    def category_expenses(self) -> Optional[List[Tuple[str, float]]]:
+        """Расходы по категориям: [(категория, сумма)], None - нет данных"""
+        if not len(self.manager.operations):
+            return None
+        cube = self.rollup(by=("category",), op_type=OperationType.EXPENSE)
+        return [(category, entry['sum']) for (category,), entry in cube.items()]
+    
+    def top_expenses(self, n=10, **filters) -> Optional[List[Operation]]:
+        """Топ-N расходов (фильтры - как в FinanceManager.get_top_expenses), None - нет данных"""
+        if not len(self.manager.operations):
+            return None
+        return self.manager.get_top_expenses(n, **filters)
+    
+    @profiling.timed("analysis.chart_data")
+    def chart_data(self, chart: str, **params):
+        """Данные для графика chart (см. CHARTS)"""
+        return getattr(self, CHARTS[chart][0])(**params)
+    
+    def plot_income_vs_expenses(self):
+        """График доходов и расходов по месяцам"""
+        return draw_income_vs_expenses(self.monthly_totals())
+    
+    def plot_expenses_by_category(self):
+        """Круговая диаграмма расходов по категориям"""
+        return draw_expenses_by_category(self.category_expenses())
+    
+    def plot_top_expenses(self, n=10, **filters):
+        """Топ-N расходов (фильтры - как в FinanceManager.get_top_expenses)"""
+        return draw_top_expenses(self.top_expenses(n, **filters), n)
     
     def create_empty_plot(self, message):
         """Создание пустого графика с сообщением"""
-        fig, ax = plt.subplots(figsize=(8, 6))
-        ax.text(0.5, 0.5, message, ha='center', va='center', fontsize=14)
-        ax.set_title('Нет данных для отображения')
-        return fig
+        return create_empty_plot(message)
+
+# Построение графиков по готовым данным.
+# Используются отдельные объекты Figure (без pyplot), поэтому функции
+# можно вызывать из рабочего потока.
+
+def create_empty_plot(message):
+    """Создание пустого графика с сообщением"""
+    fig = new_figure((8, 6))
+    ax = fig.subplots()
+    ax.text(0.5, 0.5, message, ha='center', va='center', fontsize=14)
+    ax.set_title('Нет данных для отображения')
+    return fig
+
+def draw_income_vs_expenses(monthly):
+    """График доходов и расходов по месяцам"""
+    if not monthly:
+        return create_empty_plot("Нет данных")
+    
+    months = [month for month, _, _ in monthly]
+    positions = range(len(months))
+    width = 0.4
+    
+    fig = new_figure((10, 6))
+    ax = fig.subplots()
+    ax.bar([x - width / 2 for x in positions], [income for _, income, _ in monthly], width)
+    ax.bar([x + width / 2 for x in positions], [expense for _, _, expense in monthly], width)
+    ax.set_xticks(list(positions))
+    ax.set_xticklabels(months, rotation=45)
+    ax.set_title('Доходы и расходы по месяцам')
+    ax.set_xlabel('Месяц')
+    ax.set_ylabel('Сумма (руб)')
+    ax.legend(['Доходы', 'Расходы'])
+    fig.tight_layout()
+    
+    return fig
+
+def draw_expenses_by_category(by_category):
+    """Круговая диаграмма расходов по категориям"""
+    if by_category is None:
+        return create_empty_plot("Нет данных")
+    if not by_category:
+        return create_empty_plot("Нет расходов")
+    
+    categories = [category for category, _ in by_category]
+    amounts = [amount for _, amount in by_category]
+    
+    fig = new_figure((12, 6))
+    ax1, ax2 = fig.subplots(1, 2)
+    
+    # Круговая диаграмма
+    ax1.pie(amounts, labels=categories, autopct='%1.1f%%')
+    ax1.set_title('Расходы по категориям')
+    # Столбчатая диаграмма
+    ordered = sorted(by_category, key=lambda item: item[1])
+    ax2.barh([category for category, _ in ordered], [amount for _, amount in ordered])
+    ax2.set_title('Суммы по категориям')
+    ax2.set_xlabel('Сумма (руб)')
+    
+    fig.tight_layout()
+    return fig
+
+def draw_top_expenses(top_expenses, n=10):
+    """Топ-N расходов"""
+    if top_expenses is None:
+        return create_empty_plot("Нет данных")
+    if not top_expenses:
+        return create_empty_plot("Нет расходов")
+    
+    amounts = [op.amount for op in top_expenses]
+    fig = new_figure((10, 6))
+    ax = fig.subplots()
+    bars = ax.barh(range(len(top_expenses)), amounts)
+    
+    # Подписи (дата в формате ДД.ММ)
+    labels = [f"{op.category} ({op.date[8:10]}.{op.date[5:7]})" for op in top_expenses]
+    
+    ax.set_yticks(range(len(top_expenses)))
+    ax.set_yticklabels(labels)
+    ax.invert_yaxis()
+    ax.set_title(f'Топ-{n} расходов')
+    ax.set_xlabel('Сумма (руб)')
+    
+    # Значения на столбцах
+    for bar, amount in zip(bars, amounts):
+        ax.text(bar.get_width() + max(amounts) * 0.01,
+               bar.get_y() + bar.get_height()/2,
+               f'{amount:.0f}', va='center')
+    
+    fig.tight_layout()
+    return fig
+
+@profiling.timed("analysis.render_png")
+def render_png(fig, dpi=100) -> bytes:
+    """Растеризация графика в PNG (Agg)"""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    buffer = io.BytesIO()
+    FigureCanvasAgg(fig)
+    fig.savefig(buffer, format='png', dpi=dpi)
+    return buffer.getvalue()
+
+@profiling.timed("analysis.render_chart")
+def render_chart(chart: str, data, **params) -> bytes:
+    """Построение и растеризация графика chart по данным (для рабочего потока)"""
+    return render_png(CHARTS[chart][1](data, **params))
+
+# Графики: имя -> (метод DataAnalyzer для данных, функция построения)
+CHARTS = {
+    "income_expense": ("monthly_totals", draw_income_vs_expenses),
+    "categories": ("category_expenses", draw_expenses_by_category),
+    "top_expenses": ("top_expenses", draw_top_expenses),
+}
@@ -0,0 +1,427 @@
+# Набор замеров производительности
+#
+# Синтетический учет (воспроизводимый по seed) от 10 тыс. до 10 млн
+# операций и сценарии для основных операций: сохранение и загрузка,
+# импорт, фильтры, баланс, DataFrame. Для каждого сценария - время
+# (медиана и минимум по повторам) и пиковая память (tracemalloc,
+# отдельным прогоном, чтобы не искажать время).
+#
+#   python bench.py --sizes 10k,100k --output results.json
+#   python bench.py --sizes 1m --scenarios load_csv,filter_category --backends list,columnar
+#   python bench.py --sizes 100k --compare baseline.json --threshold 0.2
+#   python bench.py --sizes 1m --save-ledger ledger.csv
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from models import FinanceManager, Operation, OperationType
+from storage import DataStorage, export_operations
+
+DEFAULT_SEED = 42
+START_DATE = date(2015, 1, 1)
+YEARS = 10
+
+# Категории расходов: (вес, медиана суммы, описания)
+EXPENSE_CATEGORIES = {
+    "Продукты": (30, 1200, ["Пятерочка", "Перекресток", "Магнит", "рынок", "ВкусВилл"]),
+    "Кафе": (14, 450, ["кофе", "обед", "кофе с собой", "ужин в ресторане", "пицца"]),
+    "Транспорт": (14, 120, ["метро", "автобус", "такси", "каршеринг", "электричка"]),
+    "Жилье": (4, 25000, ["аренда квартиры", "коммунальные услуги", "интернет"]),
+    "Здоровье": (5, 1800, ["аптека", "стоматолог", "анализы", "спортзал"]),
+    "Одежда": (5, 3500, ["куртка", "обувь", "джинсы", "футболки"]),
+    "Развлечения": (8, 900, ["кино", "концерт", "книги", "подписка на музыку", "театр"]),
+    "Связь": (4, 600, ["мобильная связь", "облачное хранилище"]),
+    "Подарки": (3, 2500, ["подарок маме", "цветы", "день рождения друга"]),
+    "Путешествия": (2, 15000, ["авиабилеты", "гостиница", "поезд", "экскурсия"]),
+}
+INCOME_CATEGORIES = {
+    "Зарплата": (70, 90000, ["зарплата", "аванс", "премия"]),
+    "Подработка": (20, 12000, ["фриланс", "консультация", "перевод текста"]),
+    "Проценты": (10, 800, ["проценты по вкладу", "кэшбэк"]),
+}
+INCOME_SHARE = 0.04
+
+def parse_size(text: str) -> int:
+    """Размер учета: 10000, 10k, 1m"""
+    text = text.strip().lower()
+    multiplier = {"k": 1000, "m": 1000000}.get(text[-1:], 1)
+    return int(float(text.rstrip("km")) * multiplier)
+
+def generate_ledger(n: int, seed: int = DEFAULT_SEED) -> List[Operation]:
+    """Синтетический учет из n операций (воспроизводимый по seed)
+
+    Операции идут по датам (как при обычном вводе) на интервале YEARS
+    лет; категории выбираются по весам, суммы - логнормальные вокруг
+    медианы категории (в копейках), описания - из словаря категории с
+    номером заказа, чтобы поиск по тексту не сводился к нескольким словам.
+    """
+    rng = random.Random(seed)
+    days = (date(START_DATE.year + YEARS, 1, 1) - START_DATE).days
+    dates = [(START_DATE + timedelta(days=i)).isoformat() for i in range(days)]
+
+    def table(categories):
+        names = list(categories)
+        return names, [categories[name][0] for name in names]
+
+    expense_names, expense_weights = table(EXPENSE_CATEGORIES)
+    income_names, income_weights = table(INCOME_CATEGORIES)
+    expense_choices = rng.choices(expense_names, expense_weights, k=n)
+
+    operations = []
+    for i in range(n):
+        if rng.random() < INCOME_SHARE:
+            category = rng.choices(income_names, income_weights)[0]
+            _, median, descriptions = INCOME_CATEGORIES[category]
+            op_type = OperationType.INCOME
+        else:
+            category = expense_choices[i]
+            _, median, descriptions = EXPENSE_CATEGORIES[category]
+            op_type = OperationType.EXPENSE
+        amount = max(1, round(median * rng.lognormvariate(0, 0.6) * 100)) / 100
+        description = rng.choice(descriptions)
+        if rng.random() < 0.3:
+            description += f" #{rng.randrange(100000)}"
+        operations.append(Operation(i + 1, amount, category, dates[i * days // n],
+                                    op_type, description))
+    return operations
+
+class Context:
+    """Данные одного прогона: учет, каталог для файлов и менеджер"""
+
+    def __init__(self, operations: List[Operation], backend: str, temp_dir: str):
+        self.operations = operations
+        self.backend = backend
+        self.temp_dir = temp_dir
+        self._manager = None
+
+    def path(self, name: str) -> str:
+        """Путь к файлу во временном каталоге"""
+        return os.path.join(self.temp_dir, name)
+
+    def new_manager(self, database: str = "scratch.db") -> FinanceManager:
+        """Пустой менеджер выбранного хранилища (для SQLite - новая база)"""
+        database = self.path(database)
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(database + suffix):
+                os.remove(database + suffix)
+        return FinanceManager(self.backend, database=database)
+
+    @property
+    def manager(self) -> FinanceManager:
+        """Менеджер с загруженным учетом (создается один раз)"""
+        if self._manager is None:
+            self._manager = self.new_manager("bench.db")
+            self._manager.operations = self.operations
+        return self._manager
+
+    def file(self, name: str, fmt: str = "csv") -> str:
+        """Файл с учетом в формате fmt (создается один раз)"""
+        filename = self.path(name)
+        if not os.path.exists(filename):
+            if fmt == "binary":
+                DataStorage(filename, binary=True).save_data(self.operations)
+            else:
+                export_operations(self.operations, filename, fmt)
+        return filename
+
+    def close(self):
+        """Закрытие менеджера (базы SQLite) перед удалением временного каталога"""
+        if self._manager is not None:
+            self._manager.close()
+        self._manager = None
+
+# Сценарий: функция (Context) -> замеряемая функция без аргументов.
+# requires - модули, без которых сценарий пропускается; per_backend -
+# сценарий зависит от хранилища FinanceManager.
+SCENARIOS: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+def scenario(name: str, requires=(), per_backend: bool = False):
+    """Регистрация сценария"""
+    def register(func):
+        SCENARIOS[name] = {'setup': func, 'requires': tuple(requires), 'per_backend': per_backend}
+        return func
+    return register
+
+@scenario("save_csv")
+def bench_save_csv(ctx):
+    storage = DataStorage(ctx.path("save.csv"))
+    return lambda: storage.save_data(ctx.operations)
+
+@scenario("load_csv")
+def bench_load_csv(ctx):
+    storage = DataStorage(ctx.file("ledger.csv"))
+    return storage.load_data
+
+@scenario("save_binary")
+def bench_save_binary(ctx):
+    storage = DataStorage(ctx.path("save.bin"), binary=True)
+    return lambda: storage.save_data(ctx.operations)
+
+@scenario("load_binary")
+def bench_load_binary(ctx):
+    storage = DataStorage(ctx.file("ledger.bin", "binary"), binary=True)
+    return storage.load_data
+
+@scenario("import_csv", per_backend=True)
+def bench_import_csv(ctx):
+    filename = ctx.file("ledger.csv")
+    storage = DataStorage(ctx.path("import.csv"))
+
+    def run():
+        manager = ctx.new_manager()
+        manager.add_operations_bulk(storage.import_from_csv(filename))
+        return manager
+    return run
+
+@scenario("import_json", per_backend=True)
+def bench_import_json(ctx):
+    filename = ctx.file("ledger.json", "json")
+    storage = DataStorage(ctx.path("import.csv"))
+
+    def run():
+        manager = ctx.new_manager()
+        manager.add_operations_bulk(storage.import_json_file(filename))
+        return manager
+    return run
+
+@scenario("build_manager", per_backend=True)
+def bench_build_manager(ctx):
+    def run():
+        manager = ctx.new_manager()
+        manager.operations = ctx.operations
+        return manager
+    return run
+
+@scenario("filter_category", per_backend=True)
+def bench_filter_category(ctx):
+    manager = ctx.manager
+    return lambda: manager.get_filtered_operations(category="Кафе")
+
+@scenario("filter_dates", per_backend=True)
+def bench_filter_dates(ctx):
+    manager = ctx.manager
+    return lambda: manager.get_filtered_operations(start_date="2020-01-01", end_date="2020-12-31")
+
+@scenario("filter_text", per_backend=True)
+def bench_filter_text(ctx):
+    manager = ctx.manager
+    manager.search("кофе")  # индекс строится один раз, вне замера
+    return lambda: manager.get_filtered_operations(text="кофе", op_type=OperationType.EXPENSE)
+
+@scenario("balance", per_backend=True)
+def bench_balance(ctx):
+    manager = ctx.manager
+    return manager.get_balance
+
+@scenario("balance_filtered", per_backend=True)
+def bench_balance_filtered(ctx):
+    manager = ctx.manager
+    return lambda: manager.get_balance(category="Продукты", start_date="2018-03-01",
+                                       end_date="2019-02-28")
+
+@scenario("export_csv_gzip")
+def bench_export_csv_gzip(ctx):
+    filename = ctx.path("export.csv.gz")
+    return lambda: export_operations(ctx.operations, filename, "csv", compression="gzip")
+
+@scenario("dataframe", requires=("pandas",))
+def bench_dataframe(ctx):
+    from analysis import DataAnalyzer
+    return lambda: DataAnalyzer.build_dataframe(ctx.operations)
+
+def module_available(name: str) -> bool:
+    try:
+        __import__(name)
+        return True
+    except ImportError:
+        return False
+
+def measure(func: Callable[[], Any], repeat: int, memory: bool) -> Dict[str, Any]:
+    """Замер времени (repeat повторов) и пиковой памяти (отдельный прогон)"""
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - started)
+        del result
+
+    measurement = {
+        'median': statistics.median(times),
+        'min': min(times),
+        'times': times
+    }
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            result = func()
+            measurement['peak_memory'] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        del result
+    return measurement
+
+def run_benchmarks(sizes: List[int], scenarios: Optional[List[str]] = None,
+                   backends: List[str] = ("list",), repeat: int = 3,
+                   memory: bool = True, seed: int = DEFAULT_SEED,
+                   log: Optional[Callable[[str], None]] = None) -> List[Dict[str, Any]]:
+    """Прогон сценариев для всех размеров и хранилищ, результаты - список словарей"""
+    names = list(scenarios or SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        raise ValueError(f"Неизвестные сценарии: {', '.join(unknown)}")
+
+    results = []
+    for size in sizes:
+        started = time.perf_counter()
+        operations = generate_ledger(size, seed)
+        if log:
+            log(f"{size}: учет сгенерирован за {time.perf_counter() - started:.2f} с")
+
+        for backend in backends:
+            if backend == "columnar" and not module_available("numpy"):
+                if log:
+                    log(f"{size}: хранилище columnar пропущено (нет NumPy)")
+                continue
+            with tempfile.TemporaryDirectory() as temp_dir:
+                ctx = Context(operations, backend, temp_dir)
+                try:
+                    for name in names:
+                        spec = SCENARIOS[name]
+                        # Сценарии без хранилища выполняются только для первого
+                        if not spec['per_backend'] and backend != backends[0]:
+                            continue
+                        result = {'scenario': name, 'size': size,
+                                  'backend': backend if spec['per_backend'] else None}
+                        missing = [module for module in spec['requires'] if not module_available(module)]
+                        if missing:
+                            result['skipped'] = f"нет {', '.join(missing)}"
+                        else:
+                            result.update(measure(spec['setup'](ctx), repeat, memory))
+                            result['ops_per_second'] = size / result['median'] if result['median'] else None
+                        results.append(result)
+                        if log:
+                            log(format_result(result))
+                finally:
+                    ctx.close()
+    return results
+
+def format_result(result: Dict[str, Any]) -> str:
+    """Строка результата для вывода в консоль"""
+    label = result['scenario'] + (f"[{result['backend']}]" if result['backend'] else "")
+    if 'skipped' in result:
+        return f"{result['size']:>10} {label:<28} пропущен ({result['skipped']})"
+    line = f"{result['size']:>10} {label:<28} {result['median'] * 1000:10.2f} мс (мин {result['min'] * 1000:.2f})"
+    if 'peak_memory' in result:
+        line += f", память {result['peak_memory'] / 2**20:.1f} МБ"
+    return line
+
+def environment() -> Dict[str, Any]:
+    """Сведения о среде для сравнения прогонов"""
+    info = {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+    for module in ("numpy", "pandas"):
+        try:
+            info[module] = __import__(module).__version__
+        except ImportError:
+            info[module] = None
+    try:
+        info['commit'] = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        info['commit'] = None
+    return info
+
+def result_key(result: Dict[str, Any]) -> tuple:
+    return result['scenario'], result['size'], result['backend']
+
+def compare(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]],
+            threshold: float = 0.2) -> List[Dict[str, Any]]:
+    """Сценарии, замедлившиеся (по медиане) или выросшие по памяти больше чем на threshold"""
+    previous = {result_key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        old = previous.get(result_key(result))
+        if old is None or 'skipped' in result or 'skipped' in old:
+            continue
+        for metric in ('median', 'peak_memory'):
+            if metric in result and old.get(metric):
+                ratio = result[metric] / old[metric]
+                if ratio > 1 + threshold:
+                    regressions.append({'scenario': result['scenario'], 'size': result['size'],
+                                        'backend': result['backend'], 'metric': metric,
+                                        'baseline': old[metric], 'current': result[metric],
+                                        'ratio': ratio})
+    return regressions
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Запуск замеров из командной строки"""
+    parser = argparse.ArgumentParser(description="Замеры производительности на синтетическом учете")
+    parser.add_argument("--sizes", default="10k,100k", help="размеры учета через запятую (10k, 1m, ...)")
+    parser.add_argument("--scenarios", help="сценарии через запятую (по умолчанию - все: "
+                                            + ", ".join(SCENARIOS) + ")")
+    parser.add_argument("--backends", default="list", help="хранилища: list, columnar, sqlite")
+    parser.add_argument("--repeat", type=int, default=3, help="число повторов каждого замера")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="seed генератора")
+    parser.add_argument("--no-memory", action="store_true", help="без замера памяти")
+    parser.add_argument("--output", help="файл для результатов в JSON")
+    parser.add_argument("--json", action="store_true", help="вывод результатов в JSON")
+    parser.add_argument("--compare", help="JSON предыдущего прогона для сравнения")
+    parser.add_argument("--threshold", type=float, default=0.2, help="допустимое ухудшение (доля)")
+    parser.add_argument("--save-ledger", help="только сохранить учет первого размера в CSV и выйти")
+    args = parser.parse_args(argv)
+
+    sizes = [parse_size(size) for size in args.sizes.split(",") if size.strip()]
+    if args.save_ledger:
+        ok = DataStorage(args.save_ledger).save_data(generate_ledger(sizes[0], args.seed))
+        return 0 if ok else 1
+
+    log = None if args.json else print
+    results = run_benchmarks(
+        sizes,
+        scenarios=[name.strip() for name in args.scenarios.split(",")] if args.scenarios else None,
+        backends=[name.strip() for name in args.backends.split(",")],
+        repeat=args.repeat, memory=not args.no_memory, seed=args.seed, log=log)
+    report = {'environment': environment(), 'seed': args.seed, 'repeat': args.repeat,
+              'results': results}
+
+    code = 0
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            report['regressions'] = compare(results, json.load(f)['results'], args.threshold)
+        for regression in report['regressions']:
+            print(f"Ухудшение: {regression['scenario']} ({regression['size']}, "
+                  f"{regression['backend'] or '-'}) {regression['metric']} "
+                  f"x{regression['ratio']:.2f}", file=sys.stderr)
+        code = 1 if report['regressions'] else 0
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.json:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    return code
+
+if __name__ == "__main__":
+    sys.exit(main())
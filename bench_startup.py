@@ -0,0 +1,78 @@
+# Замер времени запуска приложения
+#
+# Каждый запуск - отдельный процесс во временном каталоге (пустые данные):
+# время импорта gui, время до первого отрисованного окна (если есть
+# дисплей) и загруженные при этом тяжелые библиотеки.
+#
+#   python bench_startup.py [--runs N] [--json]
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HEAVY_MODULES = ("pandas", "matplotlib", "numpy")
+
+CHILD = """
+import json, sys, time
+started = time.perf_counter()
+import gui
+result = {'import_gui': time.perf_counter() - started}
+try:
+    app = gui.FinancialApp()
+    app.root.update()
+    result['first_window'] = time.perf_counter() - started
+    app.saver.close()
+    app.root.destroy()
+except Exception as e:
+    result['first_window'] = None
+    result['error'] = str(e).splitlines()[0]
+result['heavy_modules'] = sorted(m for m in %r if m in sys.modules)
+print(json.dumps(result))
+""" % (HEAVY_MODULES,)
+
+def run_once() -> dict:
+    """Один запуск в отдельном процессе"""
+    root = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=root + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    with tempfile.TemporaryDirectory() as cwd:
+        started = time.perf_counter()
+        output = subprocess.run([sys.executable, "-c", CHILD], cwd=cwd, env=env,
+                                capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.splitlines()[-1])
+        result['process'] = time.perf_counter() - started
+    return result
+
+def main():
+    """Запуск замеров и вывод медиан"""
+    parser = argparse.ArgumentParser(description="Замер времени запуска приложения")
+    parser.add_argument("--runs", type=int, default=5, help="число запусков")
+    parser.add_argument("--json", action="store_true", help="вывод в формате JSON")
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+    summary = {'runs': args.runs, 'heavy_modules': runs[-1]['heavy_modules']}
+    for key in ('import_gui', 'first_window', 'process'):
+        values = [run[key] for run in runs if run.get(key) is not None]
+        summary[key] = statistics.median(values) if values else None
+    if runs[-1].get('error'):
+        summary['error'] = runs[-1]['error']
+
+    if args.json:
+        print(json.dumps(summary, ensure_ascii=False))
+        return
+
+    for key, title in (('import_gui', "Импорт gui"), ('first_window', "Первое окно"),
+                       ('process', "Процесс целиком")):
+        value = summary[key]
+        print(f"{title}: " + (f"{value * 1000:.0f} мс" if value is not None else "нет данных"))
+    print("Загружены: " + (", ".join(summary['heavy_modules']) or "нет тяжелых библиотек"))
+    if 'error' in summary:
+        print(f"Окно не создано: {summary['error']}")
+
+if __name__ == "__main__":
+    main()
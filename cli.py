@@ -0,0 +1,249 @@
+# Командная строка (без графического интерфейса)
+#
+#   python main.py balance ledger.csv [--category Еда] [--from 2024-01-01]
+#   python main.py rollup *.csv --by month,type --format json
+#   python main.py top ledger.csv -n 20
+#   python main.py list ledger.csv --search кофе --output out/{name}.ndjson.gz
+#   python main.py chart *.csv --chart categories --output charts/{name}.png
+#
+# Несколько файлов обрабатываются параллельно в отдельных процессах.
+# Модуль не импортирует tkinter; графики строятся через Agg.
+
+import argparse
+import calendar
+import csv
+import heapq
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from models import FinanceManager, OperationType, date_error
+from snapshot import MAGIC
+from storage import DataStorage, export_operations, operation_record
+
+COMMANDS = ("balance", "list", "rollup", "top", "chart")
+CHARTS = ("income_expense", "categories", "top_expenses")
+
+def detect_format(path: str) -> str:
+    """Формат файла учета: "sqlite", "binary" или "csv" """
+    with open(path, 'rb') as f:
+        header = f.read(16)
+    if header.startswith(b"SQLite format 3"):
+        return "sqlite"
+    if header.startswith(MAGIC):
+        return "binary"
+    return "csv"
+
+def load_manager(path: str, backend: str = "list") -> FinanceManager:
+    """Загрузка файла учета в FinanceManager
+
+    SQLite открывается напрямую (запросы выполняются в базе), бинарный
+    снимок при backend="columnar" отображается в память, остальное
+    загружается через DataStorage (вместе с журналом, если он есть).
+    Файлы только читаются: журнал не обрезается и не сжимается.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Файл не найден: {path}")
+
+    file_format = detect_format(path)
+    if file_format == "sqlite":
+        return FinanceManager("sqlite", database=path)
+
+    journal = os.path.exists(path + ".journal") or os.path.exists(path + ".journal.compacting")
+    storage = DataStorage(path, journal=journal, binary=file_format == "binary", read_only=True)
+    manager = FinanceManager(backend)
+    if backend == "columnar" and file_format == "binary" and not storage.journal:
+        manager.load_columns(storage.load_columns())
+    else:
+        operations, next_id = storage.load_data()
+        manager.operations = operations
+        manager.next_id = next_id
+    return manager
+
+def output_path(template: Optional[str], path: str) -> Optional[str]:
+    """Имя выходного файла: {name} заменяется именем файла учета без расширения"""
+    if not template:
+        return None
+    name = os.path.splitext(os.path.basename(path))[0]
+    return template.replace("{name}", name)
+
+def month_bounds(start_date: Optional[str], end_date: Optional[str]) -> Optional[tuple]:
+    """Период в месяцах (ГГГГ-ММ), если он состоит из целых месяцев, иначе None"""
+    try:
+        if start_date and not (len(start_date) == 10 and start_date.endswith("-01")
+                               and date_error(start_date) is None):
+            return None
+        if end_date:
+            if len(end_date) != 10 or date_error(end_date) is not None:
+                return None
+            year, month, day = map(int, end_date.split("-"))
+            if day != calendar.monthrange(year, month)[1]:
+                return None
+    except ValueError:
+        return None
+    return (start_date[:7] if start_date else None, end_date[:7] if end_date else None)
+
+def get_filters(options: Dict[str, Any]) -> Dict[str, Any]:
+    """Фильтры FinanceManager из параметров командной строки"""
+    return {
+        'category': options.get('category'),
+        'op_type': OperationType(options['type']) if options.get('type') else None,
+        'start_date': options.get('start_date'),
+        'end_date': options.get('end_date'),
+        'text': options.get('search')
+    }
+
+def run_ledger(path: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    """Выполнение команды для одного файла учета (в рабочем процессе)"""
+    result: Dict[str, Any] = {'file': path}
+    try:
+        manager = load_manager(path, options.get('backend', "list"))
+        filters = get_filters(options)
+        command = options['command']
+
+        if command == "balance":
+            income, expense, count = manager.get_totals(**filters)
+            result.update(income=income, expense=expense,
+                          balance=round(income - expense, 2), count=count)
+
+        elif command == "list":
+            operations = manager.get_filtered_operations(**filters)
+            target = output_path(options.get('output'), path)
+            if target:
+                name = target.lower()
+                fmt = "ndjson" if ".ndjson" in name else "json" if ".json" in name else "csv"
+                compression = "gzip" if name.endswith(".gz") else "zstd" if name.endswith(".zst") else None
+                export_operations(operations, target, fmt, compression=compression)
+                result['output'] = target
+            else:
+                result['operations'] = [operation_record(op) for op in operations]
+            result['count'] = len(operations)
+
+        elif command == "rollup":
+            from analysis import DataAnalyzer
+            by = tuple(options.get('by') or ("month", "category", "type"))
+            months = month_bounds(filters['start_date'], filters['end_date'])
+            if months is not None and not filters['text']:
+                cube = DataAnalyzer(manager).rollup(
+                    by, category=filters['category'], op_type=filters['op_type'],
+                    start_month=months[0], end_month=months[1])
+            else:
+                # Период не из целых месяцев или поиск - куб по отобранным операциям
+                cube = DataAnalyzer.build_cube(manager.get_filtered_operations(**filters)).query(by)
+            result['by'] = list(by)
+            result['rows'] = [dict(zip(by, key), **values) for key, values in cube.items()]
+
+        elif command == "top":
+            n = options.get('n', 10)
+            if filters['text'] or filters['op_type'] == OperationType.INCOME:
+                # Поиск и тип не поддерживаются get_top_expenses - отбор по всем фильтрам
+                operations = heapq.nlargest(
+                    max(n, 0), (op for op in manager.get_filtered_operations(**filters)
+                                if op.type == OperationType.EXPENSE),
+                    key=lambda op: (op.cents, -op.id))
+            else:
+                operations = manager.get_top_expenses(n, category=filters['category'],
+                                                      start_date=filters['start_date'],
+                                                      end_date=filters['end_date'])
+            result['operations'] = [operation_record(op) for op in operations]
+
+        elif command == "chart":
+            from analysis import DataAnalyzer, render_chart
+            target = output_path(options.get('output'), path)
+            if not target:
+                raise ValueError("Для графика нужен параметр --output")
+            params = {'n': options.get('n', 10)} if options['chart'] == "top_expenses" else {}
+            png = render_chart(options['chart'],
+                               DataAnalyzer(manager).chart_data(options['chart'], **params), **params)
+            with open(target, 'wb') as f:
+                f.write(png)
+            result['output'] = target
+
+    except Exception as e:
+        result['error'] = str(e)
+    return result
+
+def run_many(paths: List[str], options: Dict[str, Any], workers: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Выполнение команды для нескольких файлов (параллельно, результаты по порядку файлов)"""
+    if workers is None:
+        workers = min(len(paths), os.cpu_count() or 1)
+    if workers <= 1 or len(paths) == 1:
+        return [run_ledger(path, options) for path in paths]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(run_ledger, paths, [options] * len(paths)))
+
+def print_text(result: Dict[str, Any], out):
+    """Вывод результата в текстовом виде"""
+    if 'error' in result:
+        return
+    name = result['file']
+    if 'income' in result:
+        print(f"{name}: доходы {result['income']:.2f}, расходы {result['expense']:.2f}, "
+              f"баланс {result['balance']:.2f}, операций {result['count']}", file=out)
+    elif 'rows' in result:
+        print(f"{name}:", file=out)
+        for row in result['rows']:
+            key = " ".join(str(row[column]) for column in result['by'])
+            print(f"  {key}: сумма {row['sum']:.2f}, операций {row['count']}, "
+                  f"мин {row['min']:.2f}, макс {row['max']:.2f}", file=out)
+    elif 'operations' in result:
+        writer = csv.writer(out)
+        for record in result['operations']:
+            writer.writerow(operation_row_from_record(record))
+    elif 'output' in result:
+        print(f"{name}: записано {result['output']}", file=out)
+
+def operation_row_from_record(record: Dict[str, Any]) -> list:
+    """Словарь операции -> строка CSV"""
+    return [record[field] for field in DataStorage.FIELDS]
+
+def build_parser() -> argparse.ArgumentParser:
+    """Разбор аргументов командной строки"""
+    parser = argparse.ArgumentParser(prog="main.py", description="Финансовый планировщик без GUI")
+    parser.add_argument("command", choices=COMMANDS, help="команда")
+    parser.add_argument("ledgers", nargs="+", help="файлы учета (CSV, бинарный снимок, SQLite)")
+    parser.add_argument("--category", help="категория")
+    parser.add_argument("--type", choices=[t.value for t in OperationType], help="тип операции")
+    parser.add_argument("--from", dest="start_date", help="начальная дата ГГГГ-ММ-ДД")
+    parser.add_argument("--to", dest="end_date", help="конечная дата ГГГГ-ММ-ДД")
+    parser.add_argument("--search", help="поиск по описанию")
+    parser.add_argument("--by", default="month,category,type",
+                        help="измерения rollup через запятую (month, category, type)")
+    parser.add_argument("-n", type=int, default=10, help="число операций для top и графика")
+    parser.add_argument("--chart", choices=CHARTS, default="income_expense", help="тип графика")
+    parser.add_argument("--output", help="выходной файл ({name} - имя файла учета)")
+    parser.add_argument("--format", choices=("text", "json"), default="text", help="формат вывода")
+    parser.add_argument("--backend", choices=("list", "columnar"), default="list",
+                        help="хранилище в памяти")
+    parser.add_argument("--workers", type=int, help="число процессов (по умолчанию - по числу ядер)")
+    return parser
+
+def main(argv: Optional[List[str]] = None, out=None) -> int:
+    """Точка входа командной строки, возвращает код завершения"""
+    out = out or sys.stdout
+    args = build_parser().parse_args(argv)
+    options = vars(args)
+    options['by'] = [column.strip() for column in args.by.split(",") if column.strip()]
+
+    if len(args.ledgers) > 1 and args.output and "{name}" not in args.output:
+        print("Для нескольких файлов --output должен содержать {name}", file=sys.stderr)
+        return 2
+
+    results = run_many(args.ledgers, options, args.workers)
+
+    if args.format == "json":
+        json.dump(results, out, ensure_ascii=False, indent=2)
+        print(file=out)
+    else:
+        for result in results:
+            print_text(result, out)
+
+    failed = [result for result in results if 'error' in result]
+    for result in failed:
+        print(f"{result['file']}: ошибка: {result['error']}", file=sys.stderr)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
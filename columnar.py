@@ -0,0 +1,341 @@
+# Колоночное хранилище операций (NumPy)
+
+from bisect import bisect_left
+from collections.abc import Sequence
+from datetime import date as Date
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from models import DailyTotals, Operation, OperationType, RunningTotals
+
+# Коды типов операций (порядок фиксирован)
+TYPES = list(OperationType)
+TYPE_CODES = {op_type: code for code, op_type in enumerate(TYPES)}
+
+# Номер дня 1970-01-01 (начало отсчета datetime64)
+EPOCH_ORDINAL = Date(1970, 1, 1).toordinal()
+
+def to_ordinal(value: str) -> int:
+    """Преобразование даты ГГГГ-ММ-ДД в номер дня"""
+    return Date.fromisoformat(value.strip()).toordinal()
+
+def from_ordinal(value: int) -> str:
+    """Преобразование номера дня в дату ГГГГ-ММ-ДД"""
+    return Date.fromordinal(int(value)).isoformat()
+
+class IsoDays:
+    """Все даты ГГГГ-ММ-ДД по возрастанию (для двоичного поиска без списка)"""
+
+    def __len__(self) -> int:
+        return Date.max.toordinal()
+
+    def __getitem__(self, index: int) -> str:
+        return Date.fromordinal(index + 1).isoformat()
+
+ISO_DAYS = IsoDays()
+
+def bound_ordinal(value: str, end: bool = False) -> int:
+    """Номер дня для границы фильтра по дате
+
+    Граница сравнивается со строками дат, как в списочном хранилище и SQLite,
+    поэтому допускаются неполные даты ("2024-02"): для начала периода -
+    первый день с датой >= value, для конца - последний день с датой <= value.
+    """
+    ordinal = bisect_left(ISO_DAYS, value) + 1
+    if end and (ordinal > len(ISO_DAYS) or from_ordinal(ordinal) != value):
+        ordinal -= 1
+    return ordinal
+
+class ColumnarStore:
+    """Хранилище операций в массивах NumPy
+
+    id, сумма и дата (номер дня) хранятся в отдельных массивах,
+    категория и тип - в виде кодов словаря. Удаление помечает строку
+    как удаленную, место освобождается при периодическом сжатии.
+    """
+
+    INITIAL_CAPACITY = 1024
+
+    def __init__(self):
+        """Инициализация хранилища"""
+        self.categories: List[str] = []
+        self.category_codes: Dict[str, int] = {}
+        self.descriptions: List[str] = []
+        self._rows: Optional[Dict[int, int]] = {}
+        self.size = 0
+        self.dead = 0
+        self._allocate(self.INITIAL_CAPACITY)
+
+    def _allocate(self, capacity: int):
+        """Выделение массивов заданной емкости"""
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.cents = np.zeros(capacity, dtype=np.int64)
+        self.days = np.zeros(capacity, dtype=np.int32)
+        self.category_idx = np.zeros(capacity, dtype=np.int32)
+        self.type_idx = np.zeros(capacity, dtype=np.int8)
+        self.alive = np.zeros(capacity, dtype=bool)
+
+    @classmethod
+    def from_snapshot(cls, columns) -> "ColumnarStore":
+        """Хранилище поверх колонок бинарного снимка (см. snapshot.load_columns)
+
+        Массивы снимка используются без копирования; копия создается
+        только при первом добавлении или сжатии.
+        """
+        store = cls()
+        records = columns.records
+        store.ids = records['id']
+        store.cents = records['cents']
+        store.days = records['day']
+        store.category_idx = records['category']
+        store.type_idx = records['type']
+        store.alive = np.ones(len(records), dtype=bool)
+        store.categories = list(columns.categories)
+        store.category_codes = {name: code for code, name in enumerate(store.categories)}
+        store.descriptions = columns.descriptions
+        store.size = len(records)
+        store._rows = None
+        return store
+
+    @property
+    def rows(self) -> Dict[int, int]:
+        """Отображение id -> номер строки (строится при первом обращении)"""
+        if self._rows is None:
+            live = np.flatnonzero(self.alive[:self.size])
+            self._rows = dict(zip(self.ids[live].tolist(), live.tolist()))
+        return self._rows
+
+    def _columns(self):
+        """Список всех колонок"""
+        return [self.ids, self.cents, self.days,
+                self.category_idx, self.type_idx, self.alive]
+
+    def _reserve(self, count: int):
+        """Увеличение емкости массивов при необходимости"""
+        needed = self.size + count
+        if needed <= len(self.ids):
+            return
+
+        capacity = max(len(self.ids) * 2, needed, self.INITIAL_CAPACITY)
+        old = self._columns()
+        self._allocate(capacity)
+        for new, column in zip(self._columns(), old):
+            new[:self.size] = column[:self.size]
+
+    def _category_code(self, category: str) -> int:
+        """Код категории (новые категории добавляются в словарь)"""
+        code = self.category_codes.get(category)
+        if code is None:
+            code = len(self.categories)
+            self.categories.append(category)
+            self.category_codes[category] = code
+        return code
+
+    def __len__(self) -> int:
+        return self.size - self.dead
+
+    def __iter__(self) -> Iterator[Operation]:
+        for row in np.flatnonzero(self.alive[:self.size]):
+            yield self.row(row)
+
+    def view(self) -> "ColumnarView":
+        """Представление в виде списка операций"""
+        return ColumnarView(self)
+
+    def build_totals(self) -> RunningTotals:
+        """Построение нарастающих итогов по всем операциям"""
+        return build_totals(self)
+
+    def row(self, row: int) -> Operation:
+        """Материализация строки в объект Operation"""
+        return Operation.from_cents(
+            id=int(self.ids[row]),
+            cents=int(self.cents[row]),
+            category=self.categories[self.category_idx[row]],
+            date=from_ordinal(self.days[row]),
+            type=TYPES[self.type_idx[row]],
+            description=self.descriptions[row]
+        )
+
+    def append(self, operation: Operation):
+        """Добавление операции"""
+        self._reserve(1)
+        row = self.size
+        self.ids[row] = operation.id
+        self.cents[row] = operation.cents
+        self.days[row] = to_ordinal(operation.date)
+        self.category_idx[row] = self._category_code(operation.category)
+        self.type_idx[row] = TYPE_CODES[operation.type]
+        self.alive[row] = True
+        self.descriptions.append(operation.description)
+        self.rows[operation.id] = row
+        self.size += 1
+
+    def extend(self, operations):
+        """Добавление нескольких операций"""
+        operations = list(operations)
+        self._reserve(len(operations))
+        for operation in operations:
+            self.append(operation)
+
+    def clear(self):
+        """Удаление всех операций"""
+        self.__init__()
+
+    def close(self):
+        """Освобождение ресурсов (массивы снимка освобождаются сборщиком мусора)"""
+
+    def get(self, operation_id: int) -> Optional[Operation]:
+        """Поиск операции по id"""
+        row = self.rows.get(operation_id)
+        return self.row(row) if row is not None else None
+
+    def remove(self, operation_id: int) -> Optional[Operation]:
+        """Удаление операции по id"""
+        row = self.rows.pop(operation_id, None)
+        if row is None:
+            return None
+
+        operation = self.row(row)
+        self.alive[row] = False
+        self.dead += 1
+        if self.dead > self.INITIAL_CAPACITY and self.dead * 2 > self.size:
+            self.compact()
+        return operation
+
+    def replace(self, operation: Operation) -> Optional[Operation]:
+        """Замена операции с тем же id на месте, возвращает прежнюю"""
+        row = self.rows.get(operation.id)
+        if row is None:
+            return None
+        
+        old = self.row(row)
+        self.cents[row] = operation.cents
+        self.days[row] = to_ordinal(operation.date)
+        self.category_idx[row] = self._category_code(operation.category)
+        self.type_idx[row] = TYPE_CODES[operation.type]
+        self.descriptions[row] = operation.description
+        return old
+    
+    def compact(self):
+        """Сжатие массивов (удаление помеченных строк)"""
+        keep = np.flatnonzero(self.alive[:self.size])
+        for column in self._columns():
+            column[:len(keep)] = column[keep]
+            column[len(keep):self.size] = 0
+
+        self.descriptions = [self.descriptions[row] for row in keep]
+        self.size = len(keep)
+        self.dead = 0
+        self._rows = None
+
+    def mask(self, category: Optional[str] = None,
+             op_type: Optional[OperationType] = None,
+             start_date: Optional[str] = None,
+             end_date: Optional[str] = None) -> np.ndarray:
+        """Булева маска строк, подходящих под фильтры"""
+        n = self.size
+        mask = self.alive[:n].copy()
+
+        if category:
+            code = self.category_codes.get(category.strip())
+            if code is None:
+                mask[:] = False
+                return mask
+            mask &= self.category_idx[:n] == code
+
+        if op_type:
+            mask &= self.type_idx[:n] == TYPE_CODES[op_type]
+
+        if start_date:
+            mask &= self.days[:n] >= bound_ordinal(start_date)
+
+        if end_date:
+            mask &= self.days[:n] <= bound_ordinal(end_date, end=True)
+
+        return mask
+
+    def select(self, **filters) -> List[Operation]:
+        """Список операций, подходящих под фильтры"""
+        return [self.row(row) for row in np.flatnonzero(self.mask(**filters))]
+
+    def top(self, n: int, **filters) -> List[Operation]:
+        """n операций с наибольшей суммой (частичная сортировка)"""
+        rows = np.flatnonzero(self.mask(**filters))
+        cents = self.cents[rows]
+        if len(rows) > n:
+            # Порог n-й по величине суммы; равные порогу строки упорядочиваются по id
+            keep = cents >= -np.partition(-cents, n - 1)[n - 1]
+            rows, cents = rows[keep], cents[keep]
+        order = np.lexsort((self.ids[rows], -cents))[:n]
+        return [self.row(row) for row in rows[order]]
+
+def build_totals(store: ColumnarStore) -> RunningTotals:
+    """Построение нарастающих итогов по колонкам (векторно, без объектов Operation)"""
+    totals = RunningTotals()
+    live = np.flatnonzero(store.alive[:store.size])
+    if not len(live):
+        return totals
+
+    cents = store.cents[live]
+    income = store.type_idx[live] == TYPE_CODES[OperationType.INCOME]
+    days = store.days[live].astype(np.int64)
+    categories = store.category_idx[live].astype(np.int64)
+
+    def grouped(keys):
+        """Уникальные ключи и итоги [доходы, расходы, число доходов, число расходов]"""
+        unique, inverse = np.unique(keys, return_inverse=True)
+        columns = [np.where(income, cents, 0), np.where(income, 0, cents),
+                   income.astype(np.int64), (~income).astype(np.int64)]
+        sums = np.stack([np.bincount(inverse, weights=c, minlength=len(unique))
+                         for c in columns], axis=1)
+        return unique.tolist(), np.rint(sums).astype(np.int64).tolist()
+
+    _, (total,) = grouped(np.zeros(len(live), dtype=np.int64))
+    totals.total = total
+
+    for code, entry in zip(*grouped(categories)):
+        totals.by_category[store.categories[code]] = entry
+
+    months = (days - EPOCH_ORDINAL).astype('datetime64[D]').astype('datetime64[M]')
+    for month, entry in zip(*grouped(months.astype(np.int64))):
+        totals.by_month[str(np.datetime64(month, 'M'))] = entry
+
+    for day, entry in zip(*grouped(days)):
+        date = from_ordinal(day)
+        totals.daily.days.append(date)
+        totals.daily.values[date] = entry
+
+    for key, entry in zip(*grouped(categories << 32 | days)):
+        category = store.categories[key >> 32]
+        daily = totals.daily_by_category.get(category)
+        if daily is None:
+            daily = totals.daily_by_category[category] = DailyTotals()
+        date = from_ordinal(key & 0xFFFFFFFF)
+        daily.days.append(date)
+        daily.values[date] = entry
+
+    return totals
+
+class ColumnarView(Sequence):
+    """Представление колоночного хранилища в виде списка операций"""
+
+    def __init__(self, store: ColumnarStore):
+        self.store = store
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def __iter__(self) -> Iterator[Operation]:
+        return iter(self.store)
+
+    def __getitem__(self, index):
+        rows = np.flatnonzero(self.store.alive[:self.store.size])[index]
+        if isinstance(index, slice):
+            return [self.store.row(row) for row in rows]
+        return self.store.row(rows)
+
+    def copy(self) -> List[Operation]:
+        """Копия в виде обычного списка"""
+        return list(self)
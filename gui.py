@@ -1,28 +1,63 @@
+import base64
+import os
+import queue
 import tkinter as tk
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from tkinter import ttk, messagebox, filedialog
 from datetime import datetime
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 
-from models import FinanceManager, OperationType
-from storage import DataStorage
-from analysis import DataAnalyzer
+import profiling
+from models import FinanceManager, OperationType, date_error, text_matches
+from storage import DataStorage, SaveScheduler
+from analysis import DataAnalyzer, prewarm, render_chart
+from virtual_tree import SortOrders, VirtualTreeview
 
 class FinancialApp:
     """Главное окно приложения"""
     
+    # Ключи сортировки по колонкам таблицы
+    SORT_KEYS = {
+        "id": lambda op: op.id,
+        "date": lambda op: op.date,
+        "type": lambda op: op.type.value,
+        "category": lambda op: op.category,
+        "amount": lambda op: op.cents,
+        "description": lambda op: op.description,
+    }
+    
+    # Пакеты изменений крупнее этого применяются полным перестроением списка
+    INCREMENTAL_LIMIT = 1000
+    
     def __init__(self):
         """Инициализация приложения"""
         # Менеджеры
         self.manager = FinanceManager()
-        self.storage = DataStorage()
+        self.storage = DataStorage(journal=True)
+        self.saver = SaveScheduler(self.storage)
+        self.shown_saves = 0
         self.analyzer = DataAnalyzer(self.manager)
         
         # Переменные для сортировки и фильтрации
-        self.sort_column = "date"
+        self.sort_columns = ["date"]
         self.sort_reverse = True
         self.current_filters = {}
         
+        # Порядки сортировки результата для таблицы и отложенное обновление
+        self.sort_orders = None
+        self.rows_stale = True
+        self.update_pending = False
+        self.shown_categories = None
+        
+        # Построение графиков в рабочем потоке
+        self.chart_executor = ThreadPoolExecutor(max_workers=1)
+        self.chart_results = queue.Queue()
+        self.chart_cache = OrderedDict()
+        self.chart_pending = set()
+        
+        # Панель замеров (см. show_profiler)
+        self.profiler_window = None
+        
         # Загрузка данных
         self.load_data()
         
@@ -31,12 +66,22 @@ class FinancialApp:
         self.root.title("Финансовый планировщик")
         self.root.geometry("1100x650")
         
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
         # Создание интерфейса
         self.create_widgets()
         
+        # Изменения данных применяются к таблице по событиям
+        self.manager.subscribe(self.on_data_changed)
+        
         # Обновление данных
         self.refresh_all()
+        self.root.after(self.SAVE_POLL_MS, self.poll_saves)
+        
+        # matplotlib загружается в фоне после появления окна
+        self.root.after(self.PREWARM_DELAY_MS, lambda: self.chart_executor.submit(prewarm))
     
+    @profiling.timed("gui.load_data")
     def load_data(self):
         """Загрузка данных"""
         operations, next_id = self.storage.load_data()
@@ -44,8 +89,58 @@ class FinancialApp:
         self.manager.next_id = next_id
     
     def save_data(self):
-        """Сохранение данных"""
-        self.storage.save_data(self.manager.operations)
+        """Сохранение данных (полный снимок в фоновом потоке)"""
+        self.saver.save_snapshot(self.manager.operations)
+    
+    def save_added(self, first_id):
+        """Сохранение операций, добавленных начиная с first_id"""
+        if self.manager.next_id - first_id >= self.storage.COMPACT_RECORDS:
+            # Крупный импорт - сразу новый снимок вместо записей журнала
+            self.save_data()
+            return
+        
+        for op_id in range(first_id, self.manager.next_id):
+            operation = self.manager.get_operation(op_id)
+            if operation is not None:
+                self.saver.save_operation(operation)
+    
+    def save_updated(self, op_id):
+        """Сохранение измененной операции"""
+        self.saver.save_operation(self.manager.get_operation(op_id))
+    
+    def save_deleted(self, op_ids):
+        """Сохранение удаления операций"""
+        for op_id in op_ids:
+            self.saver.delete_operation(op_id)
+    
+    SAVE_POLL_MS = 500
+    
+    def poll_saves(self):
+        """Отображение результата фонового сохранения и сжатие журнала"""
+        if self.saver.saves != self.shown_saves:
+            self.shown_saves = self.saver.saves
+            if self.saver.last_error is not None:
+                self.save_label.config(text=f"Ошибка сохранения: {self.saver.last_error}")
+            else:
+                self.save_label.config(
+                    text=f"Сохранено ({self.saver.last_count}): {self.saver.last_latency * 1000:.0f} мс")
+            
+            # Журнал разросся - новый снимок
+            if self.storage.needs_compaction():
+                self.save_data()
+        
+        profiling.flush()
+        self.root.after(self.SAVE_POLL_MS, self.poll_saves)
+    
+    def on_close(self):
+        """Закрытие приложения (с записью несохраненных изменений)"""
+        self.chart_executor.shutdown(wait=False, cancel_futures=True)
+        self.saver.close()
+        self.storage.close()
+        if self.saver.last_error is not None:
+            messagebox.showerror("Ошибка сохранения",
+                                 f"Часть изменений не сохранена: {self.saver.last_error}")
+        self.root.destroy()
     
     def create_widgets(self):
         """Создание элементов интерфейса"""
@@ -101,6 +196,23 @@ class FinancialApp:
                                                  width=15)
         self.filter_category_combo.grid(row=0, column=3, padx=5, sticky="w")
         
+        # Период и поиск по описанию
+        ttk.Label(filter_frame, text="С:").grid(row=1, column=0, sticky="w", pady=(5, 0))
+        self.filter_start_var = tk.StringVar()
+        ttk.Entry(filter_frame, textvariable=self.filter_start_var,
+                 width=12).grid(row=1, column=1, padx=5, pady=(5, 0), sticky="w")
+        
+        ttk.Label(filter_frame, text="По:").grid(row=1, column=2, sticky="w", padx=(10, 0), pady=(5, 0))
+        self.filter_end_var = tk.StringVar()
+        ttk.Entry(filter_frame, textvariable=self.filter_end_var,
+                 width=12).grid(row=1, column=3, padx=5, pady=(5, 0), sticky="w")
+        
+        ttk.Label(filter_frame, text="Поиск:").grid(row=2, column=0, sticky="w", pady=(5, 0))
+        self.filter_text_var = tk.StringVar()
+        search_entry = ttk.Entry(filter_frame, textvariable=self.filter_text_var)
+        search_entry.grid(row=2, column=1, columnspan=3, padx=5, pady=(5, 0), sticky="ew")
+        search_entry.bind("<Return>", lambda e: self.apply_filters())
+        
         # Кнопки фильтров
         ttk.Button(filter_frame, text="Применить", command=self.apply_filters,
                   width=10).grid(row=0, column=4, padx=(10, 5))
@@ -111,9 +223,10 @@ class FinancialApp:
         list_frame = ttk.LabelFrame(self.root, text="Операции", padding=10)
         list_frame.grid(row=2, column=0, padx=10, pady=5, sticky="nsew")
         
-        # Таблица
+        # Таблица (создаются только видимые строки)
         columns = ("id", "date", "type", "category", "amount", "description")
-        self.tree = ttk.Treeview(list_frame, columns=columns, show="headings", height=12)
+        self.table = VirtualTreeview(list_frame, columns, self.format_row, height=12)
+        self.tree = self.table.tree
         
         # Заголовки с сортировкой
         for col in columns:
@@ -121,14 +234,12 @@ class FinancialApp:
                              command=lambda c=col: self.sort_by(c))
             width = 50 if col == "id" else 100 if col == "date" else 80 if col == "type" else 120 if col == "category" else 100 if col == "amount" else 200
             self.tree.column(col, width=width, stretch=(col == "description"))
-        
-        # Скроллбар
-        scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.bind("<Shift-Button-1>", self.on_heading_shift_click)
+        self.tree.bind("<<TreeviewSelect>>", self.on_select, add="+")
+        self.form_id = None
         
         # Размещение
-        self.tree.grid(row=0, column=0, sticky="nsew")
-        scrollbar.grid(row=0, column=1, sticky="ns")
+        self.table.grid(row=0, column=0, sticky="nsew")
         
         # Панель управления
         control_frame = ttk.Frame(self.root)
@@ -137,6 +248,7 @@ class FinancialApp:
         # Кнопки управления
         buttons = [
             ("Обновить", self.refresh_all),
+            ("Изменить", self.edit_selected),
             ("Удалить", self.delete_selected),
             ("Баланс", self.show_balance),
             ("Экспорт CSV", lambda: self.export_data("csv")),
@@ -149,6 +261,12 @@ class FinancialApp:
                 row=0, column=i, padx=2, sticky="ew")
             control_frame.columnconfigure(i, weight=1)
         
+        # Строка состояния
+        self.status_label = ttk.Label(self.root, text="", anchor="w")
+        self.status_label.grid(row=4, column=0, padx=10, pady=(0, 5), sticky="ew")
+        self.save_label = ttk.Label(self.root, text="", anchor="e")
+        self.save_label.grid(row=4, column=1, padx=10, pady=(0, 5), sticky="ew")
+        
         # Панель анализа
         analysis_frame = ttk.LabelFrame(self.root, text="Анализ", padding=10)
         analysis_frame.grid(row=0, column=1, rowspan=4, padx=10, pady=10, sticky="nsew")
@@ -160,6 +278,9 @@ class FinancialApp:
                   command=self.plot_categories, width=20).pack(fill=tk.X, pady=5)
         ttk.Button(analysis_frame, text="Топ расходов", 
                   command=self.plot_top_expenses, width=20).pack(fill=tk.X, pady=5)
+        ttk.Button(analysis_frame, text="Профилирование", 
+                  command=self.show_profiler, width=20).pack(fill=tk.X, pady=5)
+        self.root.bind("<F12>", lambda e: self.show_profiler())
         
         # Статистика
         stats_frame = ttk.LabelFrame(analysis_frame, text="Статистика", padding=10)
@@ -178,93 +299,193 @@ class FinancialApp:
         list_frame.rowconfigure(0, weight=1)
         list_frame.columnconfigure(0, weight=1)
     
-    def sort_by(self, column):
-        """Сортировка по колонке"""
-        if self.sort_column == column:
+    def sort_by(self, column, append=False):
+        """Сортировка по колонке (append - добавить колонку к текущей сортировке)"""
+        if append and column not in self.sort_columns:
+            self.sort_columns.append(column)
+        elif append or self.sort_columns == [column]:
             self.sort_reverse = not self.sort_reverse
         else:
-            self.sort_column = column
+            self.sort_columns = [column]
             self.sort_reverse = False
-        self.refresh_list()
+        self.show_sorted()
+    
+    def on_heading_shift_click(self, event):
+        """Shift+щелчок по заголовку - дополнительная колонка сортировки"""
+        if self.tree.identify_region(event.x, event.y) != "heading":
+            return None
+        column = self.tree.identify_column(event.x)
+        self.sort_by(self.tree["columns"][int(column[1:]) - 1], append=True)
+        return "break"
+    
+    @profiling.timed("gui.show_sorted")
+    def show_sorted(self, prune=False):
+        """Отображение результата в текущем порядке (порядок берется из кэша)"""
+        rows = self.sort_orders.get(tuple(self.sort_columns), self.sort_reverse)
+        with profiling.span("gui.treeview", rows=len(rows)):
+            self.table.set_rows(rows, prune=prune)
+        
+        arrow = " ▼" if self.sort_reverse else " ▲"
+        for col in self.tree["columns"]:
+            text = col.capitalize()
+            if col in self.sort_columns:
+                text += arrow
+                if len(self.sort_columns) > 1:
+                    text += str(self.sort_columns.index(col) + 1)
+            self.tree.heading(col, text=text)
     
     def apply_filters(self):
         """Применение фильтров"""
-        self.current_filters = {}
+        filters = {}
         
         # Тип операции
         filter_type = self.filter_type_var.get()
         if filter_type != "все":
-            self.current_filters['type'] = OperationType(filter_type)
+            filters['type'] = OperationType(filter_type)
         
         # Категория
         filter_category = self.filter_category_var.get()
         if filter_category != "все":
-            self.current_filters['category'] = filter_category.strip()
+            filters['category'] = filter_category.strip()
+        
+        # Период (ГГГГ-ММ-ДД, границы включаются)
+        for key, var in (('start_date', self.filter_start_var), ('end_date', self.filter_end_var)):
+            value = var.get().strip()
+            if not value:
+                continue
+            # Та же проверка, что и для операций: строки сравниваются с датами
+            # учета, поэтому "2024-1-5" не допускается
+            error = date_error(value)
+            if error:
+                messagebox.showerror("Ошибка", f"Дата фильтра: {error}")
+                return
+            filters[key] = value
         
+        # Поиск по описанию
+        text = self.filter_text_var.get().strip()
+        if text:
+            filters['text'] = text
+        
+        self.current_filters = filters
         self.refresh_list()
+        self.refresh_stats()
     
     def reset_filters(self):
         """Сброс фильтров"""
         self.filter_type_var.set("все")
         self.filter_category_var.set("все")
+        self.filter_start_var.set("")
+        self.filter_end_var.set("")
+        self.filter_text_var.set("")
         self.current_filters = {}
         self.refresh_list()
+        self.refresh_stats()
+    
+    def get_filter_kwargs(self):
+        """Параметры текущих фильтров для FinanceManager"""
+        return {
+            'category': self.current_filters.get('category'),
+            'op_type': self.current_filters.get('type'),
+            'start_date': self.current_filters.get('start_date'),
+            'end_date': self.current_filters.get('end_date'),
+            'text': self.current_filters.get('text')
+        }
     
     def get_filtered_operations(self):
         """Получение отфильтрованных операций"""
-        return self.manager.get_filtered_operations(
-            category=self.current_filters.get('category'),
-            op_type=self.current_filters.get('type')
-        )
+        return self.manager.get_filtered_operations(**self.get_filter_kwargs())
+    
+    @staticmethod
+    def format_row(op):
+        """Значения строки таблицы для операции"""
+        return (op.id, op.date, op.type.value, op.category, f"{op.amount:.2f}", op.description)
     
+    @profiling.timed("gui.refresh_list")
     def refresh_list(self):
         """Обновление списка операций"""
-        # Очистка
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
-        # Получение и сортировка
-        operations = self.get_filtered_operations()
-        
-        # Сортировка
-        if self.sort_column == "id":
-            operations.sort(key=lambda x: x.id, reverse=self.sort_reverse)
-        elif self.sort_column == "date":
-            operations.sort(key=lambda x: x.date, reverse=self.sort_reverse)
-        elif self.sort_column == "type":
-            operations.sort(key=lambda x: x.type.value, reverse=self.sort_reverse)
-        elif self.sort_column == "category":
-            operations.sort(key=lambda x: x.category, reverse=self.sort_reverse)
-        elif self.sort_column == "amount":
-            operations.sort(key=lambda x: x.amount, reverse=self.sort_reverse)
-        elif self.sort_column == "description":
-            operations.sort(key=lambda x: x.description, reverse=self.sort_reverse)
-        
-        # Добавление в таблицу
-        for op in operations:
-            self.tree.insert("", tk.END, values=(
-                op.id,
-                op.date,
-                op.type.value,
-                op.category,
-                f"{op.amount:.2f}",
-                op.description
-            ))
+        # Получение (порядки сортировки строятся при первом обращении)
+        self.sort_orders = SortOrders(self.get_filtered_operations(), self.SORT_KEYS)
+        self.rows_stale = False
+        
+        # Таблица отображает только видимое окно отсортированного списка
+        self.show_sorted(prune=True)
     
     def refresh_all(self):
         """Полное обновление интерфейса"""
-        # Обновление категорий в фильтре
-        categories = ["все"] + self.manager.get_categories()
-        self.filter_category_combo['values'] = categories
-        
-        # Обновление списка
         self.refresh_list()
-        
-        # Обновление статистики
-        ops = self.get_filtered_operations()
-        balance = self.manager.get_balance(ops)
+        self.refresh_stats()
+    
+    @profiling.timed("gui.refresh_stats")
+    def refresh_stats(self):
+        """Обновление категорий в фильтре и статистики"""
+        # Список значений фильтра меняется только при изменении набора категорий
+        categories = self.manager.get_categories()
+        if categories != self.shown_categories:
+            self.shown_categories = categories
+            self.filter_category_combo['values'] = ["все"] + categories
+        
+        # Обновление статистики (по нарастающим итогам)
+        total_income, total_expense, count = self.manager.get_totals(**self.get_filter_kwargs())
+        balance = total_income - total_expense
         self.balance_label.config(text=f"Баланс: {balance:.2f} руб")
-        self.count_label.config(text=f"Операций: {len(ops)}")
+        self.count_label.config(text=f"Операций: {count}")
+    
+    def matches_filters(self, op):
+        """Проверка операции на соответствие текущим фильтрам"""
+        kwargs = self.get_filter_kwargs()
+        if kwargs['category'] and op.category != kwargs['category']:
+            return False
+        if kwargs['op_type'] and op.type != kwargs['op_type']:
+            return False
+        if kwargs['start_date'] and op.date < kwargs['start_date']:
+            return False
+        if kwargs['end_date'] and op.date > kwargs['end_date']:
+            return False
+        if kwargs['text'] and not text_matches(op.description, kwargs['text']):
+            return False
+        return True
+    
+    @profiling.timed("gui.on_data_changed")
+    def on_data_changed(self, event, operations):
+        """Применение изменений FinanceManager к порядкам сортировки
+
+        Одиночные изменения вставляются и удаляются двоичным поиском,
+        крупные пакеты и замена данных приводят к перестроению списка.
+        Перерисовка выполняется один раз после обработки событий.
+        """
+        if self.sort_orders is None or event == "reset" or len(operations) > self.INCREMENTAL_LIMIT:
+            self.rows_stale = True
+        elif not self.rows_stale:
+            if event == "update":
+                removed, added = operations[:1], operations[1:]
+            elif event == "add":
+                removed, added = [], operations
+            else:
+                removed, added = operations, []
+            
+            for op in removed:
+                self.sort_orders.remove(op)
+                if event == "delete":
+                    self.table.selected.discard(op.id)
+            for op in added:
+                if self.matches_filters(op):
+                    self.sort_orders.insert(op)
+                elif event == "update":
+                    self.table.selected.discard(op.id)
+        
+        if not self.update_pending:
+            self.update_pending = True
+            self.root.after_idle(self.update_view)
+    
+    @profiling.timed("gui.update_view")
+    def update_view(self):
+        """Отложенное обновление таблицы и статистики"""
+        self.update_pending = False
+        if self.rows_stale:
+            self.refresh_list()
+        else:
+            self.table.render()
+        self.refresh_stats()
     
     def add_operation(self):
         """Добавление новой операции"""
@@ -286,9 +507,9 @@ class FinancialApp:
                 return
             
             # Добавление
+            first_id = self.manager.next_id
             if self.manager.add_operation(amount, category, date, op_type, description):
-                self.save_data()
-                self.refresh_all()
+                self.save_added(first_id)
                 messagebox.showinfo("Успех", "Операция добавлена")
                 
                 # Очистка полей
@@ -304,27 +525,75 @@ class FinancialApp:
             messagebox.showerror("Ошибка", f"Ошибка: {e}")
     
     def delete_selected(self):
-        """Удаление выбранной операции"""
-        selection = self.tree.selection()
-        if not selection:
+        """Удаление выбранных операций"""
+        op_ids = self.table.selected_keys()
+        if not op_ids:
             messagebox.showwarning("Внимание", "Выберите операцию")
             return
         
-        item = selection[0]
-        op_id = int(self.tree.item(item, "values")[0])
+        question = "Удалить операцию?" if len(op_ids) == 1 else f"Удалить операции ({len(op_ids)})?"
         
-        if messagebox.askyesno("Подтверждение", "Удалить операцию?"):
-            if self.manager.delete_operation(op_id):
-                self.save_data()
-                self.refresh_all()
-                messagebox.showinfo("Успех", "Операция удалена")
+        if messagebox.askyesno("Подтверждение", question):
+            if self.manager.delete_operations(op_ids):
+                self.save_deleted(op_ids)
+                messagebox.showinfo("Успех", "Операция удалена" if len(op_ids) == 1 else "Операции удалены")
+    
+    def on_select(self, event):
+        """Заполнение полей ввода значениями выбранной операции (для изменения)"""
+        op_ids = self.table.selected_keys()
+        if len(op_ids) != 1:
+            self.form_id = None
+            return
+        if op_ids[0] == self.form_id:
+            return
+        operation = self.manager.get_operation(op_ids[0])
+        if operation is None:
+            return
+        self.form_id = operation.id
+        self.type_var.set(operation.type.value)
+        self.amount_var.set(f"{operation.amount:.2f}")
+        self.category_var.set(operation.category)
+        self.date_var.set(operation.date)
+        self.description_var.set(operation.description)
+    
+    def edit_selected(self):
+        """Изменение выбранной операции по заполненным полям ввода
+
+        Поля заполняются при выделении операции, поэтому неизмененные
+        тип и дата остаются прежними.
+        """
+        op_ids = self.table.selected_keys()
+        if len(op_ids) != 1:
+            messagebox.showwarning("Внимание", "Выберите одну операцию")
+            return
+        
+        try:
+            amount = self.amount_var.get().strip()
+            amount = float(amount) if amount else None
+            if amount is not None and amount <= 0:
+                messagebox.showerror("Ошибка", "Сумма должна быть положительной")
+                return
+        except ValueError:
+            messagebox.showerror("Ошибка", "Введите корректную сумму")
+            return
+        
+        # Пустые поля не изменяются
+        if self.manager.update_operation(
+                op_ids[0],
+                amount=amount,
+                category=self.category_var.get().strip() or None,
+                date=self.date_var.get().strip() or None,
+                operation_type=OperationType(self.type_var.get()),
+                description=self.description_var.get().strip() or None):
+            self.save_updated(op_ids[0])
+            messagebox.showinfo("Успех", "Операция изменена")
+        else:
+            messagebox.showerror("Ошибка", "Неверные данные (проверьте дату)")
     
     def show_balance(self):
         """Показ баланса"""
-        ops = self.get_filtered_operations()
-        balance = self.manager.get_balance(ops)
-        total_income = sum(op.amount for op in ops if op.type == OperationType.INCOME)
-        total_expense = sum(op.amount for op in ops if op.type == OperationType.EXPENSE)
+        total_income, total_expense, _ = self.manager.get_totals(**self.get_filter_kwargs())
+        balance = total_income - total_expense
         
         messagebox.showinfo("Баланс",
                           f"Баланс: {balance:.2f} руб\n"
@@ -332,12 +601,13 @@ class FinancialApp:
                           f"Расходы: {total_expense:.2f} руб")
     
     def export_data(self, format_type):
-        """Экспорт данных"""
+        """Экспорт данных (сжатие и NDJSON - по расширению файла)"""
         if format_type == "csv":
-            filetypes = [("CSV files", "*.csv")]
+            filetypes = [("CSV files", "*.csv"), ("CSV gzip", "*.csv.gz"), ("CSV zstd", "*.csv.zst")]
             defaultext = ".csv"
         else:
-            filetypes = [("JSON files", "*.json")]
+            filetypes = [("JSON files", "*.json"), ("NDJSON files", "*.ndjson"),
+                         ("JSON gzip", "*.json.gz *.ndjson.gz"), ("JSON zstd", "*.json.zst *.ndjson.zst")]
             defaultext = ".json"
         
         filename = filedialog.asksaveasfilename(
@@ -346,11 +616,16 @@ class FinancialApp:
         )
         
         if filename:
-            ops = self.get_filtered_operations()
+            name = filename.lower()
+            compression = "gzip" if name.endswith(".gz") else "zstd" if name.endswith(".zst") else None
+            
+            # Без фильтров операции читаются прямо из хранилища, без копии списка
+            ops = self.get_filtered_operations() if self.current_filters else self.manager.operations
             if format_type == "csv":
-                success = self.storage.export_to_csv(ops, filename)
+                success = self.storage.export_to_csv(ops, filename, compression=compression)
             else:
-                success = self.storage.export_to_json(ops, filename)
+                success = self.storage.export_to_json(ops, filename, compression=compression,
+                                                      ndjson=".ndjson" in name)
             
             if success:
                 messagebox.showinfo("Успех", f"Данные экспортированы в {filename}")
@@ -358,8 +633,8 @@ class FinancialApp:
                 messagebox.showerror("Ошибка", "Не удалось экспортировать данные")
     
     def import_data(self):
-        """Импорт данных."""
-        filename = filedialog.askopenfilename(
+        """Импорт данных (можно выбрать несколько файлов)."""
+        filenames = filedialog.askopenfilenames(
             filetypes=[
                 ("Все файлы", "*.*"),
                 ("CSV files", "*.csv"),
@@ -367,113 +642,243 @@ class FinancialApp:
             ]
         )
         
-        if not filename:
+        if not filenames:
+            return
+        
+        if len(filenames) == 1:
+            question = f"Импортировать данные из {os.path.basename(filenames[0])}?"
+        else:
+            question = f"Импортировать данные из {len(filenames)} файлов?"
+        if not messagebox.askyesno("Подтверждение", question):
             return
         
         try:
+            if len(filenames) > 1:
+                # Несколько файлов разбираются параллельно
+                self.status_label.config(text=f"Импорт {len(filenames)} файлов...")
+                self.root.update_idletasks()
+                chunks = self.storage.import_many(filenames)
+                self.process_imported_chunks(chunks)
+                return
+            
             # Определяем обработчик по расширению
+            filename = filenames[0]
             if filename.lower().endswith('.json'):
-                imported = self.import_json_file(filename)  # Используем метод из DataStorage
+                chunks = self.storage.iter_json_chunks(filename, progress=self.show_import_progress)
             else:
-                imported = self.storage.import_from_csv(filename)
+                chunks = self.storage.iter_csv_chunks(filename, progress=self.show_import_progress)
             
-            self.process_imported_data(imported, filename)
+            self.process_imported_data(chunks, filename)
             
         except Exception as e:
             messagebox.showerror("Ошибка", f"Ошибка импорта: {e}")
-
-
-    def import_json_file(self, filename):
-        """Импорт JSON файла."""
-        try:
-            import json
-            with open(filename, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            imported = []
-            if isinstance(data, list):
-                for item in data:
-                    try:
-                        imported.append({
-                            'amount': float(item.get('amount', 0)),
-                            'category': str(item.get('category', '')).strip(),
-                            'date': str(item.get('date', '2024-01-01')).strip(),
-                            'type': str(item.get('type', 'расход')).strip(),
-                            'description': str(item.get('description', '')).strip(),
-                            'id': int(item.get('id', 0))
-                        })
-                    except Exception:
-                        continue
-            return imported
-        except Exception as e:
-            print(f"JSON import error: {e}")
-            return []
-
-    def process_imported_data(self, imported, filename):
-        """Обработка импортированных данных"""
-        if not imported:
-            messagebox.showerror("Ошибка", "Не удалось импортировать данные")
-            return
-        
-        if not messagebox.askyesno("Подтверждение", f"Импортировать {len(imported)} записей?"):
-            return
+        finally:
+            self.status_label.config(text="")
+    
+    def show_import_progress(self, done, total):
+        """Отображение хода импорта в строке состояния"""
+        percent = done * 100 // total if total else 100
+        self.status_label.config(text=f"Импорт: {percent}%")
+        self.root.update_idletasks()
+    
+    def process_imported_chunks(self, chunks):
+        """Добавление результатов параллельного импорта (по порядку файлов)"""
+        first_id = self.manager.next_id
+        count = 0
+        for chunk in chunks:
+            count += self.manager.add_operations(chunk.operations(self.manager.next_id))
         
+        if count > 0:
+            self.save_added(first_id)
+            messagebox.showinfo("Успех", f"Импортировано {count} записей")
+        else:
+            messagebox.showwarning("Внимание", "Не импортировано ни одной записи")
+    
+    def process_imported_data(self, chunks, filename):
+        """Обработка импортированных данных (порциями)"""
         count = 0
-        for data in imported:
-            try:
-                if self.manager.add_operation(
-                    float(data['amount']),
-                    data['category'],
-                    data['date'],
-                    OperationType(data['type']),
-                    data.get('description', '')
-                ):
-                    count += 1
-            except Exception:
-                continue
+        first_id = self.manager.next_id
+        try:
+            for chunk in chunks:
+                count += self.manager.add_operations_bulk(chunk)
+        finally:
+            if count > 0:
+                self.save_added(first_id)
         
         if count > 0:
-            self.save_data()
-            self.refresh_all()
             messagebox.showinfo("Успех", f"Импортировано {count} записей")
         else:
             messagebox.showwarning("Внимание", "Не импортировано ни одной записи")
+    
+    # Графики: данные запрашиваются в главном потоке (итоги из куба и топ-N
+    # дешевы), построение Figure и растеризация Agg - в рабочем потоке.
+    # Готовые PNG кэшируются по (версия данных, график, параметры).
+    
+    CHART_CACHE_SIZE = 16
+    CHART_POLL_MS = 50
+    PREWARM_DELAY_MS = 500
+    
     def plot_income_expense(self):
         """Построение графика доходов/расходов"""
-        try:
-            fig = self.analyzer.plot_income_vs_expenses()
-            self.show_plot(fig, "Доходы и расходы")
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Не удалось построить график: {e}")
+        self.request_chart("income_expense", "Доходы и расходы")
 
     def plot_categories(self):
         """Построение графика расходов по категориям"""
-        try:
-            fig = self.analyzer.plot_expenses_by_category()
-            self.show_plot(fig, "Расходы по категориям")
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Не удалось построить график: {e}")
+        self.request_chart("categories", "Расходы по категориям")
 
     def plot_top_expenses(self):
         """Построение графика топ расходов"""
+        self.request_chart("top_expenses", "Топ расходов", n=10)
+
+    @profiling.timed("gui.request_chart")
+    def request_chart(self, chart, title, **params):
+        """Запрос графика: из кэша или построение в рабочем потоке"""
+        key = (self.manager.version, chart, tuple(sorted(params.items())))
+        png = self.chart_cache.get(key)
+        if png is not None:
+            self.chart_cache.move_to_end(key)
+            self.show_plot(png, title)
+            return
+        if key in self.chart_pending:
+            return
+        
+        # Данные - итоги по кубу или n операций из get_top_expenses,
+        # отрисовка выполняется в рабочем потоке
         try:
-            fig = self.analyzer.plot_top_expenses()
-            self.show_plot(fig, "Топ расходов")
+            data = self.analyzer.chart_data(chart, **params)
         except Exception as e:
             messagebox.showerror("Ошибка", f"Не удалось построить график: {e}")
+            return
+        
+        self.chart_pending.add(key)
+        future = self.chart_executor.submit(render_chart, chart, data, **params)
+        future.add_done_callback(lambda f: self.chart_results.put((key, title, f)))
+        if len(self.chart_pending) == 1:
+            self.status_label.config(text="Построение графика...")
+            self.root.after(self.CHART_POLL_MS, self.poll_charts)
+
+    def poll_charts(self):
+        """Прием готовых графиков из рабочего потока"""
+        while True:
+            try:
+                key, title, future = self.chart_results.get_nowait()
+            except queue.Empty:
+                break
+            
+            self.chart_pending.discard(key)
+            try:
+                png = future.result()
+            except Exception as e:
+                messagebox.showerror("Ошибка", f"Не удалось построить график: {e}")
+                continue
+            
+            self.chart_cache[key] = png
+            while len(self.chart_cache) > self.CHART_CACHE_SIZE:
+                self.chart_cache.popitem(last=False)
+            self.show_plot(png, title)
+        
+        if self.chart_pending:
+            self.root.after(self.CHART_POLL_MS, self.poll_charts)
+        else:
+            self.status_label.config(text="")
 
-    def show_plot(self, fig, title):
-        """Отображение графика"""
+    @profiling.timed("gui.show_plot")
+    def show_plot(self, png, title):
+        """Отображение графика (PNG)"""
         window = tk.Toplevel(self.root)
         window.title(title)
-        window.geometry("800x600")
         
-        canvas = FigureCanvasTkAgg(fig, master=window)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        image = tk.PhotoImage(master=window, data=base64.b64encode(png))
+        label = ttk.Label(window, image=image)
+        label.image = image
+        label.pack(fill=tk.BOTH, expand=True)
         
         ttk.Button(window, text="Закрыть", command=window.destroy).pack(pady=10)
 
+    PROFILER_POLL_MS = 1000
+    
+    def show_profiler(self):
+        """Панель замеров времени (см. profiling.py)"""
+        if self.profiler_window is not None and self.profiler_window.winfo_exists():
+            self.profiler_window.lift()
+            return
+        
+        window = self.profiler_window = tk.Toplevel(self.root)
+        window.title("Профилирование")
+        window.geometry("700x400")
+        
+        controls = ttk.Frame(window, padding=5)
+        controls.pack(fill=tk.X)
+        self.profiling_var = tk.BooleanVar(value=profiling.is_enabled())
+        ttk.Checkbutton(controls, text="Замеры", variable=self.profiling_var,
+                        command=self.toggle_profiling).pack(side=tk.LEFT)
+        ttk.Button(controls, text="Сбросить", command=self.reset_profiling).pack(side=tk.LEFT, padx=5)
+        self.trace_button = ttk.Button(controls, command=self.toggle_trace)
+        self.trace_button.pack(side=tk.LEFT)
+        self.trace_label = ttk.Label(controls, text="")
+        self.trace_label.pack(side=tk.LEFT, padx=10)
+        
+        columns = ("name", "calls", "total", "mean", "max")
+        self.profiler_tree = ttk.Treeview(window, columns=columns, show="headings")
+        for col, text, width in (("name", "Замер", 240), ("calls", "Вызовы", 80),
+                                 ("total", "Всего, мс", 100), ("mean", "Среднее, мс", 100),
+                                 ("max", "Макс, мс", 100)):
+            self.profiler_tree.heading(col, text=text)
+            self.profiler_tree.column(col, width=width, stretch=(col == "name"),
+                                      anchor="w" if col == "name" else "e")
+        self.profiler_tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        
+        self.poll_profiler()
+    
+    def poll_profiler(self):
+        """Периодическое обновление панели замеров, пока она открыта"""
+        if self.profiler_window is None or not self.profiler_window.winfo_exists():
+            self.profiler_window = None
+            return
+        self.refresh_profiler()
+        self.root.after(self.PROFILER_POLL_MS, self.poll_profiler)
+    
+    def refresh_profiler(self):
+        """Таблица замеров (по убыванию суммарного времени) и счетчиков"""
+        snapshot = profiling.stats()
+        tree = self.profiler_tree
+        tree.delete(*tree.get_children())
+        for name, timer in sorted(snapshot['timers'].items(), key=lambda item: -item[1]['total']):
+            tree.insert("", tk.END, values=(name, timer['calls'], f"{timer['total'] * 1000:.1f}",
+                                            f"{timer['mean'] * 1000:.2f}", f"{timer['max'] * 1000:.2f}"))
+        for name, value in sorted(snapshot['counters'].items()):
+            tree.insert("", tk.END, values=(name, value, "", "", ""))
+        
+        self.profiling_var.set(snapshot['enabled'])
+        trace_file = profiling.trace_file()
+        self.trace_button.config(text="Остановить трассу" if trace_file else "Трасса...")
+        self.trace_label.config(text=os.path.basename(trace_file) if trace_file else "")
+    
+    def toggle_profiling(self):
+        """Включение и выключение замеров"""
+        if self.profiling_var.get():
+            profiling.enable(profiling.trace_file())
+        else:
+            profiling.disable()
+        self.refresh_profiler()
+    
+    def reset_profiling(self):
+        """Сброс накопленных замеров"""
+        profiling.reset()
+        self.refresh_profiler()
+    
+    def toggle_trace(self):
+        """Запись трассы в файл JSON lines (замеры при этом включаются)"""
+        if profiling.trace_file():
+            profiling.enable()
+        else:
+            filename = filedialog.asksaveasfilename(
+                defaultextension=".jsonl", filetypes=[("JSON lines", "*.jsonl"), ("Все файлы", "*.*")])
+            if not filename:
+                return
+            profiling.enable(filename)
+        self.refresh_profiler()
+    
     def run(self):
         """Запуск главного цикла"""
         self.root.mainloop()
\ No newline at end of file
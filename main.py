@@ -1,11 +1,15 @@
 # Главный файл приложения
 
 import sys
-from gui import FinancialApp
 
 def main():
-    """Запуск приложения"""
+    """Запуск приложения (с аргументами - командная строка, см. cli.py)"""
+    if len(sys.argv) > 1:
+        from cli import main as cli_main
+        sys.exit(cli_main(sys.argv[1:]))
+    
     try:
+        from gui import FinancialApp
         app = FinancialApp()
         app.run()
     except Exception as e:
@@ -13,4 +17,4 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,51 +1,748 @@
 # Модели данных
 
+import bisect
+import functools
+import heapq
+import itertools
+import math
 import re
+import sys
 from enum import Enum
-from dataclasses import dataclass
-from typing import List, Optional
+from collections.abc import Sequence
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 from datetime import datetime
 
+import profiling
+
 class OperationType(Enum):
     """Тип операции: доход или расход"""
     INCOME = "доход"
     EXPENSE = "расход"
 
-@dataclass
 class Operation:
-    """Финансовая операция"""
-    id: int
-    amount: float
-    category: str
-    date: str
-    type: OperationType
-    description: str = ""
+    """Финансовая операция
+
+    Компактная запись без __dict__: сумма хранится целым числом копеек
+    (cents, amount - сумма в рублях), строки категории, даты и описания
+    интернируются, так что повторяющиеся значения (категории, даты,
+    типовые описания) хранятся в памяти один раз.
+    """
+    
+    __slots__ = ("id", "cents", "category", "date", "type", "description")
+    
+    def __init__(self, id: int, amount: float, category: str, date: str,
+                 type: OperationType, description: str = ""):
+        self.id = id
+        self.cents = to_cents(amount)
+        self.category = intern_string(category)
+        self.date = intern_string(date)
+        self.type = type
+        self.description = intern_string(description)
+    
+    @classmethod
+    def from_cents(cls, id: int, cents: int, category: str, date: str,
+                   type: OperationType, description: str = "") -> "Operation":
+        """Создание операции по сумме в копейках (без пересчета суммы)"""
+        operation = cls.__new__(cls)
+        operation.id = id
+        operation.cents = cents
+        operation.category = intern_string(category)
+        operation.date = intern_string(date)
+        operation.type = type
+        operation.description = intern_string(description)
+        return operation
+    
+    @property
+    def amount(self) -> float:
+        """Сумма в рублях"""
+        return self.cents / 100
+    
+    def replace(self, **changes) -> "Operation":
+        """Копия операции с измененными полями (сумма - amount или cents)"""
+        if 'amount' in changes:
+            changes['cents'] = to_cents(changes.pop('amount'))
+        values = {field: getattr(self, field) for field in self.__slots__}
+        values.update(changes)
+        return Operation.from_cents(**values)
+    
+    def _fields(self) -> tuple:
+        return self.id, self.cents, self.category, self.date, self.type, self.description
+    
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self._fields() == other._fields()
+    
+    __hash__ = None
+    
+    def __reduce__(self):
+        return Operation.from_cents, self._fields()
+    
+    def __repr__(self) -> str:
+        return (f"Operation(id={self.id!r}, amount={self.amount!r}, category={self.category!r}, "
+                f"date={self.date!r}, type={self.type!r}, description={self.description!r})")
     
     def validate(self) -> bool:
         """Валидация данных операции"""
-        # Валидация суммы
-        if self.amount <= 0:
-            return False
+        return validation_error(self.amount, self.date) is None
+
+def intern_string(value):
+    """Общий экземпляр строки (одинаковые значения хранятся один раз)"""
+    return sys.intern(value) if type(value) is str else value
+
+# Валидация
+DATE_PATTERN = r'^[0-9]{4}-[0-9]{2}-[0-9]{2}\Z'
+AMOUNT_ERROR = "Сумма должна быть положительной"
+DATE_FORMAT_ERROR = "Дата должна быть в формате ГГГГ-ММ-ДД"
+DATE_ERROR = "Несуществующая дата"
+
+def validation_error(amount: float, date: str) -> Optional[str]:
+    """Проверка суммы и даты одной операции, возвращает причину отказа или None"""
+    # Валидация суммы (не меньше копейки после округления)
+    if not (amount > 0 and math.isfinite(amount) and round(amount * 100) >= 1):
+        return AMOUNT_ERROR
+    
+    if not isinstance(date, str):
+        return DATE_FORMAT_ERROR
+    return date_error(date)
+
+@functools.lru_cache(maxsize=1 << 16)
+def date_error(date: str) -> Optional[str]:
+    """Проверка даты (результат кэшируется: различных дат в учете немного)"""
+    # Валидация даты (регулярное выражение)
+    if not re.match(DATE_PATTERN, date):
+        return DATE_FORMAT_ERROR
+    
+    try:
+        datetime.strptime(date, '%Y-%m-%d')
+    except ValueError:
+        return DATE_ERROR
+    
+    return None
+
+# Пакеты меньшего размера проверяются построчно
+VECTORIZE_MIN_ROWS = 1000
+
+def _validate_rows(amounts: Sequence[float],
+                   dates: Sequence[str]) -> Tuple[List[bool], Dict[int, str]]:
+    """Построчная валидация пакета (результат - как у validate_batch)"""
+    reasons = {}
+    for i, (amount, date) in enumerate(zip(amounts, dates)):
+        error = validation_error(amount, date)
+        if error is not None:
+            reasons[i] = error
+    return [i not in reasons for i in range(len(amounts))], reasons
+
+@profiling.timed("models.validate_batch")
+def validate_batch(amounts: Sequence[float],
+                   dates: Sequence[str]) -> Tuple[Sequence[bool], Dict[int, str]]:
+    """Пакетная валидация сумм и дат
+
+    Возвращает маску корректных строк и причины отказа {номер строки: причина}.
+    При наличии NumPy проверки выполняются векторно, без разбора каждой даты;
+    небольшие пакеты проверяются построчно (без загрузки NumPy).
+    """
+    count = len(amounts)
+    if count < VECTORIZE_MIN_ROWS:
+        return _validate_rows(amounts, dates)
+    try:
+        import numpy as np
+    except ImportError:
+        return _validate_rows(amounts, dates)
+    
+    cents = np.rint(np.asarray(amounts, dtype=np.float64) * 100)
+    amount_ok = np.isfinite(cents) & (cents >= 1)
+    
+    # Символы даты как коды Unicode; 11-й символ должен отсутствовать
+    codes = np.array(dates, dtype='U11').view(np.uint32).reshape(count, 11).astype(np.int64)
+    digits = (codes >= ord('0')) & (codes <= ord('9'))
+    format_ok = (digits[:, [0, 1, 2, 3, 5, 6, 8, 9]].all(axis=1)
+                 & (codes[:, 4] == ord('-')) & (codes[:, 7] == ord('-')) & (codes[:, 10] == 0))
+    
+    values = codes - ord('0')
+    year = values[:, 0] * 1000 + values[:, 1] * 100 + values[:, 2] * 10 + values[:, 3]
+    month = values[:, 5] * 10 + values[:, 6]
+    day = values[:, 8] * 10 + values[:, 9]
+    
+    month_ok = format_ok & (year >= 1) & (month >= 1) & (month <= 12)
+    first = ((np.where(month_ok, year, 1970) - 1970) * 12
+             + np.where(month_ok, month, 1) - 1).astype('datetime64[M]')
+    days_in_month = ((first + 1).astype('datetime64[D]')
+                     - first.astype('datetime64[D]')).astype(np.int64)
+    date_ok = month_ok & (day >= 1) & (day <= days_in_month)
+    
+    mask = amount_ok & date_ok
+    reasons = {}
+    for i in np.flatnonzero(~mask).tolist():
+        if not amount_ok[i]:
+            reasons[i] = AMOUNT_ERROR
+        elif not format_ok[i]:
+            reasons[i] = DATE_FORMAT_ERROR
+        else:
+            reasons[i] = DATE_ERROR
+    return mask, reasons
+
+class ListStore:
+    """Хранилище операций в списке с вторичными индексами
+
+    Индексы: id -> позиция, отсортированный индекс по дате,
+    хеш-индексы по категории и типу. Удаление оставляет на месте
+    операции пустую запись (None), список сжимается периодически.
+    """
+    
+    COMPACT_THRESHOLD = 1024
+    
+    def __init__(self):
+        """Инициализация хранилища"""
+        self.rows: List[Optional[Operation]] = []
+        self.positions: Dict[int, int] = {}
+        self.date_index: List[Tuple[str, int]] = []
+        self.date_index_sorted = True
+        self.category_index: Dict[str, Set[int]] = {}
+        self.type_index: Dict[OperationType, Set[int]] = {}
+        self.dead = 0
+        # Позиции живых записей для доступа по номеру (строится при первом
+        # обращении после удаления, удаление его сбрасывает)
+        self._live: Optional[List[int]] = None
+    
+    def __len__(self) -> int:
+        return len(self.positions)
+    
+    def __iter__(self) -> Iterator[Operation]:
+        return (op for op in self.rows if op is not None)
+    
+    def view(self) -> "ListView":
+        """Представление в виде списка операций"""
+        return ListView(self)
+    
+    def build_totals(self) -> "RunningTotals":
+        """Построение нарастающих итогов по всем операциям
+
+        Операции сначала группируются по (категория, дата, тип), итоги
+        строятся по группам, которых обычно намного меньше, чем операций.
+        """
+        groups: Dict[Tuple[str, str, OperationType], List[int]] = {}
+        for op in self:
+            key = (op.category, op.date, op.type)
+            entry = groups.get(key)
+            if entry is None:
+                groups[key] = [op.cents, 1]
+            else:
+                entry[0] += op.cents
+                entry[1] += 1
+        return RunningTotals.from_groups(groups)
+    
+    def _index_add(self, operation: Operation):
+        """Добавление операции в хеш-индексы"""
+        self.category_index.setdefault(operation.category, set()).add(operation.id)
+        self.type_index.setdefault(operation.type, set()).add(operation.id)
+    
+    def append(self, operation: Operation):
+        """Добавление операции"""
+        self.positions[operation.id] = len(self.rows)
+        if self._live is not None:
+            self._live.append(len(self.rows))
+        self.rows.append(operation)
+        if self.date_index_sorted:
+            bisect.insort(self.date_index, (operation.date, operation.id))
+        else:
+            self.date_index.append((operation.date, operation.id))
+        self._index_add(operation)
+    
+    def extend(self, operations: Iterable[Operation]):
+        """Добавление нескольких операций (индекс по дате сортируется при запросе)"""
+        for operation in operations:
+            self.positions[operation.id] = len(self.rows)
+            self.rows.append(operation)
+            self.date_index.append((operation.date, operation.id))
+            self._index_add(operation)
+        self.date_index_sorted = False
+        self._live = None
+    
+    def clear(self):
+        """Удаление всех операций"""
+        self.__init__()
+    
+    def close(self):
+        """Освобождение ресурсов (хранилище в памяти их не держит)"""
+    
+    def get(self, operation_id: int) -> Optional[Operation]:
+        """Поиск операции по id"""
+        i = self.positions.get(operation_id)
+        return self.rows[i] if i is not None else None
+    
+    def at(self, index):
+        """Операция (или список для среза) по номеру среди живых записей, без сжатия"""
+        if not self.dead:
+            return self.rows[index]
+        if self._live is None:
+            self._live = list(itertools.compress(range(len(self.rows)), self.rows))
+        if isinstance(index, slice):
+            return [self.rows[i] for i in self._live[index]]
+        return self.rows[self._live[index]]
+    
+    def remove(self, operation_id: int) -> Optional[Operation]:
+        """Удаление операции по id
+
+        Индекс по дате не изменяется: устаревшие записи
+        отбрасываются при запросе и удаляются при сжатии.
+        """
+        i = self.positions.pop(operation_id, None)
+        if i is None:
+            return None
         
-        # Валидация даты (регулярное выражение)
-        date_pattern = r'^\d{4}-\d{2}-\d{2}$'
-        if not re.match(date_pattern, self.date):
-            return False
+        operation = self.rows[i]
+        self.rows[i] = None
+        self.dead += 1
+        self._live = None
+        ids = self.category_index[operation.category]
+        ids.discard(operation_id)
+        if not ids:
+            del self.category_index[operation.category]
+        self.type_index[operation.type].discard(operation_id)
         
-        try:
-            datetime.strptime(self.date, '%Y-%m-%d')
-        except ValueError:
-            return False
+        if self.dead > self.COMPACT_THRESHOLD and self.dead * 2 > len(self.rows):
+            self.compact()
+        return operation
+    
+    def replace(self, operation: Operation) -> Optional[Operation]:
+        """Замена операции с тем же id на месте, возвращает прежнюю"""
+        i = self.positions.get(operation.id)
+        if i is None:
+            return None
         
-        return True
+        old = self.rows[i]
+        self.rows[i] = operation
+        ids = self.category_index[old.category]
+        ids.discard(old.id)
+        if not ids:
+            del self.category_index[old.category]
+        self.type_index[old.type].discard(old.id)
+        self._index_add(operation)
+        if operation.date != old.date:
+            # Прежняя запись индекса по дате удаляется, чтобы индекс не рос от правок
+            if not self.date_index_sorted:
+                self.date_index.sort()
+                self.date_index_sorted = True
+            j = bisect.bisect_left(self.date_index, (old.date, old.id))
+            if j < len(self.date_index) and self.date_index[j] == (old.date, old.id):
+                del self.date_index[j]
+            bisect.insort(self.date_index, (operation.date, operation.id))
+        return old
+    
+    def compact(self):
+        """Сжатие списка (удаление пустых записей)"""
+        self.rows = [op for op in self.rows if op is not None]
+        self.positions = {op.id: i for i, op in enumerate(self.rows)}
+        self.date_index = sorted((op.date, op.id) for op in self.rows)
+        self.date_index_sorted = True
+        self.dead = 0
+        self._live = None
+    
+    def select(self, **filters) -> List[Operation]:
+        """Список операций, подходящих под фильтры"""
+        return list(self.matches(**filters))
+    
+    def top(self, n: int, **filters) -> List[Operation]:
+        """n операций с наибольшей суммой (ограниченная куча, без сортировки всех строк)"""
+        return heapq.nlargest(n, self.matches(ordered=False, **filters),
+                              key=lambda op: (op.cents, -op.id))
+    
+    def matches(self, category: Optional[str] = None,
+                op_type: Optional[OperationType] = None,
+                start_date: Optional[str] = None,
+                end_date: Optional[str] = None,
+                ordered: bool = True) -> Iterator[Operation]:
+        """Операции, подходящие под фильтры (ordered - в порядке добавления)"""
+        clean_category = category.strip() if category else None
+        
+        # Кандидаты из каждого индекса (для даты - диапазон позиций в индексе)
+        candidates = []
+        if clean_category:
+            candidates.append(self.category_index.get(clean_category, ()))
+        if op_type:
+            candidates.append(self.type_index.get(op_type, ()))
+        if start_date or end_date:
+            if not self.date_index_sorted:
+                self.date_index.sort()
+                self.date_index_sorted = True
+            lo = bisect.bisect_left(self.date_index, (start_date,)) if start_date else 0
+            hi = (bisect.bisect_right(self.date_index, (end_date, math.inf))
+                  if end_date else len(self.date_index))
+            candidates.append(range(lo, max(hi, lo)))
+        
+        if not candidates:
+            yield from self
+            return
+        
+        # Начинаем с самого селективного индекса
+        ids = min(candidates, key=len)
+        if isinstance(ids, range):
+            ids = [op_id for _, op_id in self.date_index[ids.start:ids.stop]]
+        
+        positions = {self.positions[op_id] for op_id in ids if op_id in self.positions}
+        for i in sorted(positions) if ordered else positions:
+            op = self.rows[i]
+            if clean_category and op.category != clean_category:
+                continue
+            if op_type and op.type != op_type:
+                continue
+            if start_date and op.date < start_date:
+                continue
+            if end_date and op.date > end_date:
+                continue
+            yield op
+    
+
+class ListView(Sequence):
+    """Представление списочного хранилища в виде списка операций"""
+    
+    def __init__(self, store: ListStore):
+        self.store = store
+    
+    def __len__(self) -> int:
+        return len(self.store)
+    
+    def __iter__(self) -> Iterator[Operation]:
+        return iter(self.store)
+    
+    def __getitem__(self, index):
+        return self.store.at(index)
+    
+    def copy(self) -> List[Operation]:
+        """Копия в виде обычного списка (без обхода в Python: пропуск удаленных записей)"""
+        return list(filter(None, self.store.rows))
+
+def to_cents(amount: float) -> int:
+    """Перевод суммы в копейки (ValueError для бесконечности и NaN)"""
+    if not math.isfinite(amount):
+        raise ValueError(f"Некорректная сумма: {amount}")
+    return round(amount * 100)
+
+def calculate_balance(operations: Iterable[Operation]) -> float:
+    """Баланс: доходы минус расходы"""
+    balance = 0
+    for op in operations:
+        if op.type == OperationType.INCOME:
+            balance += op.cents
+        else:
+            balance -= op.cents
+    return balance / 100
+
+class DailyTotals:
+    """Суммы по дням с префиксными суммами для запросов по диапазону дат
+
+    Для каждого дня хранится [доходы, расходы, число доходов, число расходов]
+    (суммы в копейках). Префиксные суммы пересчитываются лениво.
+    """
+    
+    def __init__(self):
+        self.days: List[str] = []
+        self.values: Dict[str, List[int]] = {}
+        self._prefix: Optional[List[Tuple[int, int, int, int]]] = None
+    
+    def update(self, date: str, delta: Tuple[int, int, int, int]):
+        """Изменение сумм за день"""
+        entry = self.values.get(date)
+        if entry is None:
+            entry = self.values[date] = [0, 0, 0, 0]
+            bisect.insort(self.days, date)
+        
+        for i, value in enumerate(delta):
+            entry[i] += value
+        
+        if entry[2] + entry[3] == 0:
+            del self.values[date]
+            del self.days[bisect.bisect_left(self.days, date)]
+        self._prefix = None
+    
+    def range(self, start_date: Optional[str] = None,
+              end_date: Optional[str] = None) -> Tuple[int, int, int, int]:
+        """Суммы за период (границы включаются)"""
+        if self._prefix is None:
+            prefix = [(0, 0, 0, 0)]
+            for day in self.days:
+                prefix.append(tuple(a + b for a, b in zip(prefix[-1], self.values[day])))
+            self._prefix = prefix
+        
+        lo = bisect.bisect_left(self.days, start_date) if start_date else 0
+        hi = bisect.bisect_right(self.days, end_date) if end_date else len(self.days)
+        if hi <= lo:
+            return (0, 0, 0, 0)
+        return tuple(b - a for a, b in zip(self._prefix[lo], self._prefix[hi]))
+
+class RunningTotals:
+    """Нарастающие итоги: всего, по категориям, по месяцам и по дням
+
+    Обновляются за O(1) (по дням - O(log D)) при добавлении и удалении.
+    Суммы хранятся в копейках, чтобы не накапливать ошибку округления.
+    """
+    
+    def __init__(self):
+        self.total = [0, 0, 0, 0]
+        self.by_category: Dict[str, List[int]] = {}
+        self.by_month: Dict[str, List[int]] = {}
+        self.daily = DailyTotals()
+        self.daily_by_category: Dict[str, DailyTotals] = {}
+        self._categories: Optional[List[str]] = None
+    
+    @classmethod
+    def from_groups(cls, groups: Dict[Tuple[str, str, OperationType], List[int]]) -> "RunningTotals":
+        """Итоги по группам {(категория, дата, тип): [сумма в копейках, число операций]}"""
+        totals = cls()
+        for (category, date, op_type), (cents, count) in groups.items():
+            delta = (cents, 0, count, 0) if op_type == OperationType.INCOME else (0, cents, 0, count)
+            daily = totals.daily_by_category.get(category)
+            if daily is None:
+                daily = totals.daily_by_category[category] = DailyTotals()
+            for entry in (totals.total,
+                          totals.by_category.setdefault(category, [0, 0, 0, 0]),
+                          totals.by_month.setdefault(date[:7], [0, 0, 0, 0]),
+                          totals.daily.values.setdefault(date, [0, 0, 0, 0]),
+                          daily.values.setdefault(date, [0, 0, 0, 0])):
+                for i, value in enumerate(delta):
+                    entry[i] += value
+        
+        totals.daily.days = sorted(totals.daily.values)
+        for daily in totals.daily_by_category.values():
+            daily.days = sorted(daily.values)
+        return totals
+    
+    def update(self, operation: Operation, sign: int = 1):
+        """Учет добавленной (sign=1) или удаленной (sign=-1) операции"""
+        cents = operation.cents * sign
+        if operation.type == OperationType.INCOME:
+            delta = (cents, 0, sign, 0)
+        else:
+            delta = (0, cents, 0, sign)
+        
+        for entry in (self.total,
+                      self.by_category.setdefault(operation.category, [0, 0, 0, 0]),
+                      self.by_month.setdefault(operation.date[:7], [0, 0, 0, 0])):
+            for i, value in enumerate(delta):
+                entry[i] += value
+        
+        self.daily.update(operation.date, delta)
+        daily = self.daily_by_category.get(operation.category)
+        if daily is None:
+            daily = self.daily_by_category[operation.category] = DailyTotals()
+            self._categories = None
+        daily.update(operation.date, delta)
+        
+        if sum(self.by_category[operation.category][2:]) == 0:
+            del self.by_category[operation.category]
+            del self.daily_by_category[operation.category]
+            self._categories = None
+        if sum(self.by_month[operation.date[:7]][2:]) == 0:
+            del self.by_month[operation.date[:7]]
+    
+    def query(self, category: Optional[str] = None,
+              op_type: Optional[OperationType] = None,
+              start_date: Optional[str] = None,
+              end_date: Optional[str] = None) -> Tuple[int, int, int, int]:
+        """Итоги по фильтрам: (доходы, расходы, число доходов, число расходов)"""
+        clean_category = category.strip() if category else None
+        
+        if start_date or end_date:
+            daily = self.daily_by_category.get(clean_category) if clean_category else self.daily
+            entry = daily.range(start_date, end_date) if daily else (0, 0, 0, 0)
+        elif clean_category:
+            entry = self.by_category.get(clean_category, (0, 0, 0, 0))
+        else:
+            entry = self.total
+        
+        income, expense, income_count, expense_count = entry
+        if op_type == OperationType.INCOME:
+            return income, 0, income_count, 0
+        if op_type == OperationType.EXPENSE:
+            return 0, expense, 0, expense_count
+        return income, expense, income_count, expense_count
+    
+    def categories(self) -> List[str]:
+        """Отсортированный список категорий"""
+        if self._categories is None:
+            self._categories = sorted(self.by_category)
+        return self._categories
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+def tokenize(text: str) -> List[str]:
+    """Слова текста в нижнем регистре"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+def text_matches(description: str, query: str) -> bool:
+    """Каждое слово запроса входит (как подстрока) в какое-либо слово описания"""
+    words = tokenize(description)
+    return all(any(term in word for word in words) for term in tokenize(query))
+
+class TextIndex:
+    """Инвертированный индекс слов описаний: слово -> id операций
+
+    Для поиска по подстроке словарь дополнительно индексируется
+    по триграммам, так что перебираются только слова-кандидаты,
+    а не все описания.
+    """
+    
+    def __init__(self, operations: Iterable[Operation] = ()):
+        self.postings: Dict[str, Set[int]] = {}
+        self.trigrams: Dict[str, Set[str]] = {}
+        for operation in operations:
+            self.add(operation)
+    
+    @staticmethod
+    def _trigrams(word: str) -> Set[str]:
+        return {word[i:i + 3] for i in range(len(word) - 2)}
+    
+    def add(self, operation: Operation):
+        """Добавление описания операции в индекс"""
+        for word in set(tokenize(operation.description)):
+            ids = self.postings.get(word)
+            if ids is None:
+                ids = self.postings[word] = set()
+                for trigram in self._trigrams(word):
+                    self.trigrams.setdefault(trigram, set()).add(word)
+            ids.add(operation.id)
+    
+    def remove(self, operation: Operation):
+        """Удаление описания операции из индекса"""
+        for word in set(tokenize(operation.description)):
+            ids = self.postings.get(word)
+            if ids is None:
+                continue
+            ids.discard(operation.id)
+            if not ids:
+                del self.postings[word]
+                for trigram in self._trigrams(word):
+                    words = self.trigrams[trigram]
+                    words.discard(word)
+                    if not words:
+                        del self.trigrams[trigram]
+    
+    def apply(self, event: str, operations: List[Operation]):
+        """Учет события FinanceManager (кроме "reset")"""
+        if event == "update":
+            old, new = operations
+            self.remove(old)
+            self.add(new)
+            return
+        for operation in operations:
+            if event == "add":
+                self.add(operation)
+            else:
+                self.remove(operation)
+    
+    def words(self, term: str) -> Iterable[str]:
+        """Слова словаря, содержащие term"""
+        if len(term) < 3:
+            return [word for word in self.postings if term in word]
+        
+        candidates = None
+        for trigram in sorted(self._trigrams(term), key=lambda t: len(self.trigrams.get(t, ()))):
+            words = self.trigrams.get(trigram)
+            if not words:
+                return []
+            candidates = set(words) if candidates is None else candidates & words
+        return [word for word in candidates if term in word]
+    
+    def search(self, query: str) -> Set[int]:
+        """id операций, в описании которых есть все слова запроса (как подстроки)"""
+        result: Optional[Set[int]] = None
+        for term in sorted(set(tokenize(query)), key=len, reverse=True):
+            ids: Set[int] = set()
+            for word in self.words(term):
+                ids |= self.postings[word]
+            result = ids if result is None else result & ids
+            if not result:
+                return set()
+        return result if result is not None else set()
 
 class FinanceManager:
     """Менеджер финансовых операций"""
     
-    def __init__(self):
-        """Инициализация менеджера"""
-        self.operations: List[Operation] = []
+    def __init__(self, backend: str = "list", database: Optional[str] = None):
+        """Инициализация менеджера
+
+        backend: "list" - список объектов Operation с индексами,
+        "columnar" - колоночное хранилище NumPy (см. columnar.py),
+        "sqlite" - база SQLite database, фильтры и итоги считаются
+        запросами SQL (см. sqlite_storage.py)
+        """
         self.next_id = 1
+        if backend == "list":
+            self._store = ListStore()
+        elif backend == "columnar":
+            from columnar import ColumnarStore
+            self._store = ColumnarStore()
+        elif backend == "sqlite":
+            from sqlite_storage import SQLiteStore
+            self._store = SQLiteStore(database or "data.db")
+            self.next_id = self._store.max_id() + 1
+        else:
+            raise ValueError(f"Неизвестный тип хранилища: {backend}")
+        self._totals = self._store.build_totals()
+        
+        # Подписчики на изменения и номер версии данных
+        self._listeners: List[Callable[[str, List[Operation]], None]] = []
+        self.version = 0
+        
+        # Индекс слов описаний (строится при первом поиске)
+        self._text_index: Optional[TextIndex] = None
+    
+    def subscribe(self, callback: Callable[[str, List[Operation]], None]):
+        """Подписка на изменения: callback(событие, операции)
+
+        События: "add" и "delete" - со списком затронутых операций,
+        "update" - [прежняя, новая] версии измененной операции,
+        "reset" - список операций заменен целиком (операции не передаются).
+        """
+        self._listeners.append(callback)
+    
+    def unsubscribe(self, callback: Callable[[str, List[Operation]], None]):
+        """Отмена подписки на изменения"""
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+    
+    def _notify(self, event: str, operations: List[Operation]):
+        """Увеличение версии и оповещение подписчиков"""
+        self.version += 1
+        if event == "reset":
+            self._text_index = None
+        elif self._text_index is not None:
+            self._text_index.apply(event, operations)
+        for callback in list(self._listeners):
+            callback(event, operations)
+    
+    def close(self):
+        """Закрытие хранилища (для SQLite - соединения с базой)"""
+        self._store.close()
+    
+    @property
+    def operations(self) -> Sequence[Operation]:
+        """Операции в виде списка (представление хранилища)"""
+        return self._store.view()
+    
+    @operations.setter
+    def operations(self, operations):
+        """Замена списка операций"""
+        self._store.clear()
+        self._store.extend(operations)
+        self._totals = self._store.build_totals()
+        self._notify("reset", [])
+    
+    def load_columns(self, columns):
+        """Загрузка колонок бинарного снимка (см. snapshot.load_columns)
+
+        Операции не материализуются: хранилище работает поверх
+        отображенных в память массивов. Только для backend="columnar".
+        """
+        from columnar import ColumnarStore
+        if not isinstance(self._store, ColumnarStore):
+            raise ValueError("Загрузка колонок доступна только для колоночного хранилища")
+        
+        self._store = ColumnarStore.from_snapshot(columns)
+        self._totals = self._store.build_totals()
+        self.next_id = int(columns.records['id'].max()) + 1 if len(columns) else 1
+        self._notify("reset", [])
     
     def add_operation(self, amount: float, category: str, date: str, 
                      operation_type: OperationType, description: str = "") -> bool:
@@ -67,54 +764,227 @@ class FinanceManager:
             if not operation.validate():
                 return False
             
-            self.operations.append(operation)
+            self._store.append(operation)
+            self._totals.update(operation)
             self.next_id += 1
-            return True
             
         except Exception:
             return False
+        
+        self._notify("add", [operation])
+        return True
+    
+    @profiling.timed("manager.add_operations_bulk")
+    def add_operations_bulk(self, rows: Iterable[Dict[str, Any]]) -> int:
+        """Пакетное добавление операций из словарей (формат импорта)
+
+        Новые id назначаются по порядку, некорректные строки пропускаются.
+        Возвращает число добавленных операций.
+        """
+        parsed = []
+        for row in rows:
+            try:
+                parsed.append((
+                    float(row['amount']),
+                    str(row['category']).strip(),
+                    str(row['date']).strip(),
+                    OperationType(row['type']),
+                    str(row.get('description', '')).strip()
+                ))
+            except (ValueError, KeyError, TypeError):
+                continue
+        
+        mask, _ = validate_batch([p[0] for p in parsed], [p[2] for p in parsed])
+        operations = []
+        for (amount, category, date, op_type, description), valid in zip(parsed, mask):
+            if valid:
+                operations.append(Operation(
+                    id=self.next_id + len(operations),
+                    amount=amount,
+                    category=category,
+                    date=date,
+                    type=op_type,
+                    description=description
+                ))
+        
+        self._extend(operations)
+        return len(operations)
+    
+    def add_operations(self, operations: Iterable[Operation]) -> int:
+        """Добавление готовых (уже проверенных) операций
+
+        id операций должны быть не меньше next_id (см. DataStorage.import_many).
+        """
+        operations = list(operations)
+        if any(op.id < self.next_id for op in operations):
+            raise ValueError("id операций должны быть не меньше next_id")
+        
+        self._extend(operations)
+        return len(operations)
+    
+    def _extend(self, operations: List[Operation]):
+        """Добавление списка операций в хранилище и итоги"""
+        if not operations:
+            return
+        self._store.extend(operations)
+        for operation in operations:
+            self._totals.update(operation)
+        self.next_id = max(self.next_id, max(op.id for op in operations) + 1)
+        self._notify("add", operations)
+    
+    def get_operation(self, operation_id: int) -> Optional[Operation]:
+        """Получение операции по id"""
+        return self._store.get(operation_id)
     
     def delete_operation(self, operation_id: int) -> bool:
         """Удаление операции"""
-        for i, op in enumerate(self.operations):
-            if op.id == operation_id:
-                self.operations.pop(i)
-                return True
-        return False
+        return self.delete_operations([operation_id]) == 1
     
+    @profiling.timed("manager.delete_operations")
+    def delete_operations(self, operation_ids: Iterable[int]) -> int:
+        """Удаление нескольких операций, возвращает число удаленных"""
+        removed = []
+        for operation_id in operation_ids:
+            operation = self._store.remove(operation_id)
+            if operation is not None:
+                self._totals.update(operation, -1)
+                removed.append(operation)
+        
+        if removed:
+            self._notify("delete", removed)
+        return len(removed)
+    
+    @profiling.timed("manager.update_operation")
+    def update_operation(self, operation_id: int, amount: Optional[float] = None,
+                         category: Optional[str] = None, date: Optional[str] = None,
+                         operation_type: Optional[OperationType] = None,
+                         description: Optional[str] = None) -> bool:
+        """Изменение полей операции (None - поле не меняется)"""
+        try:
+            old = self._store.get(operation_id)
+            if old is None:
+                return False
+            
+            changes = {}
+            if amount is not None:
+                changes['amount'] = amount
+            if category is not None:
+                changes['category'] = category.strip()
+            if date is not None:
+                changes['date'] = date
+            if operation_type is not None:
+                changes['type'] = operation_type
+            if description is not None:
+                changes['description'] = description.strip()
+            operation = old.replace(**changes)
+            
+            if not operation.validate():
+                return False
+            
+            self._store.replace(operation)
+            self._totals.update(old, -1)
+            self._totals.update(operation)
+            
+        except Exception:
+            return False
+        
+        self._notify("update", [old, operation])
+        return True
+    
+    @profiling.timed("manager.get_filtered_operations")
     def get_filtered_operations(self, 
                                category: Optional[str] = None,
                                op_type: Optional[OperationType] = None,
                                start_date: Optional[str] = None,
-                               end_date: Optional[str] = None) -> List[Operation]:
-        """Получение отфильтрованного списка операций"""
-        filtered = self.operations.copy()
-        
-        if category:
-            clean_category = category.strip()
-            filtered = [op for op in filtered if op.category == clean_category]
-        
-        if op_type:
-            filtered = [op for op in filtered if op.type == op_type]
-        
-        if start_date:
-            filtered = [op for op in filtered if op.date >= start_date]
-        
-        if end_date:
-            filtered = [op for op in filtered if op.date <= end_date]
+                               end_date: Optional[str] = None,
+                               text: Optional[str] = None) -> List[Operation]:
+        """Получение отфильтрованного списка операций
+
+        text - поиск по словам описания (см. search).
+        """
+        if not text or not text.strip():
+            return self._store.select(category=category, op_type=op_type,
+                                      start_date=start_date, end_date=end_date)
         
+        clean_category = category.strip() if category else None
+        filtered = []
+        for operation in self.search(text):
+            if clean_category and operation.category != clean_category:
+                continue
+            if op_type and operation.type != op_type:
+                continue
+            if start_date and operation.date < start_date:
+                continue
+            if end_date and operation.date > end_date:
+                continue
+            filtered.append(operation)
         return filtered
     
-    def get_balance(self, filtered_ops: Optional[List[Operation]] = None) -> float:
-        """Расчет баланса"""
-        ops = filtered_ops if filtered_ops else self.operations
-        balance = 0.0
-        for op in ops:
-            if op.type == OperationType.INCOME:balance += op.amount
+    @profiling.timed("manager.search")
+    def search(self, query: str) -> List[Operation]:
+        """Операции, в описании которых есть все слова запроса (по подстроке, без учета регистра)"""
+        if self._text_index is None:
+            self._text_index = TextIndex(self._store)
+        return [self._store.get(op_id) for op_id in sorted(self._text_index.search(query))]
+    
+    @profiling.timed("manager.get_top_expenses")
+    def get_top_expenses(self, n: int = 10,
+                         category: Optional[str] = None,
+                         start_date: Optional[str] = None,
+                         end_date: Optional[str] = None) -> List[Operation]:
+        """n наибольших расходов (по убыванию суммы) с учетом фильтров"""
+        if n <= 0:
+            return []
+        return self._store.top(n, category=category, op_type=OperationType.EXPENSE,
+                               start_date=start_date, end_date=end_date)
+    
+    def _query_totals(self, text: Optional[str] = None, **filters) -> Tuple[int, int, int, int]:
+        """Итоги в копейках по фильтрам (с поиском - по найденным операциям)"""
+        if not text or not text.strip():
+            return self._totals.query(**filters)
+        
+        entry = [0, 0, 0, 0]
+        for operation in self.get_filtered_operations(text=text, **filters):
+            if operation.type == OperationType.INCOME:
+                entry[0] += operation.cents
+                entry[2] += 1
             else:
-                balance -= op.amount
-        return balance
+                entry[1] += operation.cents
+                entry[3] += 1
+        return tuple(entry)
+    
+    @profiling.timed("manager.get_balance")
+    def get_balance(self, filtered_ops: Optional[List[Operation]] = None,
+                    **filters) -> float:
+        """Расчет баланса
+
+        Вместо готового списка можно передать фильтры
+        (category, op_type, start_date, end_date, text), как в get_filtered_operations.
+        """
+        if filtered_ops is not None:
+            return calculate_balance(filtered_ops)
+        income, expense, _, _ = self._query_totals(**filters)
+        return (income - expense) / 100
+    
+    @profiling.timed("manager.get_totals")
+    def get_totals(self, **filters) -> Tuple[float, float, int]:
+        """Доходы, расходы и число операций (с теми же фильтрами, что и get_balance)"""
+        income, expense, income_count, expense_count = self._query_totals(**filters)
+        return income / 100, expense / 100, income_count + expense_count
+    
+    @profiling.timed("manager.get_monthly_totals")
+    def get_monthly_totals(self) -> Dict[str, Tuple[float, float]]:
+        """Доходы и расходы по месяцам (ГГГГ-ММ)"""
+        return {month: (entry[0] / 100, entry[1] / 100)
+                for month, entry in sorted(self._totals.by_month.items())}
+    
+    @profiling.timed("manager.get_category_totals")
+    def get_category_totals(self) -> Dict[str, Tuple[float, float]]:
+        """Доходы и расходы по категориям"""
+        by_category = self._totals.by_category
+        return {category: (by_category[category][0] / 100, by_category[category][1] / 100)
+                for category in sorted(by_category)}
     
     def get_categories(self) -> List[str]:
         """Получение списка уникальных категорий"""
-        return sorted(set(op.category for op in self.operations))
\ No newline at end of file
+        return list(self._totals.categories())
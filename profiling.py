@@ -0,0 +1,169 @@
+# Замеры времени в работающем приложении
+#
+# Таймеры и счетчики вокруг основных операций (ввод-вывод DataStorage,
+# запросы FinanceManager, обновление таблицы, графики). По умолчанию
+# выключены: обернутая функция проверяет один флаг и вызывается напрямую.
+#
+#   FINANCE_PROFILE=1 python main.py                  - статистика (панель в GUI)
+#   FINANCE_TRACE=trace.jsonl python main.py          - плюс трасса JSON lines
+#
+#   import profiling
+#   profiling.enable("trace.jsonl")
+#   ...
+#   print(profiling.report())
+
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+from typing import Any, Dict, Optional
+
+_enabled = False
+_lock = threading.Lock()
+_timers: Dict[str, list] = {}     # имя -> [вызовы, сумма, минимум, максимум]
+_counters: Dict[str, int] = {}
+_trace = None
+_trace_file: Optional[str] = None
+_started = time.perf_counter()
+
+_NULL_SPAN = nullcontext()
+
+def enable(trace_file: Optional[str] = None):
+    """Включение замеров (trace_file - дописывать события в файл JSON lines)"""
+    global _enabled, _trace, _trace_file
+    with _lock:
+        if trace_file != _trace_file:
+            _close_trace()
+            if trace_file:
+                _trace = open(trace_file, 'a', encoding='utf-8')
+                _trace_file = trace_file
+        _enabled = True
+
+def disable():
+    """Выключение замеров (накопленная статистика сохраняется)"""
+    global _enabled
+    with _lock:
+        _enabled = False
+        _close_trace()
+
+def is_enabled() -> bool:
+    return _enabled
+
+def trace_file() -> Optional[str]:
+    """Файл трассы (None - трасса не пишется)"""
+    return _trace_file
+
+def _close_trace():
+    global _trace, _trace_file
+    if _trace is not None:
+        _trace.close()
+    _trace = None
+    _trace_file = None
+
+def reset():
+    """Сброс накопленной статистики"""
+    with _lock:
+        _timers.clear()
+        _counters.clear()
+
+def record(name: str, duration: float, fields: Optional[Dict[str, Any]] = None):
+    """Учет одного замера длительностью duration секунд"""
+    with _lock:
+        timer = _timers.get(name)
+        if timer is None:
+            _timers[name] = [1, duration, duration, duration]
+        else:
+            timer[0] += 1
+            timer[1] += duration
+            if duration < timer[2]:
+                timer[2] = duration
+            if duration > timer[3]:
+                timer[3] = duration
+        if _trace is not None:
+            event = {'t': round(time.perf_counter() - _started, 6), 'name': name,
+                     'ms': round(duration * 1000, 3), 'thread': threading.current_thread().name}
+            if fields:
+                event.update(fields)
+            _trace.write(json.dumps(event, ensure_ascii=False, default=str) + "\n")
+
+def count(name: str, value: int = 1):
+    """Увеличение счетчика (без замеров - ничего не делает)"""
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+class Span:
+    """Замер блока кода; поля fields попадают в трассу"""
+
+    __slots__ = ("name", "fields", "started")
+
+    def __init__(self, name: str, fields: Dict[str, Any]):
+        self.name = name
+        self.fields = fields
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.started, self.fields)
+        return False
+
+def span(name: str, **fields):
+    """Контекстный менеджер замера: with profiling.span("имя", rows=n): ..."""
+    if not _enabled:
+        return _NULL_SPAN
+    return Span(name, fields)
+
+def timed(name: str):
+    """Декоратор замера функции под именем name"""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - started)
+        return wrapper
+    return decorate
+
+def stats() -> Dict[str, Any]:
+    """Снимок статистики: таймеры (секунды) и счетчики"""
+    with _lock:
+        timers = {
+            name: {'calls': calls, 'total': total, 'mean': total / calls,
+                   'min': minimum, 'max': maximum}
+            for name, (calls, total, minimum, maximum) in _timers.items()
+        }
+        return {'enabled': _enabled, 'timers': timers, 'counters': dict(_counters)}
+
+def report() -> str:
+    """Статистика в виде текстовой таблицы (по убыванию суммарного времени)"""
+    snapshot = stats()
+    lines = [f"{'замер':<36} {'вызовы':>8} {'всего, мс':>11} {'среднее':>9} {'макс':>9}"]
+    for name, timer in sorted(snapshot['timers'].items(), key=lambda item: -item[1]['total']):
+        lines.append(f"{name:<36} {timer['calls']:>8} {timer['total'] * 1000:>11.1f} "
+                     f"{timer['mean'] * 1000:>9.2f} {timer['max'] * 1000:>9.2f}")
+    for name, value in sorted(snapshot['counters'].items()):
+        lines.append(f"{name:<36} {value:>8}")
+    return "\n".join(lines)
+
+def flush():
+    """Запись буфера трассы на диск"""
+    with _lock:
+        if _trace is not None:
+            _trace.flush()
+
+atexit.register(disable)
+
+if os.environ.get("FINANCE_TRACE"):
+    enable(os.environ["FINANCE_TRACE"])
+elif os.environ.get("FINANCE_PROFILE"):
+    enable()
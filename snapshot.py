@@ -0,0 +1,188 @@
+# Бинарный снимок операций
+#
+# Формат (little-endian):
+#   заголовок (HEADER: сигнатура, число категорий, размер записи, число записей;
+#   дополнен до HEADER_SIZE байт)
+#   записи фиксированной длины (RECORD, row_count штук)
+#   смещения строк (uint64, category_count + row_count + 1 штук)
+#   строки в UTF-8 подряд: сначала категории, затем описания по порядку записей
+#
+# Категория в записи - номер строки в таблице категорий, дата - номер дня,
+# сумма - целое число копеек.
+
+import struct
+import sys
+from array import array
+from datetime import date as Date
+from typing import Dict, List
+
+from models import Operation, OperationType
+
+MAGIC = b"FPSNAP02"
+HEADER = struct.Struct("<8sIIQ")
+HEADER_SIZE = 32
+RECORD = struct.Struct("<qqiib7x")
+TYPES = list(OperationType)
+TYPE_CODES = {op_type: code for code, op_type in enumerate(TYPES)}
+
+def write_snapshot(filename: str, operations: List[Operation]):
+    """Запись бинарного снимка"""
+    categories: List[str] = []
+    category_codes: Dict[str, int] = {}
+    records = bytearray()
+    descriptions = []
+    ordinals: Dict[str, int] = {}
+
+    for op in operations:
+        code = category_codes.get(op.category)
+        if code is None:
+            code = category_codes[op.category] = len(categories)
+            categories.append(op.category)
+        day = ordinals.get(op.date)
+        if day is None:
+            day = ordinals[op.date] = Date.fromisoformat(op.date).toordinal()
+        records += RECORD.pack(op.id, op.cents, day, code, TYPE_CODES[op.type])
+        descriptions.append(op.description)
+
+    strings = [s.encode('utf-8') for s in categories + descriptions]
+    offsets = array('Q', [0])
+    for s in strings:
+        offsets.append(offsets[-1] + len(s))
+    if sys.byteorder != 'little':
+        offsets.byteswap()
+
+    with open(filename, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(categories), RECORD.size, len(descriptions)).ljust(HEADER_SIZE, b"\0"))
+        f.write(records)
+        f.write(offsets.tobytes())
+        f.write(b"".join(strings))
+
+def read_header(data: bytes) -> Dict[str, int]:
+    """Разбор заголовка: число категорий и записей, смещения разделов"""
+    magic, category_count, record_size, row_count = HEADER.unpack_from(data)
+    if magic != MAGIC or record_size != RECORD.size:
+        raise ValueError("Файл не является бинарным снимком")
+
+    records_offset = HEADER_SIZE
+    offsets_offset = records_offset + row_count * RECORD.size
+    strings_offset = offsets_offset + (category_count + row_count + 1) * 8
+    return {
+        'category_count': category_count,
+        'row_count': row_count,
+        'records_offset': records_offset,
+        'offsets_offset': offsets_offset,
+        'strings_offset': strings_offset
+    }
+
+def read_snapshot(filename: str) -> List[Operation]:
+    """Чтение бинарного снимка в список операций (без NumPy)"""
+    with open(filename, 'rb') as f:
+        data = f.read()
+
+    header = read_header(data)
+    offsets = array('Q')
+    offsets.frombytes(data[header['offsets_offset']:header['strings_offset']])
+    if sys.byteorder != 'little':
+        offsets.byteswap()
+    strings = memoryview(data)[header['strings_offset']:]
+
+    def string(i):
+        return str(strings[offsets[i]:offsets[i + 1]], 'utf-8')
+
+    categories = [string(i) for i in range(header['category_count'])]
+    records = memoryview(data)[header['records_offset']:header['offsets_offset']]
+    dates: Dict[int, str] = {}
+    operations = []
+    for row, (op_id, cents, day, category, op_type) in enumerate(RECORD.iter_unpack(records)):
+        date = dates.get(day)
+        if date is None:
+            date = dates[day] = Date.fromordinal(day).isoformat()
+        operations.append(Operation.from_cents(
+            id=op_id,
+            cents=cents,
+            category=categories[category],
+            date=date,
+            type=TYPES[op_type],
+            description=string(header['category_count'] + row)
+        ))
+    return operations
+
+class LazyStrings:
+    """Строки снимка, декодируемые по требованию (новые и измененные строки хранятся в памяти)"""
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+        self.base = len(offsets) - 1
+        self.extra: List[str] = []
+        self.changed: Dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return self.base + len(self.extra)
+
+    def __getitem__(self, i: int) -> str:
+        if i < self.base:
+            if i in self.changed:
+                return self.changed[i]
+            return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]]).decode('utf-8')
+        return self.extra[i - self.base]
+
+    def __setitem__(self, i: int, value: str):
+        if i < self.base:
+            self.changed[i] = value
+        else:
+            self.extra[i - self.base] = value
+
+    def append(self, value: str):
+        self.extra.append(value)
+
+class SnapshotColumns:
+    """Колонки бинарного снимка, отображенные в память (numpy.memmap)"""
+
+    def __init__(self, records, categories: List[str], descriptions: LazyStrings):
+        self.records = records
+        self.categories = categories
+        self.descriptions = descriptions
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+def load_columns(filename: str) -> SnapshotColumns:
+    """Отображение снимка в память без копирования и разбора записей
+
+    Записи открываются в режиме копирования при записи: изменения
+    в памяти не попадают в файл.
+    """
+    import numpy as np
+
+    with open(filename, 'rb') as f:
+        header = read_header(f.read(HEADER_SIZE))
+
+    record_dtype = np.dtype({
+        'names': ['id', 'cents', 'day', 'category', 'type'],
+        'formats': ['<i8', '<i8', '<i4', '<i4', 'i1'],
+        'offsets': [0, 8, 16, 20, 24],
+        'itemsize': RECORD.size
+    })
+
+    row_count = header['row_count']
+    string_count = header['category_count'] + row_count
+    if row_count:
+        records = np.memmap(filename, dtype=record_dtype, mode='c',
+                            offset=header['records_offset'], shape=(row_count,))
+    else:
+        records = np.zeros(0, dtype=record_dtype)
+    offsets = np.memmap(filename, dtype='<u8', mode='r',
+                        offset=header['offsets_offset'], shape=(string_count + 1,))
+
+    blob_size = int(offsets[-1])
+    if blob_size:
+        blob = np.memmap(filename, dtype=np.uint8, mode='r',
+                         offset=header['strings_offset'], shape=(blob_size,))
+    else:
+        blob = b""
+
+    strings = LazyStrings(offsets, blob)
+    categories = [strings[i] for i in range(header['category_count'])]
+    descriptions = LazyStrings(offsets[header['category_count']:], blob)
+    return SnapshotColumns(records, categories, descriptions)
@@ -0,0 +1,312 @@
+# Хранение данных в SQLite
+
+import sqlite3
+from collections.abc import Sequence
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from models import Operation, OperationType
+from storage import DataStorage
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS operations (
+    id INTEGER PRIMARY KEY,
+    cents INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    date TEXT NOT NULL,
+    type TEXT NOT NULL,
+    description TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_operations_date ON operations(date);
+CREATE INDEX IF NOT EXISTS idx_operations_category ON operations(category, date);
+CREATE INDEX IF NOT EXISTS idx_operations_type ON operations(type, date);
+"""
+
+COLUMNS = "id, cents, category, date, type, description"
+
+def connect(database: str, check_same_thread: bool = True) -> sqlite3.Connection:
+    """Подключение к базе (режим WAL, создание схемы)
+
+    check_same_thread=False - соединение используется и из фонового
+    потока (SaveScheduler); обращения из разных потоков не пересекаются.
+    """
+    conn = sqlite3.connect(database, check_same_thread=check_same_thread)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+def to_row(op: Operation) -> tuple:
+    """Операция -> строка таблицы"""
+    return (op.id, op.cents, op.category, op.date, op.type.value, op.description)
+
+def from_row(row: tuple) -> Operation:
+    """Строка таблицы -> операция"""
+    return Operation.from_cents(
+        id=row[0],
+        cents=row[1],
+        category=row[2],
+        date=row[3],
+        type=OperationType(row[4]),
+        description=row[5]
+    )
+
+def where_clause(category: Optional[str] = None,
+                 op_type: Optional[OperationType] = None,
+                 start_date: Optional[str] = None,
+                 end_date: Optional[str] = None) -> Tuple[str, list]:
+    """Условие WHERE для фильтров get_filtered_operations"""
+    conditions = []
+    params = []
+    if category:
+        conditions.append("category = ?")
+        params.append(category.strip())
+    if op_type:
+        conditions.append("type = ?")
+        params.append(op_type.value)
+    if start_date:
+        conditions.append("date >= ?")
+        params.append(start_date)
+    if end_date:
+        conditions.append("date <= ?")
+        params.append(end_date)
+
+    sql = " WHERE " + " AND ".join(conditions) if conditions else ""
+    return sql, params
+
+class SQLiteStorage(DataStorage):
+    """Хранилище данных в базе SQLite
+
+    Реализует тот же интерфейс, что и DataStorage (загрузка, сохранение,
+    импорт, экспорт), а также построчную запись изменений. Журнал и
+    бинарный снимок не используются: полный снимок (в том числе при
+    "сжатии" из SaveScheduler) записывается в базу одной транзакцией.
+    """
+
+    def __init__(self, data_file: str = "data.db"):
+        """Инициализация хранилища"""
+        super().__init__(data_file)
+        self.conn = connect(data_file, check_same_thread=False)
+
+    def load_data(self) -> tuple[List[Operation], int]:
+        """Загрузка данных из базы"""
+        try:
+            operations = [from_row(row) for row in
+                          self.conn.execute(f"SELECT {COLUMNS} FROM operations ORDER BY id")]
+            next_id = max([op.id for op in operations], default=0) + 1
+            return operations, next_id
+        except (sqlite3.Error, ValueError):
+            return [], 1
+
+    def _write_snapshot(self, operations: List[Operation]):
+        """Полная замена операций в базе одной транзакцией"""
+        with self.conn:
+            self.conn.execute("DELETE FROM operations")
+            self.conn.executemany(f"INSERT INTO operations ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)",
+                                  (to_row(op) for op in operations))
+
+    def save_data(self, operations: List[Operation]) -> bool:
+        """Сохранение данных в базу (полная замена в одной транзакции)"""
+        try:
+            self._write_snapshot(operations)
+            return True
+        except sqlite3.Error:
+            return False
+
+    def compact(self, operations: List[Operation], background: bool = True) -> bool:
+        """Журнала нет: снимок сразу записывается в базу"""
+        return self.save_data(operations)
+
+    def _replay_journal(self, operations: List[Operation]) -> List[Operation]:
+        """Журнал не используется"""
+        return operations
+
+    def load_columns(self):
+        """Колоночная загрузка доступна только для бинарного снимка"""
+        raise ValueError("Колоночная загрузка доступна только для бинарного снимка")
+
+    def append_operation(self, operation: Operation):
+        """Запись добавленной операции"""
+        with self.conn:
+            self.conn.execute(f"INSERT OR REPLACE INTO operations ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)",
+                              to_row(operation))
+
+    def delete_operation(self, operation_id: int):
+        """Удаление операции из базы"""
+        with self.conn:
+            self.conn.execute("DELETE FROM operations WHERE id = ?", (operation_id,))
+
+    def needs_compaction(self) -> bool:
+        """Журнал не используется"""
+        return False
+
+    def flush(self):
+        """Изменения фиксируются сразу, дополнительных действий не требуется"""
+
+    def close(self):
+        """Закрытие базы"""
+        self.conn.close()
+
+class SQLiteStore:
+    """Хранилище операций FinanceManager поверх базы SQLite
+
+    Фильтры, итоги и список категорий вычисляются запросами SQL
+    по индексированным колонкам, операции в память не загружаются.
+    """
+
+    def __init__(self, database: str):
+        """Инициализация хранилища"""
+        self.conn = connect(database)
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM operations").fetchone()[0]
+
+    def __iter__(self) -> Iterator[Operation]:
+        for row in self.conn.execute(f"SELECT {COLUMNS} FROM operations ORDER BY id"):
+            yield from_row(row)
+
+    def view(self) -> "SQLiteView":
+        """Представление в виде списка операций"""
+        return SQLiteView(self)
+
+    def build_totals(self) -> "SQLiteTotals":
+        """Итоги, вычисляемые запросами SQL"""
+        return SQLiteTotals(self.conn)
+
+    def max_id(self) -> int:
+        """Наибольший id в базе"""
+        return self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM operations").fetchone()[0]
+
+    def append(self, operation: Operation):
+        """Добавление операции"""
+        with self.conn:
+            self.conn.execute(f"INSERT INTO operations ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)",
+                              to_row(operation))
+
+    def extend(self, operations):
+        """Добавление нескольких операций в одной транзакции"""
+        with self.conn:
+            self.conn.executemany(f"INSERT INTO operations ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)",
+                                  (to_row(op) for op in operations))
+
+    def close(self):
+        """Закрытие базы"""
+        self.conn.close()
+
+    def clear(self):
+        """Удаление всех операций"""
+        with self.conn:
+            self.conn.execute("DELETE FROM operations")
+
+    def get(self, operation_id: int) -> Optional[Operation]:
+        """Поиск операции по id"""
+        row = self.conn.execute(f"SELECT {COLUMNS} FROM operations WHERE id = ?",
+                                (operation_id,)).fetchone()
+        return from_row(row) if row else None
+
+    def remove(self, operation_id: int) -> Optional[Operation]:
+        """Удаление операции по id"""
+        operation = self.get(operation_id)
+        if operation is not None:
+            with self.conn:
+                self.conn.execute("DELETE FROM operations WHERE id = ?", (operation_id,))
+        return operation
+
+    def replace(self, operation: Operation) -> Optional[Operation]:
+        """Замена операции с тем же id, возвращает прежнюю"""
+        old = self.get(operation.id)
+        if old is not None:
+            with self.conn:
+                self.conn.execute("UPDATE operations SET cents = ?, category = ?, date = ?, "
+                                  "type = ?, description = ? WHERE id = ?",
+                                  to_row(operation)[1:] + (operation.id,))
+        return old
+    
+    def select(self, **filters) -> List[Operation]:
+        """Список операций, подходящих под фильтры"""
+        where, params = where_clause(**filters)
+        return [from_row(row) for row in
+                self.conn.execute(f"SELECT {COLUMNS} FROM operations{where} ORDER BY id", params)]
+
+    def top(self, n: int, **filters) -> List[Operation]:
+        """n операций с наибольшей суммой"""
+        where, params = where_clause(**filters)
+        return [from_row(row) for row in
+                self.conn.execute(f"SELECT {COLUMNS} FROM operations{where} "
+                                  "ORDER BY cents DESC, id LIMIT ?", params + [n])]
+
+class SQLiteTotals:
+    """Итоги для FinanceManager, вычисляемые запросами SQL
+
+    Интерфейс совпадает с RunningTotals; обновлять итоги не нужно.
+    """
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def update(self, operation: Operation, sign: int = 1):
+        """Итоги вычисляются при запросе"""
+
+    @staticmethod
+    def _add(entry: List[int], op_type: str, cents: int, count: int):
+        """Учет строки результата GROUP BY type"""
+        if op_type == OperationType.INCOME.value:
+            entry[0], entry[2] = cents, count
+        else:
+            entry[1], entry[3] = cents, count
+
+    def _grouped(self, key: str) -> Dict[str, List[int]]:
+        """Итоги [доходы, расходы, число доходов, число расходов] по ключу"""
+        result: Dict[str, List[int]] = {}
+        query = f"SELECT {key}, type, SUM(cents), COUNT(*) FROM operations GROUP BY {key}, type"
+        for value, op_type, cents, count in self.conn.execute(query):
+            self._add(result.setdefault(value, [0, 0, 0, 0]), op_type, cents, count)
+        return result
+
+    def query(self, **filters) -> Tuple[int, int, int, int]:
+        """Итоги по фильтрам: (доходы, расходы, число доходов, число расходов)"""
+        where, params = where_clause(**filters)
+        entry = [0, 0, 0, 0]
+        query = f"SELECT type, SUM(cents), COUNT(*) FROM operations{where} GROUP BY type"
+        for op_type, cents, count in self.conn.execute(query, params):
+            self._add(entry, op_type, cents, count)
+        return tuple(entry)
+
+    def categories(self) -> List[str]:
+        """Отсортированный список категорий"""
+        return [row[0] for row in
+                self.conn.execute("SELECT DISTINCT category FROM operations ORDER BY category")]
+
+    @property
+    def by_category(self) -> Dict[str, List[int]]:
+        return self._grouped("category")
+
+    @property
+    def by_month(self) -> Dict[str, List[int]]:
+        return self._grouped("substr(date, 1, 7)")
+
+class SQLiteView(Sequence):
+    """Представление базы в виде списка операций"""
+
+    def __init__(self, store: SQLiteStore):
+        self.store = store
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def __iter__(self) -> Iterator[Operation]:
+        return iter(self.store)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+        if index < 0:
+            index += len(self)
+        row = self.store.conn.execute(f"SELECT {COLUMNS} FROM operations ORDER BY id LIMIT 1 OFFSET ?",
+                                      (index,)).fetchone()
+        if row is None:
+            raise IndexError(index)
+        return from_row(row)
+
+    def copy(self) -> List[Operation]:
+        """Копия в виде обычного списка"""
+        return list(self)
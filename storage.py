@@ -1,165 +1,849 @@
 # Хранение данных (CSV/JSON)
 
+import codecs
 import csv
+import gzip
+import io
+import itertools
 import json
+import multiprocessing
 import os
-from typing import List, Dict, Any
-from models import Operation, OperationType
+import re
+import shutil
+import threading
+import time
+import zlib
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Optional, Tuple
+import profiling
+from models import Operation, OperationType, to_cents, validate_batch
+from snapshot import load_columns, read_snapshot, write_snapshot
+
+# Размер порции при потоковом импорте (строк)
+IMPORT_CHUNK_SIZE = 10000
+
+# Размер порции при экспорте (строк) и число потоков кодирования
+EXPORT_CHUNK_SIZE = 10000
+EXPORT_WORKERS = min(4, os.cpu_count() or 1)
 
 class DataStorage:
-    """Хранилище данных"""
+    """Хранилище данных
+
+    binary=True - снимок хранится в бинарном формате (см. snapshot.py),
+    CSV используется только для импорта и экспорта.
+    
+    В режиме журнала (journal=True) изменения не перезаписывают CSV файл,
+    а дописываются в журнал (data_file + ".journal"). Снимок (CSV файл)
+    обновляется при сжатии журнала в фоновом потоке. Запись журнала:
+    "<crc32> <json>\n"; запись без перевода строки или с неверной
+    контрольной суммой считается оборванной и отбрасывается при загрузке.
+    
+    read_only=True - только чтение (например, из командной строки, пока
+    открыто приложение): оборванный хвост журнала не обрезается,
+    сохранение и сжатие не выполняются.
+    """
     
-    def __init__(self, data_file: str = "data.csv"):
+    FIELDS = ['id', 'amount', 'category', 'date', 'type', 'description']
+    
+    # fsync выполняется не чаще, чем раз в FSYNC_RECORDS записей или FSYNC_INTERVAL секунд
+    FSYNC_RECORDS = 64
+    FSYNC_INTERVAL = 1.0
+    
+    # Рекомендуемый размер журнала для сжатия (см. needs_compaction)
+    COMPACT_RECORDS = 10000
+    
+    def __init__(self, data_file: str = "data.csv", journal: bool = False,
+                 binary: bool = False, read_only: bool = False):
         """Инициализация хранилища"""
         self.data_file = data_file
+        self.journal = journal
+        self.binary = binary
+        self.read_only = read_only
+        self.journal_file = data_file + ".journal"
+        self.journal_records = 0
+        self._journal = None
+        self._pending = 0
+        self._last_sync = time.monotonic()
+        self._lock = threading.Lock()
+        self._compaction: Optional[threading.Thread] = None
     
+    @profiling.timed("storage.load_data")
     def load_data(self) -> tuple[List[Operation], int]:
-        """Загрузка данных из CSV файла"""
-        operations = []
-        
-        if not os.path.exists(self.data_file):
-            return operations, 1
-        
+        """Загрузка данных из CSV файла (и журнала)"""
         try:
-            with open(self.data_file, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    try:
-                        operation = Operation(
-                            id=int(row['id']),
-                            amount=float(row['amount']),
-                            category=row['category'].strip(),
-                            date=row['date'],
-                            type=OperationType(row['type']),
-                            description=row.get('description', '').strip()
-                        )
-                        operations.append(operation)
-                    except (ValueError, KeyError):
-                        continue
-                        
+            operations = self._read_snapshot()
+            if self.journal:
+                operations = self._replay_journal(operations)
+            
+            mask, _ = validate_batch([op.amount for op in operations],
+                                     [op.date for op in operations])
+            loaded = len(operations)
+            operations = [op for op, valid in zip(operations, mask) if valid]
+            profiling.count("storage.rows_loaded", len(operations))
+            profiling.count("storage.rows_rejected", loaded - len(operations))
+            
             next_id = max([op.id for op in operations], default=0) + 1
             return operations, next_id
             
         except Exception:
             return [], 1
     
+    @profiling.timed("storage.read_snapshot")
+    def _read_snapshot(self) -> List[Operation]:
+        """Чтение снимка из CSV файла"""
+        operations = []
+        
+        if not os.path.exists(self.data_file):
+            return operations
+        
+        if self.binary:
+            return read_snapshot(self.data_file)
+        
+        with open(self.data_file, 'r', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                try:
+                    operation = Operation(
+                        id=int(row['id']),
+                        amount=float(row['amount']),
+                        category=row['category'].strip(),
+                        date=row['date'],
+                        type=OperationType(row['type']),
+                        description=row.get('description', '').strip()
+                    )
+                    operations.append(operation)
+                except (ValueError, KeyError):
+                    continue
+        
+        return operations
+    
+    def _write_snapshot(self, operations: List[Operation]):
+        """Атомарная запись снимка (временный файл и переименование)"""
+        temp_file = self.data_file + ".tmp"
+        if self.binary:
+            write_snapshot(temp_file, operations)
+            with open(temp_file, 'rb') as f:
+                os.fsync(f.fileno())
+            os.replace(temp_file, self.data_file)
+            return
+        
+        export_operations(operations, self.data_file, "csv")
+    
+    @profiling.timed("storage.save_data")
     def save_data(self, operations: List[Operation]) -> bool:
-        """Сохранение данных в CSV файл"""
+        """Сохранение данных в CSV файл (в режиме журнала - со сжатием журнала)"""
+        if self.read_only:
+            return False
+        if self.journal:
+            return self.compact(operations, background=False)
+        
         try:
-            with open(self.data_file, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                writer.writerow(['id', 'amount', 'category', 'date', 'type', 'description'])
-                for op in operations:
-                    writer.writerow([
-                        op.id,
-                        op.amount,
-                        op.category,
-                        op.date,
-                        op.type.value,
-                        op.description
-                    ])
+            self._write_snapshot(operations)
             return True
         except Exception:
             return False
     
-    def export_to_csv(self, operations: List[Operation], filename: str) -> bool:
-        """Экспорт данных в CSV файл"""
+    @profiling.timed("storage.load_columns")
+    def load_columns(self):
+        """Отображение бинарного снимка в память (см. snapshot.load_columns)
+
+        Журнал не применяется: перед вызовом его нужно сжать.
+        Возвращает None, если файла нет.
+        """
+        if not self.binary:
+            raise ValueError("Колоночная загрузка доступна только для бинарного снимка")
+        if not os.path.exists(self.data_file):
+            return None
+        return load_columns(self.data_file)
+    
+    # Журнал
+    
+    def append_operation(self, operation: Operation):
+        """Запись добавленной или измененной операции в журнал
+
+        При воспроизведении запись с тем же id заменяет прежнюю.
+        """
+        self._write_record({
+            'op': 'add',
+            'id': operation.id,
+            'amount': operation.amount,
+            'category': operation.category,
+            'date': operation.date,
+            'type': operation.type.value,
+            'description': operation.description
+        })
+    
+    def delete_operation(self, operation_id: int):
+        """Запись удаления операции в журнал"""
+        self._write_record({'op': 'delete', 'id': operation_id})
+    
+    def _write_record(self, record: Dict[str, Any]):
+        """Запись в журнал (fsync выполняется пакетами)"""
+        if self.read_only:
+            raise OSError("Хранилище открыто только для чтения")
+        line = json.dumps(record, ensure_ascii=False)
+        data = f"{zlib.crc32(line.encode('utf-8')):08x} {line}\n"
+        
+        with self._lock:
+            if self._journal is None:
+                self._journal = open(self.journal_file, 'a', encoding='utf-8')
+            self._journal.write(data)
+            self._journal.flush()
+            self.journal_records += 1
+            self._pending += 1
+            
+            if (self._pending >= self.FSYNC_RECORDS
+                    or time.monotonic() - self._last_sync >= self.FSYNC_INTERVAL):
+                self._sync()
+    
+    def _sync(self):
+        """fsync журнала (вызывается под блокировкой)"""
+        if self._journal is not None and self._pending:
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+    
+    def flush(self):
+        """Принудительный fsync журнала"""
+        with self._lock:
+            self._sync()
+    
+    def needs_compaction(self) -> bool:
+        """Пора ли сжимать журнал"""
+        return self.journal_records >= self.COMPACT_RECORDS
+    
+    def compact(self, operations: List[Operation], background: bool = True) -> bool:
+        """Сжатие журнала: запись снимка и удаление журнала
+
+        operations должен соответствовать состоянию на момент вызова.
+        Новые записи во время сжатия попадают в новый журнал.
+        """
+        if self.read_only:
+            return False
+        self.wait_compaction()
+        operations = list(operations)
+        compacting_file = self.journal_file + ".compacting"
+        
         try:
-            with open(filename, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                writer.writerow(['id', 'amount', 'category', 'date', 'type', 'description'])
-                for op in operations:
-                    writer.writerow([
-                        op.id,
-                        op.amount,
-                        op.category,
-                        op.date,
-                        op.type.value,
-                        op.description
-                    ])
+            with self._lock:
+                if self._journal is not None:
+                    self._sync()
+                    self._journal.close()
+                    self._journal = None
+                
+                if os.path.exists(self.journal_file):
+                    if os.path.exists(compacting_file):
+                        # Предыдущее сжатие не завершилось - дописываем
+                        with open(self.journal_file, 'rb') as src, open(compacting_file, 'ab') as dst:
+                            shutil.copyfileobj(src, dst)
+                        os.remove(self.journal_file)
+                    else:
+                        os.replace(self.journal_file, compacting_file)
+                self.journal_records = 0
+        except OSError:
+            return False
+        
+        if background:
+            self._compaction = threading.Thread(
+                target=self._finish_compaction, args=(operations, compacting_file), daemon=True)
+            self._compaction.start()
+            return True
+        return self._finish_compaction(operations, compacting_file)
+    
+    def _finish_compaction(self, operations: List[Operation], compacting_file: str) -> bool:
+        """Запись снимка и удаление свернутого журнала"""
+        try:
+            self._write_snapshot(operations)
+            if os.path.exists(compacting_file):
+                os.remove(compacting_file)
             return True
         except Exception:
             return False
     
-    def export_to_json(self, operations: List[Operation], filename: str) -> bool:
-        """Экспорт данных в JSON файл"""
-        try:
-            data = []
-            for op in operations:
-                data.append({
-                    'id': op.id,
-                    'amount': op.amount,
-                    'category': op.category,
-                    'date': op.date,
-                    'type': op.type.value,
-                    'description': op.description
-                })
+    def wait_compaction(self):
+        """Ожидание завершения фонового сжатия"""
+        if self._compaction is not None:
+            self._compaction.join()
+            self._compaction = None
+    
+    def close(self):
+        """Завершение работы с журналом"""
+        self.wait_compaction()
+        with self._lock:
+            if self._journal is not None:
+                self._sync()
+                self._journal.close()
+                self._journal = None
+    
+    @profiling.timed("storage.replay_journal")
+    def _replay_journal(self, operations: List[Operation]) -> List[Operation]:
+        """Применение журнала к снимку"""
+        by_id = {op.id: op for op in operations}
+        
+        for path in (self.journal_file + ".compacting", self.journal_file):
+            if not os.path.exists(path):
+                continue
             
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            with open(path, 'rb') as f:
+                data = f.read()
+            
+            valid = 0
+            for line in data.splitlines(keepends=True):
+                record = self._parse_record(line)
+                if record is None:
+                    break
+                valid += len(line)
+                
+                try:
+                    if record['op'] == 'add':
+                        by_id[int(record['id'])] = Operation(
+                            id=int(record['id']),
+                            amount=float(record['amount']),
+                            category=record['category'],
+                            date=record['date'],
+                            type=OperationType(record['type']),
+                            description=record.get('description', '')
+                        )
+                    elif record['op'] == 'delete':
+                        by_id.pop(int(record['id']), None)
+                except (ValueError, KeyError):
+                    continue
+            
+            # Отбрасываем оборванный хвост, чтобы новые записи не склеились с ним
+            if valid < len(data) and not self.read_only:
+                with open(path, 'r+b') as f:
+                    f.truncate(valid)
+            
+            if path == self.journal_file:
+                self.journal_records = data[:valid].count(b"\n")
+        
+        return list(by_id.values())
+    
+    @staticmethod
+    def _parse_record(line: bytes) -> Optional[Dict[str, Any]]:
+        """Разбор записи журнала (None - запись повреждена)"""
+        if not line.endswith(b"\n"):
+            return None
+        try:
+            crc, payload = line.rstrip(b"\n").split(b" ", 1)
+            if int(crc, 16) != zlib.crc32(payload):
+                return None
+            return json.loads(payload.decode('utf-8'))
+        except ValueError:
+            return None
+    
+    def export_to_csv(self, operations: Iterable[Operation], filename: str,
+                      compression: Optional[str] = None) -> bool:
+        """Экспорт данных в CSV файл (потоково, см. export_operations)"""
+        try:
+            export_operations(operations, filename, "csv", compression=compression)
             return True
         except Exception:
             return False
     
+    def export_to_json(self, operations: Iterable[Operation], filename: str,
+                       compact: bool = False, ndjson: bool = False,
+                       compression: Optional[str] = None) -> bool:
+        """Экспорт данных в JSON файл (потоково, см. export_operations)
+
+        compact - без отступов и пробелов, ndjson - по объекту в строке.
+        """
+        try:
+            export_operations(operations, filename, "ndjson" if ndjson else "json",
+                              compact=compact, compression=compression)
+            return True
+        except Exception:
+            return False
+    
+    @profiling.timed("storage.import_csv")
     def import_from_csv(self, filename: str) -> List[Dict[str, Any]]:
         """Импорт данных из CSV файла"""
-        imported = []
-        
-        if not os.path.exists(filename):
-            return imported
-        
         try:
-            with open(filename, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    try:
-                        # Очистка данных
-                        clean_category = row['category'].strip()
-                        clean_description = row.get('description', '').strip()
-                        
-                        imported.append({
-                            'amount': float(row['amount']),
-                            'category': clean_category,
-                            'date': row['date'].strip(),
-                            'type': row.get('type', 'расход').strip(),
-                            'description': clean_description,
-                            'id': int(row.get('id', 0))
-                        })
-                    except (ValueError, KeyError):
-                        continue
-                        
-            return imported
-            
+            return [row for chunk in self.iter_csv_chunks(filename) for row in chunk]
         except Exception:
             return []
         
+    @profiling.timed("storage.import_json")
     def import_json_file(self, filename):
         """Импорт данных из JSON файла"""
-        imported = []
+        try:
+            return [item for chunk in self.iter_json_chunks(filename) for item in chunk]
+        except Exception as e:
+            print(f"Ошибка импорта JSON: {e}")
+            return []
+    
+    @profiling.timed("storage.import_many")
+    def import_many(self, filenames: List[str], workers: Optional[int] = None) -> List["ImportChunk"]:
+        """Параллельный импорт нескольких файлов (CSV/JSON)
+
+        Файлы разбираются и проверяются в пуле процессов (workers, по умолчанию -
+        число ядер). Результаты возвращаются в порядке filenames, так что
+        id, назначенные по порядку от FinanceManager.next_id, детерминированы:
+        
+            for chunk in storage.import_many(files):
+                manager.add_operations(chunk.operations(manager.next_id))
+        """
+        filenames = list(filenames)
+        workers = workers or os.cpu_count() or 1
+        if workers <= 1 or len(filenames) <= 1:
+            return [parse_import_file(filename) for filename in filenames]
+        
+        # Без fork: процесс GUI многопоточный (сохранение, графики), копия
+        # заблокированных в момент fork мьютексов привела бы к зависанию
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        with ProcessPoolExecutor(max_workers=min(workers, len(filenames)), mp_context=context) as executor:
+            return list(executor.map(parse_import_file, filenames))
     
+    def iter_csv_chunks(self, filename: str, chunk_size: int = IMPORT_CHUNK_SIZE,
+                        progress: Optional[Callable[[int, int], None]] = None
+                        ) -> Iterator[List[Dict[str, Any]]]:
+        """Потоковый импорт CSV файла порциями по chunk_size строк
+
+        progress(прочитано_байт, размер_файла) вызывается после каждой порции.
+        """
         if not os.path.exists(filename):
-            return imported
+            return
         
-        try:
-            with open(filename, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            if isinstance(data, list):
-                for item in data:
-                    try:
-                        imported.append({
-                            'amount': float(item['amount']),
-                            'category': str(item.get('category', '')).strip(),
-                            'date': str(item.get('date', '2024-01-01')).strip(),
-                            'type': str(item.get('type', 'расход')).strip(),
-                            'description': str(item.get('description', '')).strip(),
-                            'id': int(item.get('id', 0))
-                        })
-                    except (ValueError, KeyError):
-                        continue
-            
-            return imported
+        total = os.path.getsize(filename)
+        with open(filename, 'r', encoding='utf-8') as f:
+            chunk = []
+            for row in csv.DictReader(f):
+                try:
+                    # Очистка данных
+                    clean_category = row['category'].strip()
+                    clean_description = (row.get('description') or '').strip()
+                    
+                    chunk.append({
+                        'amount': float(row['amount']),
+                        'category': clean_category,
+                        'date': row['date'].strip(),
+                        'type': (row.get('type') or 'расход').strip(),
+                        'description': clean_description,
+                        'id': int(row.get('id') or 0)
+                    })
+                except (ValueError, KeyError, AttributeError):
+                    continue
+                
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+                    if progress:
+                        progress(f.buffer.tell(), total)
+            
+            if chunk:
+                yield chunk
+        if progress:
+            progress(total, total)
+    
+    def iter_json_chunks(self, filename: str, chunk_size: int = IMPORT_CHUNK_SIZE,
+                         progress: Optional[Callable[[int, int], None]] = None
+                         ) -> Iterator[List[Dict[str, Any]]]:
+        """Потоковый импорт JSON файла (массив объектов) порциями по chunk_size записей
+
+        Файл разбирается по частям, целиком в память не загружается.
+        """
+        if not os.path.exists(filename):
+            return
+        
+        total = os.path.getsize(filename)
+        chunk = []
+        for item, position in iter_json_array(filename):
+            try:
+                chunk.append({
+                    'amount': float(item['amount']),
+                    'category': str(item.get('category', '')).strip(),
+                    'date': str(item.get('date', '2024-01-01')).strip(),
+                    'type': str(item.get('type', 'расход')).strip(),
+                    'description': str(item.get('description', '')).strip(),
+                    'id': int(item.get('id', 0))
+                })
+            except (ValueError, KeyError, TypeError, AttributeError):
+                continue
             
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+                if progress:
+                    progress(position, total)
+        
+        if chunk:
+            yield chunk
+        if progress:
+            progress(total, total)
+
+class SaveScheduler:
+    """Отложенное сохранение изменений в фоновом потоке
+
+    Изменения копятся по id (последнее изменение операции заменяет
+    предыдущие) и записываются в журнал хранилища пакетом, когда
+    изменения перестают поступать DELAY секунд (но не позже MAX_DELAY
+    после первого). Запрос полного снимка заменяет накопленные изменения.
+    Вызовы из основного потока не обращаются к диску.
+    
+    Пакет, который не удалось записать, возвращается в очередь (более
+    новые изменения тех же операций важнее) и записывается повторно
+    через RETRY_DELAY секунд и при закрытии; last_error - последняя ошибка.
+    """
+    
+    DELAY = 0.3
+    MAX_DELAY = 2.0
+    RETRY_DELAY = 1.0
+    
+    def __init__(self, storage: DataStorage):
+        self.storage = storage
+        self.pending: Dict[int, Optional[Operation]] = {}
+        self.snapshot: Optional[List[Operation]] = None
+        self.first_change = 0.0
+        self.last_change = 0.0
+        
+        # Результаты последнего сохранения (читаются основным потоком)
+        self.saves = 0
+        self.records_written = 0
+        self.last_latency = 0.0
+        self.last_count = 0
+        self.last_error: Optional[Exception] = None
+        
+        self._condition = threading.Condition()
+        self._closing = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def _changed(self):
+        """Отметка времени изменения и пробуждение потока (под блокировкой)"""
+        now = time.monotonic()
+        if not self.pending and self.snapshot is None:
+            self.first_change = now
+        self.last_change = now
+        self._condition.notify()
+    
+    def save_operation(self, operation: Operation):
+        """Добавленная или измененная операция"""
+        with self._condition:
+            self._changed()
+            self.pending[operation.id] = operation
+    
+    def delete_operation(self, operation_id: int):
+        """Удаленная операция"""
+        with self._condition:
+            self._changed()
+            self.pending[operation_id] = None
+    
+    def save_snapshot(self, operations: List[Operation]):
+        """Полный снимок (сжатие журнала) вместо накопленных изменений"""
+        operations = list(operations)
+        with self._condition:
+            self._changed()
+            self.pending = {}
+            self.snapshot = operations
+    
+    def _due(self) -> float:
+        """Секунд до записи накопленных изменений (0 - пора)"""
+        now = time.monotonic()
+        return max(0.0, min(self.last_change + self.DELAY, self.first_change + self.MAX_DELAY) - now)
+    
+    def _run(self):
+        """Цикл фонового потока"""
+        while True:
+            with self._condition:
+                while not self._closing:
+                    if self.pending or self.snapshot is not None:
+                        delay = self._due()
+                        if delay == 0:
+                            break
+                        self._condition.wait(delay)
+                    else:
+                        self._condition.wait()
+                pending, self.pending = self.pending, {}
+                snapshot, self.snapshot = self.snapshot, None
+                closing = self._closing
+            
+            if pending or snapshot is not None:
+                if not self._write(pending, snapshot) and closing:
+                    # Последняя попытка перед остановкой потока
+                    with self._condition:
+                        pending, self.pending = self.pending, {}
+                        snapshot, self.snapshot = self.snapshot, None
+                    self._write(pending, snapshot)
+            if closing:
+                return
+    
+    def _requeue(self, pending: Dict[int, Optional[Operation]], snapshot: Optional[List[Operation]]):
+        """Возврат незаписанного пакета в начало очереди"""
+        with self._condition:
+            if self.snapshot is None:
+                self.snapshot = snapshot
+                pending.update(self.pending)
+                self.pending = pending
+            # Новый снимок уже содержит все прежние изменения
+            self.first_change = self.last_change = time.monotonic() + self.RETRY_DELAY - self.DELAY
+    
+    @profiling.timed("storage.background_save")
+    def _write(self, pending: Dict[int, Optional[Operation]], snapshot: Optional[List[Operation]]) -> bool:
+        """Запись снимка и пакета изменений (при ошибке пакет возвращается в очередь)"""
+        started = time.perf_counter()
+        count = len(pending) if snapshot is None else len(snapshot)
+        try:
+            if snapshot is not None:
+                if not self.storage.compact(snapshot, background=False):
+                    raise OSError("Не удалось записать снимок")
+                snapshot = None
+            for operation_id, operation in pending.items():
+                if operation is None:
+                    self.storage.delete_operation(operation_id)
+                else:
+                    self.storage.append_operation(operation)
+            self.storage.flush()
+            self.last_error = None
+            self.records_written += len(pending)
         except Exception as e:
-            print(f"Ошибка импорта JSON: {e}")
-            return []
\ No newline at end of file
+            self.last_error = e
+            self._requeue(pending, snapshot)
+        
+        self.last_count = count
+        self.last_latency = time.perf_counter() - started
+        self.saves += 1
+        return self.last_error is None
+    
+    def close(self):
+        """Запись оставшихся изменений и остановка потока"""
+        with self._condition:
+            self._closing = True
+            self._condition.notify()
+        self._thread.join()
+
+def operation_record(op: Operation) -> Dict[str, Any]:
+    """Операция -> словарь для JSON"""
+    return {
+        'id': op.id,
+        'amount': op.amount,
+        'category': op.category,
+        'date': op.date,
+        'type': op.type.value,
+        'description': op.description
+    }
+
+def operation_row(op: Operation) -> list:
+    """Операция -> строка CSV (порядок DataStorage.FIELDS)"""
+    return [op.id, op.amount, op.category, op.date, op.type.value, op.description]
+
+def compress_chunk(data: bytes, compression: Optional[str]) -> bytes:
+    """Сжатие порции в отдельный кадр gzip/zstd (кадры можно склеивать)"""
+    if compression is None:
+        return data
+    if compression == "gzip":
+        return gzip.compress(data, compresslevel=6)
+    if compression == "zstd":
+        try:
+            from compression import zstd
+            return zstd.compress(data)
+        except ImportError:
+            import zstandard
+            return zstandard.ZstdCompressor().compress(data)
+    raise ValueError(f"Неизвестное сжатие: {compression}")
+
+def encode_chunk(operations: List[Operation], fmt: str, first: bool,
+                 compact: bool = False, compression: Optional[str] = None) -> bytes:
+    """Кодирование порции операций (выполняется в рабочем потоке)"""
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if first:
+            writer.writerow(DataStorage.FIELDS)
+        writer.writerows(operation_row(op) for op in operations)
+        text = buffer.getvalue()
+    elif fmt == "ndjson":
+        text = "".join(json.dumps(operation_record(op), ensure_ascii=False, separators=(',', ':')) + "\n"
+                       for op in operations)
+    elif compact:
+        items = ",".join(json.dumps(operation_record(op), ensure_ascii=False, separators=(',', ':'))
+                         for op in operations)
+        text = items if first else "," + items
+    else:
+        # Тот же вид, что у json.dump(..., indent=2) для списка
+        items = ",\n".join("  " + json.dumps(operation_record(op), ensure_ascii=False, indent=2)
+                            .replace("\n", "\n  ") for op in operations)
+        text = ("\n" if first else ",\n") + items
+    return compress_chunk(text.encode('utf-8'), compression)
+
+@profiling.timed("storage.export")
+def export_operations(operations: Iterable[Operation], filename: str, fmt: str = "csv",
+                      compact: bool = False, compression: Optional[str] = None,
+                      chunk_size: int = EXPORT_CHUNK_SIZE,
+                      workers: int = EXPORT_WORKERS):
+    """Потоковый экспорт операций: fmt - "csv", "json" или "ndjson"
+
+    Операции читаются порциями по chunk_size, порции кодируются (и сжимаются,
+    compression - "gzip" или "zstd") в workers потоках и пишутся по порядку.
+    В работе одновременно не больше 2 * workers порций, так что память не
+    зависит от числа операций. Файл записывается атомарно.
+    """
+    if fmt not in ("csv", "json", "ndjson"):
+        raise ValueError(f"Неизвестный формат: {fmt}")
+    array_json = fmt == "json"
+    temp_file = filename + ".tmp"
+    chunks = iter(lambda it=iter(operations): list(itertools.islice(it, chunk_size)), [])
+    
+    try:
+        with open(temp_file, 'wb') as f, \
+                ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            if array_json:
+                f.write(compress_chunk(b"[", compression))
+            
+            in_flight = deque()
+            first = True
+            empty = True
+            for chunk in chunks:
+                in_flight.append(executor.submit(encode_chunk, chunk, fmt, first, compact, compression))
+                first = empty = False
+                if len(in_flight) >= 2 * max(1, workers):
+                    f.write(in_flight.popleft().result())
+            while in_flight:
+                f.write(in_flight.popleft().result())
+            
+            if fmt == "csv" and empty:
+                f.write(encode_chunk([], fmt, True, compression=compression))
+            if array_json:
+                footer = b"]" if compact or empty else b"\n]"
+                f.write(compress_chunk(footer, compression))
+            
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, filename)
+    except BaseException:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise
+
+class ImportChunk:
+    """Проверенные данные одного файла импорта в компактном колоночном виде
+
+    Категории и типы хранятся кодами, суммы - в копейках в массиве array('q').
+    Объект передается между процессами (см. DataStorage.import_many).
+    """
+    
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.cents = array('q')
+        self.category_codes = array('i')
+        self.categories: List[str] = []
+        self.dates: List[str] = []
+        self.type_codes = array('b')
+        self.descriptions: List[str] = []
+        self.rejected = 0
+    
+    def __len__(self) -> int:
+        return len(self.cents)
+    
+    def extend(self, rows: List[Dict[str, Any]]):
+        """Проверка и добавление порции строк импорта"""
+        codes = {category: code for code, category in enumerate(self.categories)}
+        types = list(OperationType)
+        parsed = []
+        for row in rows:
+            try:
+                parsed.append((row['amount'], row['category'], row['date'],
+                               types.index(OperationType(row['type'])), row['description']))
+            except ValueError:
+                continue
+        
+        mask, _ = validate_batch([p[0] for p in parsed], [p[2] for p in parsed])
+        self.rejected += len(rows) - len(parsed)
+        for (amount, category, date, type_code, description), valid in zip(parsed, mask):
+            if not valid:
+                self.rejected += 1
+                continue
+            code = codes.get(category)
+            if code is None:
+                code = codes[category] = len(self.categories)
+                self.categories.append(category)
+            self.cents.append(to_cents(amount))
+            self.category_codes.append(code)
+            self.dates.append(date)
+            self.type_codes.append(type_code)
+            self.descriptions.append(description)
+    
+    def operations(self, first_id: int) -> List[Operation]:
+        """Операции с id, начиная с first_id"""
+        types = list(OperationType)
+        return [Operation.from_cents(id=first_id + i, cents=cents, category=self.categories[code],
+                                     date=date, type=types[type_code], description=description)
+                for i, (cents, code, date, type_code, description) in enumerate(zip(
+                    self.cents, self.category_codes, self.dates, self.type_codes, self.descriptions))]
+
+def parse_import_file(filename: str) -> ImportChunk:
+    """Разбор и проверка одного файла импорта (выполняется в процессе пула)"""
+    storage = DataStorage(filename)
+    if filename.lower().endswith('.json'):
+        chunks = storage.iter_json_chunks(filename)
+    else:
+        chunks = storage.iter_csv_chunks(filename)
+    
+    result = ImportChunk(filename)
+    for rows in chunks:
+        result.extend(rows)
+    return result
+
+def iter_json_array(filename: str, block_size: int = 1 << 16) -> Iterator[Tuple[Any, int]]:
+    """Инкрементальный разбор JSON массива верхнего уровня
+
+    Возвращает пары (элемент, прочитано_байт). Если в файле не массив,
+    ничего не возвращает. Элементы разбираются по смещению в буфере;
+    разобранная часть отбрасывается только при чтении следующего блока.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    skip = re.compile(r'[ \t\r\n]*')
+    skip_items = re.compile(r'[ \t\r\n,]*')
+    
+    with open(filename, 'rb') as f:
+        buffer = ""
+        index = 0
+        position = 0
+        eof = False
+        started = False
+        
+        def refill():
+            nonlocal buffer, index, position, eof
+            block = f.read(block_size)
+            position += len(block)
+            eof = not block
+            buffer = buffer[index:] + text_decoder.decode(block, final=eof)
+            index = 0
+        
+        while True:
+            # Пропуск пробелов и разделителей (запятая - только внутри массива)
+            while True:
+                index = (skip_items if started else skip).match(buffer, index).end()
+                if index < len(buffer) or eof:
+                    break
+                refill()
+            
+            if index >= len(buffer):
+                return
+            
+            if not started:
+                if buffer[index] != "[":
+                    return
+                index += 1
+                started = True
+                continue
+            
+            if buffer[index] == "]":
+                return
+            
+            try:
+                item, end = decoder.raw_decode(buffer, index)
+                if end == len(buffer) and not eof:
+                    raise ValueError("Элемент может продолжаться в следующем блоке")
+            except ValueError:
+                if eof:
+                    raise
+                refill()
+                continue
+            
+            index = end
+            yield item, position
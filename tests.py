@@ -3,8 +3,21 @@
 import unittest
 import os
 import tempfile
+import time
 from models import Operation, OperationType, FinanceManager
-from storage import DataStorage
+from storage import DataStorage, SaveScheduler
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import matplotlib
+    matplotlib.use("Agg")
+    from analysis import DataAnalyzer
+except ImportError:
+    DataAnalyzer = None
 
 class TestModels(unittest.TestCase):
     """Тесты моделей"""
@@ -20,6 +33,47 @@ class TestModels(unittest.TestCase):
         op = Operation(3, 100.0, "Категория", "2024-13-01", OperationType.INCOME)
         self.assertFalse(op.validate())
     
+    def test_compact_operation(self):
+        """Тест компактной записи операции (копейки, общие строки)"""
+        import pickle
+        from models import calculate_balance
+        op = Operation(1, 19.99, "".join(["Е", "да"]), "2024-01-01", OperationType.EXPENSE, "обед")
+        self.assertFalse(hasattr(op, "__dict__"))
+        self.assertEqual((op.cents, op.amount), (1999, 19.99))
+        self.assertIs(op.category, Operation(2, 1, "Еда", "2024-01-01", OperationType.EXPENSE).category)
+        self.assertEqual(op, Operation.from_cents(1, 1999, "Еда", "2024-01-01", OperationType.EXPENSE, "обед"))
+        self.assertEqual(pickle.loads(pickle.dumps(op)), op)
+
+        changed = op.replace(amount=5, description="ужин")
+        self.assertEqual((changed.cents, changed.description, op.cents), (500, "ужин", 1999))
+
+        operations = [Operation(i, 0.1, "Еда", "2024-01-01", OperationType.INCOME) for i in range(10)]
+        self.assertEqual(calculate_balance(operations), 1.0)
+
+        self.assertFalse(Operation(3, 0.001, "Еда", "2024-01-01", OperationType.EXPENSE).validate())
+        self.assertRaises(ValueError, Operation, 4, float('inf'), "Еда", "2024-01-01", OperationType.EXPENSE)
+
+    def test_validate_batch(self):
+        """Тест пакетной валидации (совпадение с построчной проверкой)"""
+        from models import validate_batch, validation_error, AMOUNT_ERROR, DATE_ERROR, VECTORIZE_MIN_ROWS
+        dates = ["2024-01-01", "2024-02-29", "2023-02-29", "2024-04-31", "2024-13-01",
+                 "2024-00-10", "0000-01-01", "2024-1-01", "2024-01-01 ", "2024/01/01",
+                 "", "20240101", "2024-01-0a", "9999-12-31", "1900-02-29", "2000-02-29"]
+        # Пакет больше порога, чтобы проверить векторный путь
+        dates = dates * (VECTORIZE_MIN_ROWS // len(dates) + 1)
+        amounts = [1.0] * len(dates)
+        amounts[0] = 0.0
+        amounts[1] = float('nan')
+        
+        mask, reasons = validate_batch(amounts, dates)
+        expected = {i: validation_error(a, d) for i, (a, d) in enumerate(zip(amounts, dates))
+                    if validation_error(a, d)}
+        self.assertEqual(reasons, expected)
+        self.assertEqual([bool(m) for m in mask], [i not in expected for i in range(len(dates))])
+        self.assertEqual(reasons[0], AMOUNT_ERROR)
+        self.assertEqual(reasons[2], DATE_ERROR)
+        self.assertEqual(list(validate_batch([], [])[0]), [])
+    
     def test_finance_manager(self):
         """Тест менеджера операций"""
         manager = FinanceManager()
@@ -37,6 +91,436 @@ class TestModels(unittest.TestCase):
         manager.add_operation(200.0, "Доход", "2024-01-01", OperationType.INCOME)
         manager.add_operation(50.0, "Расход", "2024-01-02", OperationType.EXPENSE)
         self.assertEqual(manager.get_balance(), 150.0)
+    
+    def test_get_and_bulk_delete(self):
+        """Тест поиска по id и пакетного удаления"""
+        manager = FinanceManager()
+        for i in range(3000):
+            manager.add_operation(1.0, f"К{i % 3}", "2024-01-01", OperationType.EXPENSE)
+        
+        self.assertEqual(manager.get_operation(5).category, "К1")
+        self.assertIsNone(manager.get_operation(5000))
+        
+        self.assertEqual(manager.delete_operations(range(1, 2501)), 2500)
+        self.assertEqual(manager.delete_operations([1, 2999, 2999]), 1)
+        self.assertIsNone(manager.get_operation(5))
+        self.assertEqual(len(manager.operations), 499)
+        self.assertEqual(manager.operations[0].id, 2501)
+        self.assertEqual(manager.get_operation(3000).category, "К2")
+        self.assertEqual(len(manager.get_filtered_operations(category="К0", start_date="2024-01-01")), 166)
+        self.assertEqual(manager.get_categories(), ["К0", "К1", "К2"])
+        manager.get_categories().append("Чужая")
+        self.assertEqual(manager.get_categories(), ["К0", "К1", "К2"])
+        
+        # Доступ по номеру после удаления не сжимает хранилище
+        manager.delete_operations([2600, 2700])
+        dead = manager._store.dead
+        view, ops = manager.operations, list(manager.operations)
+        self.assertEqual([view[i] for i in range(len(view))], ops)
+        self.assertEqual(view[-1], ops[-1])
+        self.assertEqual(view[95:105], ops[95:105])
+        self.assertEqual(manager._store.dead, dead)
+        manager.add_operation(1.0, "К0", "2024-01-02", OperationType.EXPENSE)
+        manager.delete_operation(2502)
+        self.assertEqual(list(view[:3]) + [view[-1]], list(manager.operations)[:3] + [manager.get_operation(3001)])
+        
+        # Удаления после доступа по номеру не медленнее удалений без него
+        timings = []
+        for indexed in (False, True):
+            manager = FinanceManager()
+            manager.operations = [Operation(i, 1.0, "К", "2024-01-01", OperationType.EXPENSE)
+                                  for i in range(1, 200001)]
+            manager.delete_operation(200000)
+            if indexed:
+                manager.operations[10]
+            started = time.perf_counter()
+            manager.delete_operations(range(1, 200000, 10))
+            timings.append(time.perf_counter() - started)
+            self.assertEqual(manager.operations[1].id, 3)
+        self.assertLess(timings[1], timings[0] * 2 + 0.05)
+    
+    def test_update_operation(self):
+        """Тест изменения операции и события update"""
+        backends = ["list", "sqlite"] + (["columnar"] if numpy else [])
+        for backend in backends:
+            manager = FinanceManager(backend, database=":memory:")
+            events = []
+            manager.subscribe(lambda event, ops: events.append((event, ops)))
+            manager.add_operation(100, "Еда", "2024-01-15", OperationType.EXPENSE)
+            manager.add_operation(500, "Зарплата", "2024-01-10", OperationType.INCOME)
+            
+            self.assertTrue(manager.update_operation(1, amount=40, category=" Кафе ", date="2024-02-01"))
+            self.assertFalse(manager.update_operation(1, date="2024-13-01"))
+            self.assertFalse(manager.update_operation(99, amount=1))
+            
+            old, new = events[-1][1]
+            self.assertEqual(events[-1][0], "update")
+            self.assertEqual((old.amount, new.amount, new.category), (100, 40, "Кафе"))
+            self.assertEqual(list(manager.operations)[0], new, backend)
+            self.assertEqual(manager.get_totals(), (500, 40, 2))
+            self.assertEqual(manager.get_categories(), ["Зарплата", "Кафе"])
+            self.assertEqual(manager.get_filtered_operations(start_date="2024-02-01"), [new], backend)
+            self.assertEqual(manager.get_filtered_operations(end_date="2024-01-31",
+                                                             op_type=OperationType.EXPENSE), [])
+        
+        # Повторные правки даты не увеличивают индекс по дате
+        manager = FinanceManager()
+        manager.add_operation(100, "Еда", "2024-01-15", OperationType.EXPENSE)
+        manager.add_operation(500, "Зарплата", "2024-01-10", OperationType.INCOME)
+        size = len(manager._store.date_index)
+        for day in range(2000):
+            manager.update_operation(1, date=f"2024-{day % 12 + 1:02d}-{day % 28 + 1:02d}")
+        self.assertEqual(len(manager._store.date_index), size)
+        self.assertEqual(manager.get_filtered_operations(start_date="2024-01-01", end_date="2024-01-10"),
+                         [manager.get_operation(2)])
+    
+    def test_text_search(self):
+        """Тест поиска по описанию (инвертированный индекс)"""
+        manager = FinanceManager()
+        manager.add_operation(100, "Еда", "2024-01-15", OperationType.EXPENSE, "Кофе в кафе")
+        manager.add_operation(200, "Еда", "2024-02-15", OperationType.EXPENSE, "Продукты, кофейные зерна")
+        manager.add_operation(500, "Зарплата", "2024-01-10", OperationType.INCOME, "Аванс")
+        
+        self.assertEqual([op.id for op in manager.search("кофе")], [1, 2])
+        self.assertEqual([op.id for op in manager.search("КОФ зерн")], [2])
+        self.assertEqual([op.id for op in manager.search("ав")], [3])
+        self.assertEqual(manager.search("чай"), [])
+        
+        # Индекс обновляется при изменениях
+        manager.add_operation(50, "Еда", "2024-02-20", OperationType.EXPENSE, "Чай и кофе")
+        manager.update_operation(1, description="Обед")
+        manager.delete_operation(2)
+        self.assertEqual([op.id for op in manager.search("кофе")], [4])
+        self.assertEqual([op.id for op in manager.search("обед")], [1])
+        
+        self.assertEqual([op.id for op in manager.get_filtered_operations(text="е", start_date="2024-02-01")],
+                         [4])
+        self.assertEqual(manager.get_totals(text="аванс"), (500, 0, 1))
+        self.assertEqual(manager.get_totals(text="   "), (500, 150, 3))
+        
+        manager.operations = [Operation(7, 10, "Еда", "2024-03-01", OperationType.EXPENSE, "кофе")]
+        self.assertEqual([op.id for op in manager.search("кофе")], [7])
+    
+    def test_running_totals(self):
+        """Тест нарастающих итогов"""
+        manager = FinanceManager()
+        manager.add_operation(1000.10, "Зарплата", "2024-01-10", OperationType.INCOME)
+        manager.add_operation(0.1, "Еда", "2024-01-15", OperationType.EXPENSE)
+        manager.add_operation(0.2, "Еда", "2024-02-01", OperationType.EXPENSE)
+        manager.add_operation(300.0, "Жилье", "2024-02-05", OperationType.EXPENSE)
+        manager.delete_operation(4)
+        
+        self.assertEqual(manager.get_balance(), 999.8)
+        self.assertEqual(manager.get_totals(), (1000.1, 0.3, 3))
+        self.assertEqual(manager.get_totals(category="Еда"), (0.0, 0.3, 2))
+        self.assertEqual(manager.get_totals(op_type=OperationType.INCOME), (1000.1, 0.0, 1))
+        self.assertEqual(manager.get_totals(start_date="2024-01-11", end_date="2024-02-01"), (0.0, 0.3, 2))
+        self.assertEqual(manager.get_totals(category="Еда", end_date="2024-01-31"), (0.0, 0.1, 1))
+        self.assertEqual(manager.get_totals(category="Жилье"), (0.0, 0.0, 0))
+        self.assertEqual(manager.get_categories(), ["Еда", "Зарплата"])
+        self.assertEqual(manager.get_monthly_totals(),
+                         {"2024-01": (1000.1, 0.1), "2024-02": (0.0, 0.2)})
+        self.assertEqual(manager.get_balance(start_date="2024-01-11"),
+                         manager.get_balance(manager.get_filtered_operations(start_date="2024-01-11")))
+        
+        # Итоги, построенные при загрузке по группам, совпадают с пошаговыми
+        manager.add_operation(5.5, "Еда", "2024-01-15", OperationType.EXPENSE)
+        loaded = FinanceManager()
+        loaded.operations = list(manager.operations)
+        for totals in (manager._totals, loaded._totals):
+            totals.daily.range()
+        self.assertEqual(vars(loaded._totals.daily), vars(manager._totals.daily))
+        self.assertEqual((loaded._totals.total, loaded._totals.by_category, loaded._totals.by_month),
+                         (manager._totals.total, manager._totals.by_category, manager._totals.by_month))
+        self.assertEqual({category: vars(daily) for category, daily in loaded._totals.daily_by_category.items()},
+                         {category: vars(daily) for category, daily in manager._totals.daily_by_category.items()})
+    
+    def test_filter_indexes(self):
+        """Тест фильтрации по индексам (сравнение с полным перебором, все хранилища)"""
+        import random
+        backends = ["list", "sqlite"] + (["columnar"] if numpy else [])
+        for backend in backends:
+            rng = random.Random(1)
+            manager = FinanceManager(backend, database=":memory:")
+            for _ in range(300):
+                manager.add_operation(rng.randint(1, 100), rng.choice(["А", "Б", "В"]),
+                                      f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                                      rng.choice(list(OperationType)))
+            for op_id in rng.sample(range(1, 301), 100):
+                manager.delete_operation(op_id)
+            
+            ops = list(manager.operations)
+            for category in (None, "Б", "нет"):
+                for op_type in (None, OperationType.EXPENSE):
+                    for start, end in ((None, None), ("2024-03-01", None), ("2024-02", "2024-06-15"),
+                                       ("2024-0", "2024-06"), ("2024-04-1", "2024-09-2"), ("2025", None)):
+                        expected = [op for op in ops
+                                    if (not category or op.category == category)
+                                    and (not op_type or op.type == op_type)
+                                    and (not start or op.date >= start)
+                                    and (not end or op.date <= end)]
+                        self.assertEqual(manager.get_filtered_operations(category, op_type, start, end),
+                                         expected, (backend, start, end))
+
+    def test_top_expenses(self):
+        """Тест топ-N расходов (сравнение с полной сортировкой)"""
+        import random
+        backends = ["list", "sqlite"] + (["columnar"] if numpy else [])
+        for backend in backends:
+            rng = random.Random(2)
+            manager = FinanceManager(backend, database=":memory:")
+            for _ in range(200):
+                manager.add_operation(rng.randint(1, 50), rng.choice(["А", "Б"]),
+                                      f"2024-{rng.randint(1, 6):02d}-{rng.randint(1, 28):02d}",
+                                      rng.choice(list(OperationType)))
+            for op_id in rng.sample(range(1, 201), 50):
+                manager.delete_operation(op_id)
+            
+            expenses = [op for op in manager.operations if op.type == OperationType.EXPENSE]
+            expected = sorted(expenses, key=lambda op: (-op.amount, op.id))
+            self.assertEqual(manager.get_top_expenses(5), expected[:5], backend)
+            
+            expected = [op for op in expected if op.category == "Б" and op.date >= "2024-03-01"]
+            self.assertEqual(manager.get_top_expenses(7, category="Б", start_date="2024-03-01"),
+                             expected[:7], backend)
+            self.assertEqual(manager.get_top_expenses(1000),
+                             sorted(expenses, key=lambda op: (-op.amount, op.id)), backend)
+            self.assertEqual(manager.get_top_expenses(0), [])
+
+    def test_benchmark_suite(self):
+        """Тест генератора учета и прогона замеров"""
+        import bench
+        ledger = bench.generate_ledger(500, seed=7)
+        self.assertEqual(ledger, bench.generate_ledger(500, seed=7))
+        self.assertNotEqual(ledger, bench.generate_ledger(500, seed=8))
+        self.assertTrue(all(op.validate() for op in ledger))
+        self.assertEqual([op.date for op in ledger], sorted(op.date for op in ledger))
+        self.assertEqual(bench.parse_size("1.5k"), 1500)
+
+        results = bench.run_benchmarks([200], ["load_csv", "filter_text", "balance"],
+                                       backends=["list", "sqlite"], repeat=1)
+        self.assertEqual([(r['scenario'], r['backend']) for r in results],
+                         [("load_csv", None), ("filter_text", "list"), ("balance", "list"),
+                          ("filter_text", "sqlite"), ("balance", "sqlite")])
+        self.assertTrue(all(r['median'] >= 0 and r['peak_memory'] > 0 for r in results))
+
+        slower = [dict(r, median=r['median'] * 2 + 1) for r in results]
+        self.assertEqual(len(bench.compare(slower, results)), len(results))
+        self.assertEqual(bench.compare(results, slower), [])
+
+class TestSortedRows(unittest.TestCase):
+    """Тесты отсортированного списка строк таблицы"""
+    
+    def test_insert_remove(self):
+        """Тест вставки и удаления с сохранением порядка"""
+        from virtual_tree import SortedRows
+        ops = [Operation(i, float(amount), "К", "2024-01-01", OperationType.EXPENSE)
+               for i, amount in enumerate([30, 10, 20, 10], start=1)]
+        rows = SortedRows(ops[:3], key=lambda op: op.amount)
+        self.assertEqual([op.id for op in rows], [2, 3, 1])
+        
+        self.assertEqual(rows.insert(ops[3]), 1)
+        self.assertEqual([op.id for op in rows], [2, 4, 3, 1])
+        self.assertEqual(rows.remove(ops[2]), 2)
+        self.assertEqual(rows.remove(ops[2]), -1)
+        
+        rows.reverse = True
+        self.assertEqual([op.id for op in rows[0:2]], [1, 4])
+        self.assertEqual(rows[-1].id, 2)
+        self.assertEqual(rows.insert(ops[2]), 1)
+
+    def test_sort_orders(self):
+        """Тест кэша порядков сортировки и сортировки по нескольким колонкам"""
+        from virtual_tree import SortOrders
+        ops = [Operation(1, 30.0, "А", "2024-01-02", OperationType.EXPENSE),
+               Operation(2, 10.0, "Б", "2024-01-01", OperationType.EXPENSE),
+               Operation(3, 20.0, "А", "2024-01-02", OperationType.INCOME)]
+        keys = {"date": lambda op: op.date, "amount": lambda op: op.amount}
+        orders = SortOrders(ops, keys)
+        
+        by_date = orders.get(("date", "amount"))
+        self.assertEqual([op.id for op in by_date], [2, 3, 1])
+        self.assertIs(orders.get(("date", "amount"), reverse=True), by_date)
+        self.assertEqual([op.id for op in by_date], [1, 3, 2])
+        
+        by_amount = orders.get(("amount",))
+        orders.insert(Operation(4, 15.0, "В", "2024-01-02", OperationType.EXPENSE))
+        orders.remove(ops[0])
+        self.assertEqual([op.id for op in by_amount], [2, 4, 3])
+        self.assertEqual([op.id for op in orders.get(("date", "amount"))], [2, 4, 3])
+        self.assertEqual(len(orders), 3)
+
+@unittest.skipUnless(DataAnalyzer, "требуются pandas и matplotlib")
+class TestAnalysis(unittest.TestCase):
+    """Тесты анализатора"""
+    
+    def test_cached_dataframe(self):
+        """Тест кэширования и обновления DataFrame"""
+        manager = FinanceManager()
+        analyzer = DataAnalyzer(manager)
+        self.assertTrue(analyzer.get_dataframe().empty)
+        
+        manager.add_operation(100, "Еда", "2024-01-15", OperationType.EXPENSE)
+        manager.add_operation(500, "Зарплата", "2024-01-10", OperationType.INCOME)
+        df = analyzer.get_dataframe()
+        self.assertEqual(list(df['id']), [1, 2])
+        self.assertEqual(list(df['date'].dt.month), [1, 1])
+        self.assertEqual(df['category'].dtype.name, 'category')
+        
+        # Повторный вызов не перестраивает таблицу
+        self.assertIs(analyzer.get_dataframe(), df)
+        builds = analyzer.frame_builds
+        
+        manager.add_operation(50, "Транспорт", "2024-02-01", OperationType.EXPENSE)
+        manager.delete_operation(1)
+        df = analyzer.get_dataframe()
+        self.assertEqual(list(df['id']), [2, 3])
+        self.assertEqual(list(df['category']), ["Зарплата", "Транспорт"])
+        self.assertEqual(analyzer.frame_builds, builds)
+        
+        manager.operations = []
+        self.assertTrue(analyzer.get_dataframe().empty)
+        
+        self.assertIsNotNone(analyzer.plot_income_vs_expenses())
+
+    def test_rollup(self):
+        """Тест куба итогов (месяц, категория, тип)"""
+        manager = FinanceManager()
+        analyzer = DataAnalyzer(manager)
+        manager.add_operation(100, "Еда", "2024-01-15", OperationType.EXPENSE)
+        manager.add_operation(300, "Еда", "2024-01-20", OperationType.EXPENSE)
+        manager.add_operation(500, "Зарплата", "2024-01-10", OperationType.INCOME)
+        
+        cube = analyzer.rollup()
+        self.assertEqual(cube[("2024-01", "Еда", "расход")],
+                         {'sum': 400, 'count': 2, 'min': 100, 'max': 300})
+        
+        # Изменения после построения куба учитываются без пересчета
+        manager.add_operation(50.5, "Еда", "2024-02-01", OperationType.EXPENSE)
+        manager.delete_operation(2)
+        by_type = analyzer.rollup(by=("type",))
+        self.assertEqual(by_type[("расход",)], {'sum': 150.5, 'count': 2, 'min': 50.5, 'max': 100})
+        self.assertEqual(by_type[("доход",)]['sum'], 500)
+        
+        by_month = analyzer.rollup(by=("month",), op_type=OperationType.EXPENSE,
+                                   start_month="2024-02")
+        self.assertEqual(list(by_month), [("2024-02",)])
+        
+        manager.delete_operation(1)
+        manager.delete_operation(4)
+        self.assertEqual(list(analyzer.rollup(by=("category",))), [("Зарплата",)])
+        self.assertIsNotNone(analyzer.plot_expenses_by_category())
+        
+        # Минимум и максимум после удаления повторяющихся крайних сумм
+        for day in (1, 2, 3):
+            manager.add_operation(100 if day < 3 else 300, "Кафе", f"2024-03-0{day}", OperationType.EXPENSE)
+        manager.delete_operation(5)
+        self.assertEqual(analyzer.rollup(by=("category",))[("Кафе",)],
+                         {'sum': 400, 'count': 2, 'min': 100, 'max': 300})
+        manager.delete_operation(6)
+        self.assertEqual(analyzer.rollup(by=("category",))[("Кафе",)],
+                         {'sum': 300, 'count': 1, 'min': 300, 'max': 300})
+        
+        manager.operations = []
+        self.assertEqual(analyzer.rollup(), {})
+
+    def test_update_events(self):
+        """Тест обновления кэшей анализатора при изменении операции"""
+        manager = FinanceManager()
+        analyzer = DataAnalyzer(manager)
+        manager.add_operation(100, "Еда", "2024-01-15", OperationType.EXPENSE)
+        analyzer.get_dataframe()
+        analyzer.rollup()
+        
+        manager.add_operation(200, "Еда", "2024-01-20", OperationType.EXPENSE)
+        manager.update_operation(2, category="Кафе")
+        manager.update_operation(1, amount=70)
+        df = analyzer.get_dataframe()
+        self.assertEqual(sorted(zip(df['id'], df['amount'], df['category'])),
+                         [(1, 70.0, "Еда"), (2, 200.0, "Кафе")])
+        self.assertEqual(analyzer.rollup(by=("category",)),
+                         {("Еда",): {'sum': 70, 'count': 1, 'min': 70, 'max': 70},
+                          ("Кафе",): {'sum': 200, 'count': 1, 'min': 200, 'max': 200}})
+    
+    def test_render_chart_in_thread(self):
+        """Тест построения графиков по данным в рабочем потоке"""
+        from concurrent.futures import ThreadPoolExecutor
+        from analysis import CHARTS, render_chart
+        manager = FinanceManager()
+        analyzer = DataAnalyzer(manager)
+        manager.add_operation(100, "Еда", "2024-01-15", OperationType.EXPENSE)
+        manager.add_operation(500, "Зарплата", "2024-02-10", OperationType.INCOME)
+        self.assertEqual(analyzer.monthly_totals(), [("2024-01", 0, 100), ("2024-02", 500, 0)])
+        
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [executor.submit(render_chart, chart, analyzer.chart_data(chart))
+                       for chart in CHARTS]
+            for future in futures:
+                self.assertTrue(future.result().startswith(b"\x89PNG"))
+        
+        # Куб итогов после загрузки строится при первом запросе графика
+        manager.operations = list(manager.operations)
+        self.assertIsNone(analyzer._cube)
+        self.assertEqual(analyzer.chart_data("income_expense"), [("2024-01", 0, 100), ("2024-02", 500, 0)])
+        self.assertEqual(len(analyzer._cube), 2)
+        
+        # Пустые данные - график с сообщением
+        self.assertTrue(render_chart("categories", None).startswith(b"\x89PNG"))
+
+@unittest.skipUnless(numpy, "требуется numpy")
+class TestColumnar(unittest.TestCase):
+    """Тесты колоночного хранилища"""
+    
+    def fill(self, manager):
+        """Заполнение менеджера тестовыми операциями"""
+        manager.add_operation(200.0, "Зарплата", "2024-01-01", OperationType.INCOME)
+        manager.add_operation(50.0, "Еда", "2024-01-05", OperationType.EXPENSE, "Обед")
+        manager.add_operation(30.0, "Еда", "2024-02-01", OperationType.EXPENSE)
+        manager.add_operation(10.0, "Транспорт", "2024-02-10", OperationType.EXPENSE)
+    
+    def test_same_results_as_list(self):
+        """Тест совпадения результатов со списочным хранилищем"""
+        columnar = FinanceManager(backend="columnar")
+        plain = FinanceManager()
+        for manager in (columnar, plain):
+            self.fill(manager)
+            manager.delete_operation(4)
+        
+        self.assertEqual(list(columnar.operations), list(plain.operations))
+        self.assertEqual(columnar.get_categories(), plain.get_categories())
+        self.assertEqual(columnar.get_balance(), plain.get_balance())
+        
+        filters = {'category': "Еда", 'start_date': "2024-01-02"}
+        self.assertEqual(columnar.get_filtered_operations(**filters),
+                         plain.get_filtered_operations(**filters))
+        self.assertEqual(columnar.get_balance(**filters), -80.0)
+        self.assertEqual(columnar.get_balance(op_type=OperationType.INCOME), 200.0)
+    
+    def test_view(self):
+        """Тест представления в виде списка"""
+        manager = FinanceManager(backend="columnar")
+        self.fill(manager)
+        manager.delete_operation(1)
+        
+        self.assertEqual(len(manager.operations), 3)
+        self.assertEqual(manager.operations[0].description, "Обед")
+        self.assertEqual([op.id for op in manager.operations[1:]], [3, 4])
+        
+        manager.operations = [Operation(7, 5.0, "Еда", "2024-03-01", OperationType.EXPENSE)]
+        self.assertEqual(manager.get_categories(), ["Еда"])
+        self.assertFalse(manager.delete_operation(1))
+    
+    def test_compact(self):
+        """Тест сжатия после массового удаления"""
+        manager = FinanceManager(backend="columnar")
+        for _ in range(3000):
+            manager.add_operation(1.0, "Еда", "2024-01-01", OperationType.EXPENSE)
+        for op_id in range(1, 2901):
+            self.assertTrue(manager.delete_operation(op_id))
+        
+        self.assertEqual(len(manager.operations), 100)
+        self.assertEqual(manager.get_balance(), -100.0)
+        self.assertEqual(manager.operations[0].id, 2901)
 
 class TestStorage(unittest.TestCase):
     """Тесты хранилища"""
@@ -70,6 +554,506 @@ class TestStorage(unittest.TestCase):
         loaded, next_id = storage.load_data()
         self.assertEqual(len(loaded), 2)
         self.assertEqual(next_id, 3)
+    
+    def test_lazy_heavy_imports(self):
+        """Тест: импорт интерфейса не загружает pandas, matplotlib и NumPy"""
+        import subprocess
+        import sys
+        code = ("import sys, gui; "
+                "print([m for m in ('pandas', 'matplotlib', 'numpy') if m in sys.modules])")
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout
+        self.assertEqual(output.strip(), "[]")
+
+    def test_cli(self):
+        """Тест командной строки: несколько файлов, ошибка и отсутствие tkinter"""
+        import json
+        import subprocess
+        import sys
+        operations = [
+            Operation(1, 1000, "Зарплата", "2024-01-01", OperationType.INCOME, "Аванс"),
+            Operation(2, 200, "Еда", "2024-01-05", OperationType.EXPENSE, "Кофе и обед"),
+            Operation(3, 50, "Еда", "2024-02-01", OperationType.EXPENSE, "Кофе")
+        ]
+        DataStorage(self.test_file).save_data(operations)
+        second = os.path.join(self.temp_dir, "second.csv")
+        DataStorage(second).save_data(operations[:1])
+        missing = os.path.join(self.temp_dir, "missing.csv")
+
+        code = ("import sys, cli; code = cli.main(sys.argv[1:]); "
+                "sys.stdout.write('tkinter' if 'tkinter' in sys.modules else ''); sys.exit(code)")
+        process = subprocess.run(
+            [sys.executable, "-c", code, "balance", self.test_file, second, missing,
+             "--format", "json", "--workers", "2"],
+            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        self.assertEqual(process.returncode, 1)
+        self.assertFalse(process.stdout.endswith("tkinter"))
+        results = json.loads(process.stdout)
+        self.assertEqual([result['file'] for result in results], [self.test_file, second, missing])
+        self.assertEqual((results[0]['income'], results[0]['expense'], results[0]['count']), (1000, 250, 3))
+        self.assertEqual(results[1]['balance'], 1000)
+        self.assertIn('error', results[2])
+
+        import io
+        import cli
+        out = io.StringIO()
+        self.assertEqual(cli.main(["top", self.test_file, "-n", "1", "--category", "Еда"], out), 0)
+        self.assertEqual(out.getvalue().strip(), "2,200.0,Еда,2024-01-05,расход,Кофе и обед")
+        self.assertEqual(cli.output_path("out/{name}.png", "/data/ledger.2024.01.csv"), "out/ledger.2024.01.png")
+        
+        # Период не из целых месяцев и поиск применяются точно
+        out = io.StringIO()
+        self.assertEqual(cli.main(["rollup", self.test_file, "--by", "month", "--from", "2024-01-02",
+                                   "--format", "json"], out), 0)
+        self.assertEqual([(row['month'], row['sum']) for row in json.loads(out.getvalue())[0]['rows']],
+                         [("2024-01", 200), ("2024-02", 50)])
+        out = io.StringIO()
+        self.assertEqual(cli.main(["rollup", self.test_file, "--by", "type", "--from", "2024-01-01",
+                                   "--to", "2024-01-31", "--format", "json"], out), 0)
+        self.assertEqual([row['sum'] for row in json.loads(out.getvalue())[0]['rows']], [1000, 200])
+        out = io.StringIO()
+        self.assertEqual(cli.main(["top", self.test_file, "--search", "обед", "--format", "json"], out), 0)
+        self.assertEqual([op['id'] for op in json.loads(out.getvalue())[0]['operations']], [2])
+        
+        # Журнал (с оборванной записью) читается, но не изменяется
+        storage = DataStorage(self.test_file, journal=True)
+        storage.delete_operation(3)
+        storage.close()
+        with open(storage.journal_file, 'ab') as f:
+            f.write(b"0000 {\"op\": ")
+        with open(storage.journal_file, 'rb') as f:
+            journal = f.read()
+        out = io.StringIO()
+        self.assertEqual(cli.main(["balance", self.test_file, "--format", "json"], out), 0)
+        self.assertEqual(json.loads(out.getvalue())[0]['expense'], 200)
+        with open(storage.journal_file, 'rb') as f:
+            self.assertEqual(f.read(), journal)
+
+    def test_streaming_export(self):
+        """Тест потокового экспорта (JSON, NDJSON, gzip)"""
+        import gzip
+        import json
+        operations = [Operation(i, i * 1.5, "Кат", "2024-01-01", OperationType.EXPENSE, f"Опис. {i}")
+                      for i in range(1, 26)]
+        records = [{'id': op.id, 'amount': op.amount, 'category': op.category, 'date': op.date,
+                    'type': op.type.value, 'description': op.description} for op in operations]
+        filename = os.path.join(self.temp_dir, "export.json")
+        storage = DataStorage(self.test_file)
+        
+        self.assertTrue(storage.export_to_json(iter(operations), filename))
+        with open(filename, encoding='utf-8') as f:
+            self.assertEqual(f.read(), json.dumps(records, ensure_ascii=False, indent=2))
+        
+        self.assertTrue(storage.export_to_json(operations, filename + ".gz", compact=True, compression="gzip"))
+        with gzip.open(filename + ".gz", 'rt', encoding='utf-8') as f:
+            self.assertEqual(json.load(f), records)
+        
+        self.assertTrue(storage.export_to_json(operations, filename, ndjson=True))
+        with open(filename, encoding='utf-8') as f:
+            self.assertEqual([json.loads(line) for line in f], records)
+        
+        self.assertTrue(storage.export_to_csv(operations, filename + ".csv.gz", compression="gzip"))
+        self.assertFalse(storage.export_to_csv(operations, filename, compression="rar"))
+        self.assertFalse(os.path.exists(filename + ".tmp"))
+    
+    def test_import_many(self):
+        """Тест параллельного импорта нескольких файлов"""
+        filenames = []
+        for n in range(3):
+            filename = os.path.join(self.temp_dir, f"import{n}.csv")
+            DataStorage(filename).export_to_csv(
+                [Operation(i, 10.0 * n + i, f"К{n}", f"2024-0{n + 1}-{i:02d}", OperationType.EXPENSE)
+                 for i in range(1, 6)], filename)
+            filenames.append(filename)
+        with open(filenames[1], 'a', encoding='utf-8') as f:
+            f.write("99,5.0,К1,2024-02-30,расход,\n")
+        
+        storage = DataStorage(self.test_file)
+        results = []
+        for workers in (1, 2):
+            manager = FinanceManager()
+            manager.add_operation(1.0, "Старая", "2024-01-01", OperationType.INCOME)
+            chunks = storage.import_many(filenames, workers=workers)
+            self.assertEqual([len(chunk) for chunk in chunks], [5, 5, 5])
+            self.assertEqual(chunks[1].rejected, 1)
+            for chunk in chunks:
+                manager.add_operations(chunk.operations(manager.next_id))
+            results.append(list(manager.operations))
+        
+        self.assertEqual(results[0], results[1])
+        self.assertEqual([op.id for op in results[0]], list(range(1, 17)))
+        self.assertEqual(results[0][6].category, "К1")
+        with self.assertRaises(ValueError):
+            manager.add_operations(chunks[0].operations(1))
+    
+    def test_streaming_import(self):
+        """Тест потокового импорта порциями"""
+        import json
+        from storage import iter_json_array
+        storage = DataStorage(self.test_file)
+        json_file = os.path.join(self.temp_dir, "import.json")
+        items = [{"amount": i + 1, "category": f"Кат {i % 3}", "date": "2024-01-%02d" % (i % 28 + 1),
+                  "type": "расход", "description": "Тест ✓"} for i in range(25)]
+        items[3]['amount'] = "не число"
+        with open(json_file, 'w', encoding='utf-8') as f:
+            json.dump(items, f, ensure_ascii=False, indent=2)
+        
+        self.assertEqual([item for item, _ in iter_json_array(json_file, block_size=5)], items)
+        
+        progress = []
+        chunks = list(storage.iter_json_chunks(json_file, chunk_size=10,
+                                               progress=lambda done, total: progress.append(done)))
+        self.assertEqual([len(chunk) for chunk in chunks], [10, 10, 4])
+        self.assertEqual(progress[-1], os.path.getsize(json_file))
+        
+        storage.export_to_csv([Operation(i + 1, 1.0, "К", "2024-01-01", OperationType.EXPENSE)
+                               for i in range(7)], self.test_file)
+        self.assertEqual([len(chunk) for chunk in storage.iter_csv_chunks(self.test_file, chunk_size=5)],
+                         [5, 2])
+        
+        manager = FinanceManager()
+        manager.add_operation(1.0, "Старая", "2024-01-01", OperationType.INCOME)
+        self.assertEqual(sum(manager.add_operations_bulk(chunk) for chunk in chunks), 24)
+        self.assertEqual(manager.add_operations_bulk([{'amount': 5, 'category': "К", 'date': "2024-13-01",
+                                                       'type': "расход"}]), 0)
+        self.assertEqual(manager.next_id, 26)
+        self.assertEqual(manager.get_operation(25).category, "Кат 0")
+        self.assertEqual(len(manager.get_filtered_operations(category="Кат 0", end_date="2024-01-10")), 3)
+        self.assertEqual(manager.get_totals(op_type=OperationType.EXPENSE)[2], 24)
+
+class TestBinarySnapshot(unittest.TestCase):
+    """Тесты бинарного снимка"""
+    
+    def setUp(self):
+        """Настройка тестов"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.test_file = os.path.join(self.temp_dir, "test.bin")
+        self.operations = [
+            Operation(1, 100.5, "Зарплата", "2024-01-01", OperationType.INCOME, "Аванс"),
+            Operation(2, 50.0, "Еда", "2024-01-02", OperationType.EXPENSE, ""),
+            Operation(5, 20.25, "Еда", "2024-02-03", OperationType.EXPENSE, "Кофе ☕")
+        ]
+    
+    def tearDown(self):
+        """Очистка"""
+        import shutil
+        shutil.rmtree(self.temp_dir)
+    
+    def test_save_load(self):
+        """Тест сохранения и загрузки"""
+        storage = DataStorage(self.test_file, binary=True)
+        self.assertTrue(storage.save_data(self.operations))
+        
+        loaded, next_id = storage.load_data()
+        self.assertEqual(loaded, self.operations)
+        self.assertEqual(next_id, 6)
+        
+        self.assertTrue(storage.save_data([]))
+        self.assertEqual(storage.load_data(), ([], 1))
+        
+        # Суммы хранятся в копейках без потери точности
+        large = [Operation.from_cents(1, 2 ** 53 + 1, "Еда", "2024-01-01", OperationType.EXPENSE)]
+        storage.save_data(large)
+        self.assertEqual(storage.load_data()[0], large)
+        if numpy:
+            manager = FinanceManager(backend="columnar")
+            manager.load_columns(storage.load_columns())
+            self.assertEqual(list(manager.operations), large)
+    
+    @unittest.skipUnless(numpy, "требуется numpy")
+    def test_load_columns(self):
+        """Тест загрузки через отображение в память"""
+        storage = DataStorage(self.test_file, binary=True)
+        storage.save_data(self.operations)
+        
+        manager = FinanceManager(backend="columnar")
+        manager.load_columns(storage.load_columns())
+        plain = FinanceManager()
+        plain.operations = self.operations
+        
+        self.assertEqual(list(manager.operations), self.operations)
+        self.assertEqual(manager.next_id, 6)
+        self.assertEqual(manager.get_categories(), plain.get_categories())
+        self.assertEqual(manager.get_monthly_totals(), plain.get_monthly_totals())
+        self.assertEqual(manager.get_totals(category="Еда", start_date="2024-01-02"),
+                         plain.get_totals(category="Еда", start_date="2024-01-02"))
+        
+        self.assertTrue(manager.delete_operation(2))
+        self.assertTrue(manager.add_operation(1.0, "Еда", "2024-03-01", OperationType.EXPENSE))
+        self.assertEqual(manager.get_operation(6).category, "Еда")
+        self.assertEqual(manager.get_balance(), 100.5 - 20.25 - 1.0)
+        
+        # Файл снимка не изменился
+        self.assertEqual(storage.load_data()[0], self.operations)
+
+class TestSQLite(unittest.TestCase):
+    """Тесты хранилища SQLite"""
+    
+    def setUp(self):
+        """Настройка тестов"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.test_file = os.path.join(self.temp_dir, "test.db")
+    
+    def tearDown(self):
+        """Очистка"""
+        import shutil
+        shutil.rmtree(self.temp_dir)
+    
+    def test_save_load(self):
+        """Тест сохранения и загрузки"""
+        from sqlite_storage import SQLiteStorage
+        storage = SQLiteStorage(self.test_file)
+        operations = [
+            Operation(1, 100.0, "Категория1", "2024-01-01", OperationType.INCOME, "Описание1"),
+            Operation(2, 50.0, "Категория2", "2024-01-02", OperationType.EXPENSE, "Описание2")
+        ]
+        
+        self.assertTrue(storage.save_data(operations))
+        storage.delete_operation(1)
+        self.assertEqual(storage.load_data(), (operations[1:], 3))
+        self.assertEqual(storage.conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        storage.close()
+    
+    def test_compact_keeps_database(self):
+        """Тест сжатия (SaveScheduler): снимок записывается в базу, а не в CSV"""
+        import sqlite3
+        from sqlite_storage import SQLiteStorage
+        storage = SQLiteStorage(self.test_file)
+        operations = [Operation(i, 10.0 * i, "К", "2024-01-01", OperationType.EXPENSE) for i in range(1, 4)]
+        
+        self.assertTrue(storage.compact(operations, background=False))
+        saver = SaveScheduler(storage)
+        saver.save_snapshot(operations[:2])
+        saver.close()
+        self.assertIsNone(saver.last_error)
+        storage.close()
+        
+        with open(self.test_file, 'rb') as f:
+            self.assertTrue(f.read(16).startswith(b"SQLite format 3"))
+        conn = sqlite3.connect(self.test_file)
+        self.assertEqual(conn.execute("SELECT id FROM operations ORDER BY id").fetchall(), [(1,), (2,)])
+        conn.close()
+        self.assertFalse(os.path.exists(self.test_file + ".journal"))
+        self.assertRaises(ValueError, SQLiteStorage(self.test_file).load_columns)
+    
+    def test_pushdown(self):
+        """Тест фильтров и итогов в SQL (сравнение со списочным хранилищем)"""
+        sql = FinanceManager(backend="sqlite", database=self.test_file)
+        plain = FinanceManager()
+        for manager in (sql, plain):
+            manager.add_operation(200.0, "Зарплата", "2024-01-01", OperationType.INCOME)
+            manager.add_operation(50.5, "Еда", "2024-01-05", OperationType.EXPENSE, "Обед")
+            manager.add_operation(30.0, "Еда", "2024-02-01", OperationType.EXPENSE)
+            manager.delete_operation(1)
+        
+        filters = {'category': "Еда", 'start_date': "2024-01-02"}
+        self.assertEqual(sql.get_filtered_operations(**filters), plain.get_filtered_operations(**filters))
+        self.assertEqual(sql.get_totals(**filters), plain.get_totals(**filters))
+        self.assertEqual(sql.get_balance(), -80.5)
+        self.assertEqual(sql.get_categories(), ["Еда"])
+        self.assertEqual(sql.get_monthly_totals(), plain.get_monthly_totals())
+        self.assertEqual(sql.get_operation(2).description, "Обед")
+        
+        # Второй процесс видит те же данные
+        other = FinanceManager(backend="sqlite", database=self.test_file)
+        self.assertEqual(list(other.operations), list(plain.operations))
+        self.assertEqual(other.operations[-1].id, 3)
+        self.assertEqual(other.next_id, 4)
+        
+        import sqlite3
+        for manager in (sql, other, plain):
+            manager.close()
+        self.assertRaises(sqlite3.ProgrammingError, len, sql.operations)
+
+class TestJournal(unittest.TestCase):
+    """Тесты журнала изменений"""
+    
+    def setUp(self):
+        """Настройка тестов"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.test_file = os.path.join(self.temp_dir, "test.csv")
+        self.operations = [
+            Operation(1, 100.0, "Категория1", "2024-01-01", OperationType.INCOME, "Описание1"),
+            Operation(2, 50.0, "Категория2", "2024-01-02", OperationType.EXPENSE, "Описание2")
+        ]
+    
+    def tearDown(self):
+        """Очистка"""
+        import shutil
+        shutil.rmtree(self.temp_dir)
+    
+    def test_replay(self):
+        """Тест восстановления снимка и журнала"""
+        storage = DataStorage(self.test_file, journal=True)
+        self.assertTrue(storage.save_data(self.operations[:1]))
+        storage.append_operation(self.operations[1])
+        storage.delete_operation(1)
+        storage.close()
+        
+        loaded, next_id = DataStorage(self.test_file, journal=True).load_data()
+        self.assertEqual(loaded, self.operations[1:])
+        self.assertEqual(next_id, 3)
+    
+    def test_replay_update(self):
+        """Тест записи измененной операции в журнал"""
+        storage = DataStorage(self.test_file, journal=True)
+        self.assertTrue(storage.save_data(self.operations))
+        changed = Operation(1, 75.0, "Категория3", "2024-01-05", OperationType.INCOME, "Изменено")
+        storage.append_operation(changed)
+        storage.close()
+        
+        loaded, _ = DataStorage(self.test_file, journal=True).load_data()
+        self.assertEqual(loaded, [changed, self.operations[1]])
+    
+    def test_save_scheduler(self):
+        """Тест отложенного сохранения с объединением изменений"""
+        storage = DataStorage(self.test_file, journal=True)
+        saver = SaveScheduler(storage)
+        saver.save_snapshot(self.operations)
+        
+        changed = Operation(1, 75.0, "Категория1", "2024-01-05", OperationType.INCOME, "Изменено")
+        added = Operation(3, 10.0, "Категория3", "2024-01-03", OperationType.EXPENSE)
+        for op in (added, changed, added):
+            saver.save_operation(op)
+        saver.delete_operation(2)
+        saver.close()
+        storage.close()
+        
+        # Три операции в одном пакете после снимка
+        self.assertEqual(saver.records_written, 3)
+        self.assertIsNone(saver.last_error)
+        loaded, next_id = DataStorage(self.test_file, journal=True).load_data()
+        self.assertEqual(sorted(loaded, key=lambda op: op.id), [changed, added])
+        self.assertEqual(next_id, 4)
+    
+    def test_save_scheduler_retry(self):
+        """Тест повторной записи пакета после ошибки"""
+        storage = DataStorage(self.test_file, journal=True)
+        failures = [OSError("Диск заполнен")]
+        append_operation = storage.append_operation
+        
+        def failing_append(operation):
+            if failures:
+                raise failures.pop()
+            append_operation(operation)
+        
+        storage.append_operation = failing_append
+        saver = SaveScheduler(storage)
+        saver.DELAY = saver.RETRY_DELAY = 0.01
+        saver.save_operation(self.operations[0])
+        saver.save_operation(self.operations[1])
+        deadline = time.monotonic() + 5
+        while saver.saves < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertIsNone(saver.last_error)
+        
+        # Ошибка и при закрытии - пакет остается в очереди
+        failures.extend([OSError("Диск заполнен")] * 2)
+        added = Operation(3, 10.0, "Категория3", "2024-01-03", OperationType.EXPENSE)
+        saver.save_operation(added)
+        saver.close()
+        storage.close()
+        self.assertIsInstance(saver.last_error, OSError)
+        self.assertEqual(list(saver.pending), [3])
+        self.assertEqual(DataStorage(self.test_file, journal=True).load_data()[0], self.operations[:2])
+    
+    def test_truncated_record(self):
+        """Тест оборванной последней записи"""
+        storage = DataStorage(self.test_file, journal=True)
+        storage.append_operation(self.operations[0])
+        storage.append_operation(self.operations[1])
+        storage.close()
+        
+        with open(storage.journal_file, 'r+b') as f:
+            f.truncate(os.path.getsize(storage.journal_file) - 5)
+        
+        storage = DataStorage(self.test_file, journal=True)
+        loaded, _ = storage.load_data()
+        self.assertEqual(loaded, self.operations[:1])
+        
+        # Новые записи не склеиваются с оборванной
+        storage.append_operation(self.operations[1])
+        storage.close()
+        loaded, _ = DataStorage(self.test_file, journal=True).load_data()
+        self.assertEqual(loaded, self.operations)
+    
+    def test_compaction(self):
+        """Тест фонового сжатия журнала"""
+        storage = DataStorage(self.test_file, journal=True)
+        for op in self.operations:
+            storage.append_operation(op)
+        self.assertEqual(storage.journal_records, 2)
+        
+        self.assertTrue(storage.compact(self.operations))
+        storage.delete_operation(2)
+        storage.close()
+        
+        self.assertFalse(os.path.exists(storage.journal_file + ".compacting"))
+        self.assertEqual(DataStorage(self.test_file).load_data()[0], self.operations)
+        self.assertEqual(DataStorage(self.test_file, journal=True).load_data()[0],
+                         self.operations[:1])
+
+class TestProfiling(unittest.TestCase):
+    """Тесты замеров времени"""
+
+    def setUp(self):
+        """Настройка тестов"""
+        import profiling
+        self.profiling = profiling
+        self.was_enabled = profiling.is_enabled()
+        profiling.disable()
+        profiling.reset()
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Очистка"""
+        import shutil
+        self.profiling.disable()
+        self.profiling.reset()
+        if self.was_enabled:
+            self.profiling.enable()
+        shutil.rmtree(self.temp_dir)
+
+    def test_stats_and_trace(self):
+        """Тест таймеров, счетчиков и трассы"""
+        import json
+        profiling = self.profiling
+        data_file = os.path.join(self.temp_dir, "data.csv")
+        storage = DataStorage(data_file)
+        storage.save_data([Operation(1, 100, "Еда", "2024-01-01", OperationType.EXPENSE),
+                           Operation(2, 5, "Еда", "2024-13-01", OperationType.EXPENSE)])
+        manager = FinanceManager()
+
+        # Выключено - ничего не учитывается
+        manager.get_balance()
+        with profiling.span("block"):
+            pass
+        self.assertEqual(profiling.stats()['timers'], {})
+
+        trace_file = os.path.join(self.temp_dir, "trace.jsonl")
+        profiling.enable(trace_file)
+        manager.operations = storage.load_data()[0]
+        manager.get_balance()
+        manager.get_balance(category="Еда")
+        with profiling.span("block", rows=3):
+            pass
+        profiling.disable()
+        manager.get_balance()
+
+        stats = profiling.stats()
+        self.assertFalse(stats['enabled'])
+        self.assertEqual(stats['timers']['manager.get_balance']['calls'], 2)
+        self.assertEqual(stats['timers']['storage.load_data']['calls'], 1)
+        self.assertIn('models.validate_batch', stats['timers'])
+        self.assertEqual(stats['counters'], {'storage.rows_loaded': 1, 'storage.rows_rejected': 1})
+        self.assertIn("manager.get_balance", profiling.report())
+
+        with open(trace_file, encoding='utf-8') as f:
+            events = [json.loads(line) for line in f]
+        self.assertEqual([e['name'] for e in events].count("manager.get_balance"), 2)
+        self.assertEqual(events[-1]['name'], "block")
+        self.assertEqual(events[-1]['rows'], 3)
+        self.assertIsNone(profiling.trace_file())
 
 if __name__ == '__main__':
     unittest.main()
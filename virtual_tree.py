@@ -0,0 +1,283 @@
+# Виртуализированная таблица для больших списков
+
+import tkinter as tk
+from bisect import bisect_left
+from collections import OrderedDict
+from collections.abc import Sequence as SequenceABC
+from tkinter import ttk
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Set, Tuple
+
+class SortedRows(SequenceABC):
+    """Строки, упорядоченные по ключу, с вставкой и удалением за O(log N)
+
+    Строки хранятся по возрастанию (ключ, id); порядок по убыванию
+    получается обходом с конца, без пересортировки.
+    """
+
+    def __init__(self, rows, key: Callable[[Any], Any], reverse: bool = False):
+        self.key = key
+        self.reverse = reverse
+        self.rows = sorted(rows, key=self._sort_key)
+        self.keys = [self._sort_key(row) for row in self.rows]
+
+    def _sort_key(self, row) -> tuple:
+        return self.key(row), row.id
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self.rows)))]
+        if index < 0:
+            index += len(self.rows)
+        if not 0 <= index < len(self.rows):
+            raise IndexError(index)
+        return self.rows[len(self.rows) - 1 - index if self.reverse else index]
+
+    def _position(self, i: int) -> int:
+        """Номер строки в порядке отображения по номеру в списке"""
+        return len(self.rows) - 1 - i if self.reverse else i
+
+    def insert(self, row) -> int:
+        """Вставка строки, возвращает ее номер в порядке отображения"""
+        key = self._sort_key(row)
+        i = bisect_left(self.keys, key)
+        self.keys.insert(i, key)
+        self.rows.insert(i, row)
+        return self._position(i)
+
+    def remove(self, row) -> int:
+        """Удаление строки (по ее прежним значениям), возвращает номер или -1"""
+        key = self._sort_key(row)
+        i = bisect_left(self.keys, key)
+        if i == len(self.keys) or self.keys[i] != key:
+            return -1
+        position = self._position(i)
+        del self.keys[i]
+        del self.rows[i]
+        return position
+
+class SortOrders:
+    """Кэш порядков сортировки одного набора строк
+
+    Для каждого набора колонок хранится SortedRows; смена направления
+    сортировки не требует пересортировки, а вставка и удаление строк
+    применяются ко всем сохраненным порядкам. Число порядков ограничено
+    (вытесняются давно не использованные).
+    """
+
+    MAX_ORDERS = 4
+
+    def __init__(self, rows: Iterable[Any], keys: Dict[str, Callable[[Any], Any]]):
+        self.keys = keys
+        self.rows: Dict[Any, Any] = {row.id: row for row in rows}
+        self.orders: "OrderedDict[Tuple[str, ...], SortedRows]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def key(self, columns: Tuple[str, ...]) -> Callable[[Any], Any]:
+        """Ключ сортировки по нескольким колонкам (по порядку)"""
+        if len(columns) == 1:
+            return self.keys[columns[0]]
+        keys = [self.keys[column] for column in columns]
+        return lambda row: tuple(key(row) for key in keys)
+
+    def get(self, columns: Tuple[str, ...], reverse: bool = False) -> SortedRows:
+        """Строки, упорядоченные по колонкам columns"""
+        order = self.orders.get(columns)
+        if order is None:
+            order = self.orders[columns] = SortedRows(self.rows.values(), self.key(columns))
+            while len(self.orders) > self.MAX_ORDERS:
+                self.orders.popitem(last=False)
+        else:
+            self.orders.move_to_end(columns)
+        order.reverse = reverse
+        return order
+
+    def insert(self, row):
+        """Добавление строки во все порядки"""
+        self.rows[row.id] = row
+        for order in self.orders.values():
+            order.insert(row)
+
+    def remove(self, row):
+        """Удаление строки (по ее прежним значениям) из всех порядков"""
+        if self.rows.pop(row.id, None) is not None:
+            for order in self.orders.values():
+                order.remove(row)
+
+class VirtualTreeview(ttk.Frame):
+    """Таблица, в которой создаются только строки видимого окна
+
+    Данные - последовательность строк (например, отсортированный список
+    операций). Treeview содержит фиксированный набор элементов по высоте
+    окна (плюс небольшой запас), при прокрутке меняются только их
+    значения. Выделение хранится по ключам строк и сохраняется при
+    прокрутке.
+    """
+
+    BUFFER = 2
+    WHEEL_ROWS = 3
+    DEFAULT_ROW_HEIGHT = 20
+
+    def __init__(self, master, columns: Sequence[str],
+                 format_row: Callable[[Any], tuple],
+                 key: Callable[[Any], Any] = lambda row: row.id,
+                 height: int = 12):
+        """Инициализация таблицы"""
+        super().__init__(master)
+        self.format_row = format_row
+        self.key = key
+        self.rows: Sequence[Any] = []
+        self.offset = 0
+        self.visible = height
+        self.window_keys: List[Any] = []
+        self.selected: Set[Any] = set()
+        self.cursor = 0
+        self._rendering = False
+
+        self.tree = ttk.Treeview(self, columns=columns, show="headings",
+                                 height=height, selectmode="extended")
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.yview)
+        self.tree.grid(row=0, column=0, sticky="nsew")
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+        self.rowconfigure(0, weight=1)
+        self.columnconfigure(0, weight=1)
+
+        self.tree.bind("<Configure>", self._on_resize)
+        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+        self.tree.bind("<MouseWheel>", self._on_wheel)
+        self.tree.bind("<Button-4>", lambda e: self.scroll(-self.WHEEL_ROWS))
+        self.tree.bind("<Button-5>", lambda e: self.scroll(self.WHEEL_ROWS))
+        for sequence, step in (("<Up>", -1), ("<Down>", 1),
+                               ("<Prior>", "page_up"), ("<Next>", "page_down"),
+                               ("<Home>", "home"), ("<End>", "end")):
+            self.tree.bind(sequence, lambda e, s=step: self._on_key(s))
+
+    def set_rows(self, rows: Sequence[Any], prune: bool = True):
+        """Замена отображаемых строк (позиция прокрутки сохраняется)
+
+        prune=False - набор строк тот же (например, другой порядок),
+        выделение не проверяется.
+        """
+        self.rows = rows
+        if prune and self.selected:
+            self.selected &= {self.key(row) for row in rows}
+        self.render()
+
+    def selected_keys(self) -> List[Any]:
+        """Ключи выделенных строк (включая строки вне окна)"""
+        return list(self.selected)
+
+    def render(self):
+        """Отрисовка видимого окна строк"""
+        total = len(self.rows)
+        self.offset = max(0, min(self.offset, total - self.visible))
+        window = self.rows[self.offset:self.offset + self.visible + self.BUFFER]
+
+        items = list(self.tree.get_children())
+        if len(items) > len(window):
+            self.tree.delete(*items[len(window):])
+            items = items[:len(window)]
+        while len(items) < len(window):
+            items.append(self.tree.insert("", tk.END))
+
+        self.window_keys = []
+        selection = []
+        for item, row in zip(items, window):
+            key = self.key(row)
+            self.window_keys.append(key)
+            self.tree.item(item, values=self.format_row(row))
+            if key in self.selected:
+                selection.append(item)
+
+        self._rendering = True
+        self.tree.selection_set(selection)
+        self.after_idle(self._end_render)
+
+        if total:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + self.visible) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def _end_render(self):
+        self._rendering = False
+
+    def scroll(self, rows: int):
+        """Прокрутка на заданное число строк"""
+        offset = max(0, min(self.offset + rows, len(self.rows) - self.visible))
+        if offset != self.offset:
+            self.offset = offset
+            self.render()
+        return "break"
+
+    def see(self, index: int):
+        """Прокрутка к строке с номером index"""
+        if index < self.offset:
+            self.scroll(index - self.offset)
+        elif index >= self.offset + self.visible:
+            self.scroll(index - self.offset - self.visible + 1)
+
+    def yview(self, *args):
+        """Обработка команд полосы прокрутки"""
+        if args[0] == "moveto":
+            self.offset = int(float(args[1]) * len(self.rows))
+            self.render()
+        elif args[0] == "scroll":
+            step = self.visible if args[2] == "pages" else 1
+            self.scroll(int(args[1]) * step)
+
+    def _on_resize(self, event):
+        """Пересчет числа видимых строк по высоте таблицы"""
+        items = self.tree.get_children()
+        bbox = self.tree.bbox(items[0]) if items else None
+        if bbox:
+            header, row_height = bbox[1], bbox[3]
+        else:
+            header = row_height = self.DEFAULT_ROW_HEIGHT
+        visible = max(1, (event.height - header) // max(1, row_height))
+        if visible != self.visible:
+            self.visible = visible
+            self.render()
+
+    def _on_wheel(self, event):
+        """Прокрутка колесом мыши"""
+        return self.scroll(-self.WHEEL_ROWS if event.delta > 0 else self.WHEEL_ROWS)
+
+    def _on_select(self, event):
+        """Синхронизация выделения окна с набором ключей"""
+        if self._rendering:
+            return
+        items = self.tree.get_children()
+        chosen = {self.window_keys[items.index(item)] for item in self.tree.selection()}
+        self.selected = (self.selected - set(self.window_keys)) | chosen
+        focus = self.tree.focus()
+        if focus in items:
+            self.cursor = self.offset + items.index(focus)
+
+    def _on_key(self, step):
+        """Перемещение курсора клавишами с прокруткой окна"""
+        total = len(self.rows)
+        if not total:
+            return "break"
+
+        if step == "page_up":
+            cursor = self.cursor - self.visible
+        elif step == "page_down":
+            cursor = self.cursor + self.visible
+        elif step == "home":
+            cursor = 0
+        elif step == "end":
+            cursor = total - 1
+        else:
+            cursor = self.cursor + step
+        self.cursor = max(0, min(cursor, total - 1))
+
+        self.selected = {self.key(self.rows[self.cursor])}
+        self.see(self.cursor)
+        self.render()
+        item = self.tree.get_children()[self.cursor - self.offset]
+        self.tree.focus(item)
+        return "break"